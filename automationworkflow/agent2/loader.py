@@ -1,37 +1,37 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Dict, Iterable, List
 
+from storage import guest_corpus
+from utils.io import read_jsonl
 
-def read_jsonl(path: Path) -> List[Dict]:
-    if not Path(path).exists():
-        return []
-    out: List[Dict] = []
-    with Path(path).open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                out.append(json.loads(line))
-            except Exception:
-                continue
-    return out
 
-
-def load_agent1_outputs(guest_dir: Path) -> Dict:
+def load_agent1_outputs(guest_dir: Path, max_comments: int = 50, max_transcripts: int = 10) -> Dict:
+    # Only what build_snippets uses: the top comments by likes and the first transcripts
     return {
         "about": read_jsonl(guest_dir / "about_guest.jsonl"),
         "books": read_jsonl(guest_dir / "books_written.jsonl"),
         "social": read_jsonl(guest_dir / "social_bio.jsonl"),
-        "web": read_jsonl(guest_dir / "web.jsonl"),
-        "youtube": read_jsonl(guest_dir / "raw" / "youtube.jsonl"),
-        "chunks": read_jsonl(guest_dir / "chunks.jsonl"),
+        "web": guest_corpus.web_records(guest_dir),
+        "youtube": guest_corpus.top_comments(guest_dir, limit=max_comments) + guest_corpus.transcripts(guest_dir, limit=max_transcripts),
     }
 
 
+# Context priority when a prompt must be trimmed: most specific evidence first
+SNIPPET_PRIORITY = ("transcripts", "retrieved", "web", "comments")
+
+
+def group_snippets(snippets: List[Dict]) -> Dict[str, List[Dict]]:
+    """Snippets from build_snippets (plus retrieved ones) keyed by SNIPPET_PRIORITY group, order kept."""
+    groups: Dict[str, List[Dict]] = {k: [] for k in SNIPPET_PRIORITY}
+    for s in snippets:
+        title = s.get("title")
+        key = {"yt_transcript": "transcripts", "yt_comment": "comments", "retrieved": "retrieved"}.get(title, "web")
+        groups[key].append(s)
+    return groups
+
+
 def build_snippets(payload: Dict, max_items: int = 15) -> List[Dict]:
     snippets: List[Dict] = []
     # Prefer web pages (title+url+short text)
@@ -1,37 +1,36 @@
 from __future__ import annotations
 
 import json
-import os
 from pathlib import Path
 from typing import Dict, List
 
 from .prompts import SYSTEM, USER_TEMPLATE
+from agent2.loader import SNIPPET_PRIORITY, group_snippets
+from llm.client import chat_json
+from llm.tokens import compact_context, context_budget, remaining_budget
 from prompts.loader import get_prompt
+from rag.packing import pack_context
 
 
-def call_openai_json(messages: List[Dict], model: str = "gpt-4o") -> Dict:
-    import requests
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {"model": model, "response_format": {"type": "json_object"}, "messages": messages, "temperature": 0.3}
-    r = requests.post(url, headers=headers, json=payload, timeout=180)
-    r.raise_for_status()
-    content = r.json()["choices"][0]["message"]["content"]
-    return json.loads(content)
-
-
-def generate_plan(guest: str, north_star_obj: Dict, snippets: List[Dict], out_dir: Path, model: str = "gpt-4o") -> Dict:
-    north_star = json.dumps(north_star_obj.get("north_star", []), ensure_ascii=False)
-    lesser = json.dumps(north_star_obj.get("lesser_known", []), ensure_ascii=False)
-    compact_snips = json.dumps(snippets[:80], ensure_ascii=False)
-    user = USER_TEMPLATE.format(guest=guest, north_star=north_star, lesser_known=lesser, snippets=compact_snips)
+def generate_plan(guest: str, north_star_obj: Dict, snippets: List[Dict], out_dir: Path, model: str = "gpt-4o", context_tokens: int | None = None) -> Dict:
+    packed, _ = pack_context(snippets, context_tokens or context_budget(model), model=model)
     system_prompt = get_prompt("agent3.system", SYSTEM)
+    # North Star points outrank every snippet group when the prompt must shrink
+    priority = ("north_star", "lesser_known") + SNIPPET_PRIORITY
+    context = {
+        "north_star": list(north_star_obj.get("north_star", [])),
+        "lesser_known": list(north_star_obj.get("lesser_known", [])),
+        **group_snippets(packed),
+    }
+    room = remaining_budget(model, [system_prompt, USER_TEMPLATE.format(guest=guest, north_star="", lesser_known="", snippets="")])
+    context, _ = compact_context(context, room, priority, model=model, label="agent3")
+    north_star = json.dumps(context["north_star"], ensure_ascii=False)
+    lesser = json.dumps(context["lesser_known"], ensure_ascii=False)
+    compact_snips = json.dumps([s for key in SNIPPET_PRIORITY for s in context[key]], ensure_ascii=False)
+    user = USER_TEMPLATE.format(guest=guest, north_star=north_star, lesser_known=lesser, snippets=compact_snips)
     user_prompt = get_prompt("agent3.user", user)
     messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
-    result = call_openai_json(messages, model=model)
+    result = chat_json(messages, model=model, temperature=0.3, timeout=180)
     out_dir.mkdir(parents=True, exist_ok=True)
     with (out_dir / "plan.json").open("w", encoding="utf-8") as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote, urlparse
+
+from utils.io import iter_jsonl
+
+
+# Hive-style layout: <root>/guest=<name>/source_type=<type>/part-0.parquet
+# Guest names are URI-encoded, which is what pyarrow's hive partitioning decodes.
+DATASET_DIRNAME = "_analytics"
+SOURCE_FILES = (("raw", "youtube.jsonl"), ("", "web.jsonl"))
+COLUMNS = (
+    "url", "title", "domain", "video_id", "comment_id", "author",
+    "like_count", "reply_count", "published_at", "text_hash", "text_len",
+)
+
+
+def _lazy_import_arrow():
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    return pa, pc, ds, pq
+
+
+def default_dataset_root(outputs_root: Path) -> Path:
+    return Path(outputs_root) / DATASET_DIRNAME
+
+
+def _schema(pa, include_text: bool):
+    fields = [
+        ("url", pa.string()), ("title", pa.string()), ("domain", pa.string()),
+        ("video_id", pa.string()), ("comment_id", pa.string()), ("author", pa.string()),
+        ("like_count", pa.int64()), ("reply_count", pa.int64()), ("published_at", pa.string()),
+        ("text_hash", pa.string()), ("text_len", pa.int64()),
+    ]
+    if include_text:
+        fields.append(("text", pa.string()))
+    return pa.schema(fields)
+
+
+def _as_int(v) -> Optional[int]:
+    try:
+        return int(v) if v is not None else None
+    except Exception:
+        return None
+
+
+def _columns_by_source_type(guest_dir: Path, include_text: bool) -> Dict[str, Dict[str, List]]:
+    names = list(COLUMNS) + (["text"] if include_text else [])
+    out: Dict[str, Dict[str, List]] = {}
+    for sub, name in SOURCE_FILES:
+        path = guest_dir / sub / name if sub else guest_dir / name
+        for r in iter_jsonl(path):
+            st = r.get("source_type") or "unknown"
+            cols = out.get(st)
+            if cols is None:
+                cols = out[st] = {n: [] for n in names}
+            url = r.get("url")
+            text = r.get("text") or ""
+            cols["url"].append(url)
+            cols["title"].append(r.get("title"))
+            cols["domain"].append(r.get("domain") or (urlparse(url).netloc if url else None))
+            cols["video_id"].append(r.get("video_id"))
+            cols["comment_id"].append(r.get("comment_id"))
+            cols["author"].append(r.get("author"))
+            cols["like_count"].append(_as_int(r.get("like_count")))
+            cols["reply_count"].append(_as_int(r.get("reply_count")))
+            cols["published_at"].append(r.get("published_at"))
+            cols["text_hash"].append(r.get("text_hash"))
+            cols["text_len"].append(len(text))
+            if include_text:
+                cols["text"].append(text)
+    return out
+
+
+def export_guest(guest_dir: Path, dataset_root: Path, include_text: bool = False) -> int:
+    """(Re)write one guest's partitions from its Agent 1 outputs; returns rows written.
+
+    The guest's previous partitions are replaced, so this doubles as the
+    incremental update step after an Agent 1 run.
+    """
+    pa, _pc, _ds, pq = _lazy_import_arrow()
+    guest_dir = Path(guest_dir)
+    schema = _schema(pa, include_text)
+    by_type = _columns_by_source_type(guest_dir, include_text)
+
+    guest_root = Path(dataset_root) / f"guest={quote(guest_dir.name, safe='')}"
+    if guest_root.exists():
+        shutil.rmtree(guest_root)
+    rows = 0
+    for st, cols in by_type.items():
+        table = pa.Table.from_pydict(cols, schema=schema)
+        part_dir = guest_root / f"source_type={quote(st, safe='')}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, part_dir / "part-0.parquet", compression="zstd")
+        rows += table.num_rows
+    return rows
+
+
+def export_all(outputs_root: Path, dataset_root: Optional[Path] = None, include_text: bool = False) -> Dict[str, int]:
+    outputs_root = Path(outputs_root)
+    dataset_root = Path(dataset_root) if dataset_root else default_dataset_root(outputs_root)
+    counts: Dict[str, int] = {}
+    for d in sorted(outputs_root.iterdir()):
+        if d.is_dir() and not d.name.startswith("_"):
+            counts[d.name] = export_guest(d, dataset_root, include_text=include_text)
+    return counts
+
+
+def open_dataset(dataset_root: Path):
+    _pa, _pc, ds, _pq = _lazy_import_arrow()
+    return ds.dataset(str(dataset_root), format="parquet", partitioning="hive")
+
+
+def comment_volume_by_guest(dataset_root: Path) -> List[Dict]:
+    """Comment + reply counts and total likes per guest, most-commented first."""
+    _pa, pc, ds, _pq = _lazy_import_arrow()
+    table = open_dataset(dataset_root).to_table(
+        columns=["guest", "like_count"],
+        filter=ds.field("source_type").isin(["youtube_comment", "youtube_comment_reply"]),
+    )
+    # mode="all" counts rows, so comments without a like count still add to the volume
+    agg = table.group_by("guest").aggregate([
+        ("like_count", "count", pc.CountOptions(mode="all")),
+        ("like_count", "sum"),
+    ])
+    agg = agg.sort_by([("like_count_count", "descending")])
+    return [
+        {"guest": r["guest"], "comments": r["like_count_count"], "likes": r["like_count_sum"] or 0}
+        for r in agg.to_pylist()
+    ]
+
+
+def like_distribution(dataset_root: Path, guest: Optional[str] = None, quantiles=(0.5, 0.9, 0.99)) -> Dict:
+    _pa, pc, ds, _pq = _lazy_import_arrow()
+    flt = ds.field("source_type").isin(["youtube_comment", "youtube_comment_reply"])
+    if guest:
+        flt = flt & (ds.field("guest") == guest)
+    likes = open_dataset(dataset_root).to_table(columns=["like_count"], filter=flt)["like_count"]
+    if len(likes) == 0:
+        return {"count": 0}
+    qs = pc.quantile(likes, q=list(quantiles)).to_pylist()
+    return {
+        "count": len(likes),
+        "mean": pc.mean(likes).as_py(),
+        "max": pc.max(likes).as_py(),
+        **{f"p{int(q * 100)}": v for q, v in zip(quantiles, qs)},
+    }
+
+
+def domain_coverage(dataset_root: Path, top_n: int = 25) -> List[Dict]:
+    """Web domains by number of articles and distinct guests covered."""
+    _pa, _pc, ds, _pq = _lazy_import_arrow()
+    table = open_dataset(dataset_root).to_table(
+        columns=["guest", "domain"],
+        filter=ds.field("source_type") == "web_article",
+    )
+    agg = table.group_by("domain").aggregate([("guest", "count"), ("guest", "count_distinct")])
+    agg = agg.sort_by([("guest_count", "descending")]).slice(0, top_n)
+    return [
+        {"domain": r["domain"], "articles": r["guest_count"], "guests": r["guest_count_distinct"]}
+        for r in agg.to_pylist()
+    ]
@@ -1,44 +1,12 @@
 from __future__ import annotations
 
 import json
-import os
 from pathlib import Path
 from typing import Dict, List, Tuple
 
-
-def _read_jsonl(path: Path) -> List[Dict]:
-    if not path.exists():
-        return []
-    out: List[Dict] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                out.append(json.loads(line))
-            except Exception:
-                continue
-    return out
-
-
-def _call_openai_json(messages: List[Dict], model: str = "gpt-4o") -> Dict:
-    import requests
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "response_format": {"type": "json_object"},
-        "messages": messages,
-        "temperature": 0.2,
-    }
-    r = requests.post(url, headers=headers, json=payload, timeout=180)
-    r.raise_for_status()
-    content = r.json()["choices"][0]["message"]["content"]
-    return json.loads(content)
+from llm.client import chat_json
+from llm.tokens import compact_context, remaining_budget
+from storage import guest_corpus
 
 
 def analyze_comments(guest_dir: Path, model: str = "gpt-4o", max_comments: int = 500) -> Dict:
@@ -46,17 +14,15 @@ def analyze_comments(guest_dir: Path, model: str = "gpt-4o", max_comments: int =
 
     Returns the analysis dict.
     """
-    yt_path = guest_dir / "raw" / "youtube.jsonl"
-    records = _read_jsonl(yt_path)
-    comments = [r for r in records if (r.get("source_type") or "").startswith("youtube_comment")]
-    # Sort by likes desc for highest-signal context
-    for c in comments:
+    counts = guest_corpus.source_type_counts(guest_dir)
+    total_comments = counts.get("youtube_comment", 0) + counts.get("youtube_comment_reply", 0)
+    # Highest-signal context: most-liked first, fetched already sorted and capped
+    sample = guest_corpus.top_comments(guest_dir, limit=max_comments)
+    for c in sample:
         try:
             c["_likes"] = int(c.get("like_count", 0) or 0)
         except Exception:
             c["_likes"] = 0
-    comments.sort(key=lambda x: x.get("_likes", 0), reverse=True)
-    sample = comments[:max_comments]
 
     # Compact context for the model
     compact: List[Dict] = []
@@ -65,7 +31,6 @@ def analyze_comments(guest_dir: Path, model: str = "gpt-4o", max_comments: int =
             "likes": c.get("_likes", c.get("like_count", 0)),
             "text": (c.get("text") or "")[:600],
         })
-    context_json = json.dumps(compact, ensure_ascii=False)
 
     system = (
         "You are a data analyst specializing in YouTube community analysis. "
@@ -79,16 +44,20 @@ def analyze_comments(guest_dir: Path, model: str = "gpt-4o", max_comments: int =
         "  \"stats\": {total_comments, sample_size}\n"
         "}"
     )
-    user = (
-        "Top comments JSON (trimmed):\n" + context_json + "\n\n"
+    instructions = (
         "Summarize themes (culture/politics/tech), capture controversies fairly, and list real open questions from viewers. "
         "Provide 7-10 concise, distinct open questions that the audience still wants answered."
     )
+    # As many of the most-liked comments as the model's prompt budget allows
+    room = remaining_budget(model, [system, "Top comments JSON (trimmed):\n\n\n" + instructions])
+    fitted, _ = compact_context({"comments": compact}, room, ["comments"], model=model, label="comment analysis")
+    context_json = json.dumps(fitted["comments"], ensure_ascii=False)
+    user = "Top comments JSON (trimmed):\n" + context_json + "\n\n" + instructions
     messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
-    result = _call_openai_json(messages, model=model)
+    result = chat_json(messages, model=model, temperature=0.2, timeout=180)
     result["stats"] = result.get("stats", {})
-    result["stats"]["total_comments"] = len(comments)
-    result["stats"]["sample_size"] = len(sample)
+    result["stats"]["total_comments"] = total_comments
+    result["stats"]["sample_size"] = len(fitted["comments"])
 
     out_dir = guest_dir / "agent3"
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,25 @@
+import argparse
+from pathlib import Path
+
+from analysis.columnar import default_dataset_root, export_all, export_guest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export guest corpora to a Parquet dataset partitioned by guest and source_type")
+    parser.add_argument("--guest", help="Export a single guest (default: every guest under outputs)")
+    parser.add_argument("--outputs-root", default=str(Path(__file__).resolve().parents[1] / "outputs"))
+    parser.add_argument("--dataset-root", default=None)
+    parser.add_argument("--include-text", action="store_true", help="Also store full record text")
+    args = parser.parse_args()
+
+    outputs_root = Path(args.outputs_root)
+    dataset_root = Path(args.dataset_root) if args.dataset_root else default_dataset_root(outputs_root)
+    if args.guest:
+        counts = {args.guest: export_guest(outputs_root / args.guest, dataset_root, include_text=args.include_text)}
+    else:
+        counts = export_all(outputs_root, dataset_root, include_text=args.include_text)
+    print({"dataset": str(dataset_root), "rows": counts})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Retrieval quality and latency on a fixed synthetic guest (see benchmarks/retrieval_corpus.py).
+
+For every chunker setting and retriever (BM25, vector and hybrid per available
+backend) it reports recall@k, MRR@10, p50/p95 query latency, index build time and
+index size. Runs offline: vectors come from the hashing embedder unless --model is
+given (which needs a local model, see EMBEDDING_MODEL_PATH), and backends whose
+packages are missing are reported as skipped.
+
+Run from automationworkflow/:  python -m benchmarks.bench_retrieval --chunk-tokens 200,800
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.retrieval_corpus import GUEST, build_records, questions, relevant_chunks
+from utils.io import write_jsonl
+from utils.normalize import ChunkNormalizer
+
+KS = (1, 5, 10)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _dir_mb(path: Path) -> float:
+    return round(sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 1e6, 2)
+
+
+def evaluate(search: Callable[[str, int], List[Dict]], labeled: List[Dict]) -> Dict:
+    """recall@k (share of a question's relevant chunks in the top k, capped at k), MRR@10 and latency."""
+    recalls = {k: [] for k in KS}
+    rr: List[float] = []
+    latencies: List[float] = []
+    for item in labeled:
+        start = time.perf_counter()
+        hits = search(item["question"], max(KS))
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids = [h["id"] for h in hits]
+        rel = item["relevant"]
+        for k in KS:
+            recalls[k].append(len(set(ids[:k]) & rel) / min(k, len(rel)))
+        rank = next((i for i, cid in enumerate(ids[:10], start=1) if cid in rel), None)
+        rr.append(1.0 / rank if rank else 0.0)
+    return {
+        **{f"recall@{k}": round(statistics.mean(v), 3) for k, v in recalls.items()},
+        "mrr@10": round(statistics.mean(rr), 3),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+    }
+
+
+def _embedder(model: bool):
+    from rag.embeddings import HashingEmbedder, load_embedder
+    # Uncached on purpose: the vector cache would hide embedding cost in build times
+    return load_embedder() if model else HashingEmbedder()
+
+
+def run_setting(workdir: Path, chunk_tokens: int, backends: List[str], model: bool) -> List[Dict]:
+    from rag.hybrid import BM25Index, hybrid_search
+
+    chunks = list(ChunkNormalizer(max_tokens=chunk_tokens).iter_chunks(build_records(), guest=GUEST))
+    # Colliding ids would be merged or dropped by the indexes and skew recall
+    ids = [c["chunk_id"] for c in chunks]
+    assert len(set(ids)) == len(ids), f"{len(ids) - len(set(ids))} duplicate chunk ids at chunk_tokens={chunk_tokens}"
+    labeled = [{**q, "relevant": relevant_chunks(chunks, q["key"])} for q in questions()]
+    labeled = [q for q in labeled if q["relevant"]]
+    base = {"chunk_tokens": chunk_tokens, "chunks": len(chunks), "questions": len(labeled)}
+    rows: List[Dict] = []
+
+    start = time.perf_counter()
+    bm25 = BM25Index(chunks)
+    build_s = time.perf_counter() - start
+    rows.append({**base, "retriever": "bm25", "build_s": round(build_s, 3), "index_mb": None,
+                 **evaluate(lambda q, k: bm25.search(q, n_results=k), labeled)})
+
+    for backend in backends:
+        guest_dir = workdir / f"{backend}-{chunk_tokens}" / GUEST
+        write_jsonl(guest_dir / "chunks.jsonl", chunks)
+        try:
+            from rag.vectorstore import query, sync_index
+            embedder = _embedder(model)
+            start = time.perf_counter()
+            sync_index(guest_dir / "chunks.jsonl", guest_dir / "chroma", backend=backend, embedder=embedder)
+            build_s = time.perf_counter() - start
+        except Exception as e:
+            rows.append({**base, "retriever": f"vector:{backend}", "skipped": f"{type(e).__name__}: {e}"})
+            continue
+        size = _dir_mb(guest_dir / "chroma")
+        db_dir = guest_dir / "chroma"
+        rows.append({**base, "retriever": f"vector:{backend}", "build_s": round(build_s, 3), "index_mb": size,
+                     **evaluate(lambda q, k: query(db_dir, q, n_results=k, backend=backend, embedder=embedder), labeled)})
+        rows.append({**base, "retriever": f"hybrid:{backend}", "build_s": round(build_s, 3), "index_mb": size,
+                     **evaluate(lambda q, k: hybrid_search(guest_dir, q, n_results=k, backend=backend, embedder=embedder)[0], labeled)})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark retrieval recall and latency on a fixed synthetic guest")
+    parser.add_argument("--chunk-tokens", default="200,800", help="Comma-separated ChunkNormalizer max_tokens settings")
+    parser.add_argument("--backends", default="numpy,chroma")
+    parser.add_argument("--model", action="store_true", help="Embed with the configured local model instead of hashing")
+    parser.add_argument("--json", default=None, help="Also write all rows to this JSON file")
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    rows: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for tokens in [int(t) for t in args.chunk_tokens.split(",") if t.strip()]:
+            for row in run_setting(Path(tmp), tokens, backends, args.model):
+                print(row)
+                rows.append(row)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Compare SQLiteStore.upsert_records against the previous per-record loop and schema.
+
+Run from automationworkflow/:  python -m benchmarks.bench_sqlite_upsert --records 50000
+"""
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from storage.sqlite_store import SQLiteStore
+from utils.normalize import compute_text_hash
+
+
+def synthetic_comments(n: int, videos: int = 25) -> List[Dict]:
+    out: List[Dict] = []
+    for i in range(n):
+        vid = f"vid{i % videos:04d}"
+        cid = f"Ugz{i:08d}"
+        out.append({
+            "source_type": "youtube_comment",
+            "video_id": vid,
+            "comment_id": cid,
+            "text": f"Comment {i}: this part of the interview about topic {i % 97} really stuck with me.",
+            "author": f"@viewer{i % 5000}",
+            "like_count": (i * 7919) % 1200,
+            "reply_count": i % 5,
+            "published_at": "2024-05-01T12:00:00Z",
+            "url": f"https://www.youtube.com/watch?v={vid}&lc={cid}",
+        })
+    return out
+
+
+LEGACY_RECORDS_DDL = """
+CREATE TABLE records (
+    id INTEGER PRIMARY KEY,
+    guest_id INTEGER,
+    source_type TEXT,
+    url TEXT,
+    title TEXT,
+    domain TEXT,
+    video_id TEXT,
+    comment_id TEXT,
+    author TEXT,
+    like_count INTEGER,
+    reply_count INTEGER,
+    published_at TEXT,
+    text TEXT,
+    text_hash TEXT,
+    extra_json TEXT,
+    UNIQUE(guest_id, source_type, url, comment_id, video_id, text_hash)
+);
+CREATE INDEX idx_records_guest_source ON records(guest_id, source_type);
+CREATE INDEX idx_records_guest_video ON records(guest_id, video_id);
+CREATE INDEX idx_records_like_count ON records(like_count);
+CREATE VIRTUAL TABLE records_fts USING fts5(
+    title, text, content='records', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER records_fts_ai AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+"""
+
+
+def legacy_connection(db_path: Path) -> sqlite3.Connection:
+    """Original wide composite UNIQUE, with the same secondary and FTS indexes as SQLiteStore
+    but FTS kept in sync by a per-row trigger, so both runs do the same indexing work."""
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.executescript(LEGACY_RECORDS_DDL)
+    conn.commit()
+    return conn
+
+
+def legacy_upsert_records(conn: sqlite3.Connection, guest_id: int, records: List[Dict]) -> int:
+    """The pre-batching implementation: one execute + JSON encode per record."""
+    cur = conn.cursor()
+    inserted = 0
+    for r in records:
+        url = r.get("url")
+        text = r.get("text")
+        extra = {k: v for k, v in r.items() if k not in {"source_type", "url", "title", "video_id", "comment_id", "author", "like_count", "reply_count", "published_at", "text"}}
+        try:
+            cur.execute(
+                """
+                INSERT OR IGNORE INTO records
+                (guest_id, source_type, url, title, domain, video_id, comment_id, author, like_count, reply_count, published_at, text, text_hash, extra_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (guest_id, r.get("source_type"), url, r.get("title"), urlparse(url).netloc if url else None,
+                 r.get("video_id"), r.get("comment_id"), r.get("author"), r.get("like_count"), r.get("reply_count"),
+                 r.get("published_at"), text, compute_text_hash(text) if text else None,
+                 json.dumps(extra, ensure_ascii=False) if extra else None),
+            )
+            inserted += cur.rowcount
+        except Exception:
+            continue
+    conn.commit()
+    return inserted
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk vs per-record SQLite upserts")
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+
+    records = synthetic_comments(args.records)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.sqlite"
+        legacy_conn = legacy_connection(legacy_path)
+        legacy_s = _timed(lambda: legacy_upsert_records(legacy_conn, 1, records))
+        legacy_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        legacy_conn.close()
+        legacy_mb = legacy_path.stat().st_size / 1e6
+
+        bulk_path = Path(tmp) / "bulk.sqlite"
+        with SQLiteStore(bulk_path) as bulk_store:
+            gid = bulk_store.ensure_guest("bench")
+            bulk_s = _timed(lambda: bulk_store.upsert_records(gid, records))
+            bulk_store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        bulk_mb = bulk_path.stat().st_size / 1e6
+
+    print({
+        "records": len(records),
+        "legacy_loop_s": round(legacy_s, 3),
+        "bulk_s": round(bulk_s, 3),
+        "legacy_rec_per_s": int(len(records) / legacy_s),
+        "bulk_rec_per_s": int(len(records) / bulk_s),
+        "speedup": round(legacy_s / bulk_s, 2),
+        "legacy_db_mb": round(legacy_mb, 2),
+        "bulk_db_mb": round(bulk_mb, 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
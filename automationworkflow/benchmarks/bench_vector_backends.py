@@ -0,0 +1,113 @@
+"""Compare the Chroma and NumPy vector backends on build time, query latency and memory.
+
+Each backend runs in its own subprocess so peak RSS (which includes import cost)
+is measured separately. Both use the same offline hashing embedder unless
+--model is given, so the numbers compare the stores rather than the embeddings.
+
+Run from automationworkflow/:  python -m benchmarks.bench_vector_backends --chunks 5000
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from utils.io import write_jsonl
+
+
+TOPICS = ("discipline", "startups", "fitness", "investing", "parenting", "sleep", "writing", "leadership")
+
+
+def synthetic_chunks(n: int) -> List[Dict]:
+    out: List[Dict] = []
+    for i in range(n):
+        topic = TOPICS[i % len(TOPICS)]
+        out.append({
+            "chunk_id": f"chunk{i:07d}",
+            "text": f"Segment {i} on {topic}: the guest explains how {topic} habits compound over years, "
+                    f"with example {i % 113} and a story about {TOPICS[(i * 7) % len(TOPICS)]}.",
+            "source_type": "youtube_transcript" if i % 3 else "youtube_comment",
+            "video_id": f"vid{i % 40:04d}",
+            "url": f"https://www.youtube.com/watch?v=vid{i % 40:04d}",
+            "guest": "bench",
+        })
+    return out
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_backend(backend: str, chunks_path: Path, db_dir: Path, queries: int, n_results: int, model: bool) -> Dict:
+    start = time.perf_counter()
+    from rag.embeddings import HashingEmbedder, default_embedder
+    from rag.vectorstore import build_index, query
+    embedder = default_embedder() if model else HashingEmbedder()
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count, _ = build_index(chunks_path, db_dir, backend=backend, embedder=embedder)
+    build_s = time.perf_counter() - start
+
+    latencies: List[float] = []
+    for i in range(queries):
+        text = f"how do {TOPICS[i % len(TOPICS)]} habits compound"
+        start = time.perf_counter()
+        query(db_dir, text, n_results=n_results, backend=backend, embedder=embedder)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    size = sum(p.stat().st_size for p in Path(db_dir).rglob("*") if p.is_file())
+    return {
+        "backend": backend,
+        "chunks": count,
+        "import_s": round(import_s, 3),
+        "build_s": round(build_s, 3),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(_percentile(latencies, 95), 2),
+        "index_mb": round(size / 1e6, 2),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs NumPy vector backends")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=6)
+    parser.add_argument("--backends", default="numpy,chroma")
+    parser.add_argument("--model", action="store_true", help="Use the default MiniLM embedder instead of hashing")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        workdir = Path(args.workdir)
+        result = run_backend(args.child, workdir / "chunks.jsonl", workdir / args.child, args.queries, args.n_results, args.model)
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_jsonl(Path(tmp) / "chunks.jsonl", synthetic_chunks(args.chunks))
+        for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            cmd = [
+                sys.executable, "-m", "benchmarks.bench_vector_backends",
+                "--child", backend, "--workdir", tmp,
+                "--queries", str(args.queries), "--n-results", str(args.n_results),
+            ] + (["--model"] if args.model else [])
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                last = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+                print({"backend": backend, "skipped": last})
+                continue
+            print(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Fixed synthetic guest corpus with labeled questions, for the retrieval benchmark.
+
+Everything is generated from a seeded RNG, so the corpus and labels are identical on
+every run and machine. Each fact has a `key` phrase naming its answer; a chunk is
+relevant to the fact's question if it contains the key, which keeps labels valid for
+any chunker setting.
+"""
+import random
+from typing import Dict, List, Set
+
+GUEST = "Mara Quinlan"
+SEED = 1729
+
+# (key phrase, sentence stating the fact, question asking for it)
+FACTS = [
+    ("Lisbon to Barbados", "In 2011 Mara rowed solo from Lisbon to Barbados in 71 days.", "Which ocean crossing did Mara row solo?"),
+    ("The Quiet Ledger", "Her first book, The Quiet Ledger, came out in 2016 and covered money habits of rowers.", "What was the title of her first book?"),
+    ("Harbor Analytics", "She founded Harbor Analytics in 2014 to forecast sea conditions for small boats.", "What company did she start to forecast sea conditions?"),
+    ("Aldous Fenwick", "Her rowing coach Aldous Fenwick made her log every stroke count by hand.", "Who coached her rowing?"),
+    ("capsized four times", "On the Atlantic crossing the boat capsized four times in a single storm night.", "How many times did her boat flip over during the storm?"),
+    ("Galway", "Mara grew up in Galway, above her grandmother's bakery.", "Where did Mara grow up?"),
+    ("marine biology at Bristol", "She dropped out of marine biology at Bristol after one year.", "What did she study at university before dropping out?"),
+    ("Series A of 9 million", "Harbor Analytics raised a Series A of 9 million dollars in 2017.", "How much money did her company raise in its Series A?"),
+    ("sold Harbor Analytics", "In 2020 she sold Harbor Analytics, six years after founding it.", "When did she sell her startup?"),
+    ("three-hour rule", "Her three-hour rule means no decision after three hours without sleep.", "What is her rule about making decisions when tired?"),
+    ("Drift Podcast", "She hosts the Drift Podcast about people who changed careers after forty.", "What is the name of the podcast she hosts?"),
+    ("tinnitus", "Years of storms left her with tinnitus, which she manages with white noise.", "What lasting health issue did the storms leave her with?"),
+    ("Saltwater Year", "Her second book, Saltwater Year, is a diary of the months after the crossing.", "Which book is a diary of the months after the crossing?"),
+    ("desalinator broke", "On day 40 the desalinator broke and she pumped drinking water by hand.", "What equipment failed halfway through the voyage?"),
+    ("Kestrel", "Her boat was named Kestrel after a bird her father used to watch.", "What was the name of her rowing boat?"),
+    ("cold water swimming club", "She runs a cold water swimming club every Sunday in Salthill.", "What does she organize on Sundays?"),
+    ("Order of the Tide", "In 2019 she received the Order of the Tide for services to ocean safety.", "Which award did she receive for ocean safety?"),
+    ("ten thousand strokes", "Her daily training was ten thousand strokes on an indoor rower.", "How many strokes did she train per day?"),
+    ("impostor syndrome", "She speaks openly about impostor syndrome when she first pitched investors.", "What did she feel when she first pitched investors?"),
+    ("Pacific attempt", "Her 2023 Pacific attempt was abandoned after a hull crack near Hawaii.", "Why did her Pacific row end early?"),
+    ("fig and walnut", "Her favorite ocean snack was fig and walnut bars she baked herself.", "What snack did she bring on the boat?"),
+    ("Ines Carvalho", "Her co-founder Ines Carvalho built the first forecasting model.", "Who was her co-founder?"),
+    ("stroke logbook", "She still keeps the stroke logbook from the crossing on her desk.", "What memento from the crossing does she keep on her desk?"),
+    ("hallucinated a lighthouse", "Sleep deprivation got so bad she hallucinated a lighthouse in open ocean.", "What did she see when she was badly sleep deprived?"),
+    ("shipping insurer", "The buyer was a shipping insurer that wanted her wave data.", "What kind of company bought her startup?"),
+]
+
+TOPICS = ["rowing", "ocean", "startup", "book", "training", "sleep", "storm", "investors", "podcast", "family", "boat", "data"]
+FILLER = [
+    "We talked for a while about {a} and how it connects to {b}.",
+    "People ask about {a} all the time, but honestly {b} mattered more.",
+    "There is a lot of noise online about {a}; the real story is slower.",
+    "If you are starting out with {a}, focus on {b} first.",
+    "The conversation drifted from {a} to {b} and back again.",
+    "Most of the work around {a} is boring repetition.",
+    "I think {a} is underrated compared to {b}.",
+    "That season was mostly about {a}, with a bit of {b} on the side.",
+]
+COMMENT_FILLER = [
+    "Great episode, loved the part about {a}!",
+    "She is so calm talking about {a}.",
+    "Anyone else rewatching this for the {a} section?",
+    "The {a} story gave me chills.",
+    "More guests like this please, especially on {a}.",
+]
+
+
+def _filler(rng: random.Random, n: int, templates: List[str]) -> List[str]:
+    return [rng.choice(templates).format(a=rng.choice(TOPICS), b=rng.choice(TOPICS)) for _ in range(n)]
+
+
+def build_records() -> List[Dict]:
+    """Agent 1-shaped records: transcripts, comments and web articles mentioning the facts."""
+    rng = random.Random(SEED)
+    facts = list(range(len(FACTS)))
+    rng.shuffle(facts)
+    records: List[Dict] = []
+
+    # Six long transcripts carry most facts, scattered among filler
+    for v in range(6):
+        own = facts[v * 3:(v + 1) * 3]
+        sentences = _filler(rng, 120, FILLER)
+        for f in own:
+            sentences.insert(rng.randrange(len(sentences)), FACTS[f][1])
+        records.append({
+            "source_type": "youtube_transcript",
+            "video_id": f"vid{v:03d}",
+            "url": f"https://www.youtube.com/watch?v=vid{v:03d}",
+            "text": " ".join(sentences),
+        })
+
+    # Web articles restate some facts (and own the rest)
+    for w, f in enumerate(facts[18:] + facts[:4]):
+        sentences = _filler(rng, 25, FILLER)
+        sentences.insert(rng.randrange(len(sentences)), FACTS[f][1])
+        records.append({
+            "source_type": "web_article",
+            "url": f"https://news.example/{w}",
+            "title": f"Interview {w}",
+            "text": " ".join(sentences),
+        })
+
+    # Mostly-noise comments, a few of which mention a fact
+    for c in range(300):
+        text = _filler(rng, 1, COMMENT_FILLER)[0]
+        if c % 37 == 0:
+            text += " " + FACTS[facts[c % len(facts)]][1]
+        records.append({
+            "source_type": "youtube_comment",
+            "video_id": f"vid{c % 6:03d}",
+            "comment_id": f"cm{c:04d}",
+            "url": f"https://www.youtube.com/watch?v=vid{c % 6:03d}&lc=cm{c:04d}",
+            "text": text,
+        })
+    return records
+
+
+def questions() -> List[Dict]:
+    return [{"qid": f"q{i:02d}", "question": q, "key": key} for i, (key, _fact, q) in enumerate(FACTS)]
+
+
+def relevant_chunks(chunks: List[Dict], key: str) -> Set[str]:
+    needle = key.lower()
+    return {c["chunk_id"] for c in chunks if needle in (c.get("text") or "").lower()}
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import json
-import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
+
+from llm.client import chat, chat_stream
+from llm.tokens import context_budget
+from rag.packing import pack_context
+from storage import guest_corpus
+from utils.io import read_jsonl
 
 
 def _read_json(path: Path) -> Dict:
@@ -15,31 +20,12 @@ def _read_json(path: Path) -> Dict:
         return {}
 
 
-def _read_jsonl(path: Path) -> List[Dict]:
-    if not path.exists():
-        return []
-    out: List[Dict] = []
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    out.append(json.loads(line))
-                except Exception:
-                    continue
-    except Exception:
-        return []
-    return out
-
-
 def load_corpus(guest_dir: Path) -> Dict[str, List[Dict]]:
     corpus: Dict[str, List[Dict]] = {
-        "web": _read_jsonl(guest_dir / "web.jsonl"),
-        "about": _read_jsonl(guest_dir / "about_guest.jsonl"),
-        "youtube": _read_jsonl(guest_dir / "raw" / "youtube.jsonl"),
-        "chunks": _read_jsonl(guest_dir / "chunks.jsonl"),
+        "web": guest_corpus.web_records(guest_dir),
+        "about": read_jsonl(guest_dir / "about_guest.jsonl"),
+        # Videos (for titles) plus the most-liked comments are all the chatbot uses
+        "youtube": guest_corpus.videos(guest_dir) + guest_corpus.top_comments(guest_dir, limit=50),
     }
     # Prefer user-selected North Star if present
     ns = _read_json(guest_dir / "agent2" / "selected_north_star.json")
@@ -64,6 +50,33 @@ def retrieve(chroma_db_dir: Path | None, query: str, n_results: int = 6) -> List
         return []
 
 
+def hybrid_retrieve(guest_dir: Path, query: str, n_results: int = 6, use_vector: bool = True) -> Tuple[List[Dict], Dict]:
+    """BM25 + vector search over the guest's chunks fused with RRF; works without a vector index."""
+    try:
+        from rag.hybrid import hybrid_search
+        return hybrid_search(guest_dir, query, n_results=n_results, use_vector=use_vector)
+    except Exception:
+        return retrieve(guest_dir / "chroma" if use_vector else None, query, n_results=n_results), {}
+
+
+def keyword_search(guest_dir: Path, query: str, n_results: int = 6) -> List[Dict]:
+    """BM25 search over the guest's SQLite records; used when there are no chunk hits at all."""
+    try:
+        from storage.sqlite_store import open_guest_store
+        opened = open_guest_store(guest_dir)
+        if not opened:
+            return []
+        store, guest_id = opened
+        hits = store.search(query, guest_id=guest_id, limit=n_results)
+    except Exception:
+        return []
+    # Same shape as vector hits so context packing and citations don't care where they came from
+    return [
+        {"id": str(h["id"]), "text": h.get("text") or h.get("snippet") or "", "metadata": {"url": h.get("url"), "source_type": h.get("source_type")}, "score": h.get("score")}
+        for h in hits
+    ]
+
+
 def web_search_and_fetch(query: str, max_results: int = 5) -> List[Dict]:
     # Use existing WebIngestor to avoid duplicating logic
     try:
@@ -97,46 +110,34 @@ def top_youtube_comments(youtube_records: List[Dict], limit: int = 5) -> Tuple[L
     return comments[:max(1, limit)], videos
 
 
-def call_openai(messages: List[Dict], model: str = "gpt-4o") -> str:
-    import requests
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.2,
-    }
-    r = requests.post(url, headers=headers, json=payload, timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    return data["choices"][0]["message"]["content"]
-
+def _prepare_answer(guest: str, guest_dir: Path, question: str, model: str, use_chroma: bool, allow_web_search: bool, web_max_results: int) -> Dict:
+    """Retrieval and prompt building shared by answer_question and answer_question_stream.
 
-def answer_question(guest: str, guest_dir: Path, question: str, model: str = "gpt-4o", use_chroma: bool = True, allow_web_search: bool = False, web_max_results: int = 5) -> Dict:
+    Returns {"answer", "citations", "retrieval"} when the question is answered without
+    the model (top comments), else {"messages", "citations", "retrieval"}.
+    """
     corpus = load_corpus(guest_dir)
-    db_dir = guest_dir / "chroma"
-    retrieved = retrieve(db_dir if use_chroma else None, question, n_results=6)
-
-    context_blocks: List[str] = []
-    # Prefer retrieved docs, then north_star topics and plan topics
-    for hit in retrieved:
-        url = hit.get("metadata", {}).get("url")
-        txt = hit.get("text", "")[:1200]
-        if txt:
-            context_blocks.append(json.dumps({"source": url, "text": txt}, ensure_ascii=False))
+    # Over-fetch: the packer keeps the distinct, relevant part that fits the model's budget
+    retrieved, retrieval_stats = hybrid_retrieve(guest_dir, question, n_results=12, use_vector=use_chroma)
+    if not retrieved:
+        retrieved = keyword_search(guest_dir, question, n_results=12)
+
+    passages: List[Dict] = [
+        {"source": hit.get("metadata", {}).get("url"), "text": hit.get("text") or ""} for hit in retrieved
+    ]
+    notes: List[str] = []
+    # North Star points and plan topics are short and always included
     for t in corpus.get("north_star", [])[:3]:
-        context_blocks.append(json.dumps({"north_star": t}, ensure_ascii=False))
+        notes.append(json.dumps({"north_star": t}, ensure_ascii=False))
     for t in corpus.get("topics", [])[:5]:
-        context_blocks.append(json.dumps({"topic": t}, ensure_ascii=False))
+        notes.append(json.dumps({"topic": t}, ensure_ascii=False))
 
     # If insufficient context and allowed, run web search
-    if allow_web_search and len(context_blocks) < 5:
-        fresh = web_search_and_fetch(f"{guest} {question}", max_results=web_max_results)
-        for r in fresh:
-            context_blocks.append(json.dumps(r, ensure_ascii=False))
+    if allow_web_search and len(passages) + len(notes) < 5:
+        passages.extend(web_search_and_fetch(f"{guest} {question}", max_results=web_max_results))
+
+    packed, packing_stats = pack_context(passages, context_budget(model), query=question, model=model)
+    context_blocks = [json.dumps(p, ensure_ascii=False) for p in packed] + notes
 
     # Special handling: best/top YouTube comments
     ql = question.lower()
@@ -162,7 +163,9 @@ def answer_question(guest: str, guest_dir: Path, question: str, model: str = "gp
                 f"Other high‑engagement comments:\n" + "\n".join(bullets[1:])
             ).strip()
             cites = [c.get("url") for c in top_comments if c.get("url")]
-            return {"answer": answer, "citations": cites[:10]}
+            return {"answer": answer, "citations": cites[:10], "retrieval": retrieval_stats}
+
+    retrieval_stats = {**retrieval_stats, "packing": packing_stats}
 
     system = (
         "You are a helpful research assistant answering questions about a guest. "
@@ -170,11 +173,32 @@ def answer_question(guest: str, guest_dir: Path, question: str, model: str = "gp
     )
     user = (
         f"Guest: {guest}\n\nQuestion: {question}\n\n"
-        f"Context JSON blocks (one per line):\n" + "\n".join(context_blocks[:30])
+        f"Context JSON blocks (one per line):\n" + "\n".join(context_blocks)
     )
     messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
-    content = call_openai(messages, model=model)
-    citations = [h.get("metadata", {}).get("url") for h in retrieved if h.get("metadata", {}).get("url")]
-    return {"answer": content, "citations": [c for c in citations if c]}
+    citations = list(dict.fromkeys(p.get("source") for p in packed if p.get("source")))
+    return {"messages": messages, "citations": citations, "retrieval": retrieval_stats}
+
+
+def answer_question(guest: str, guest_dir: Path, question: str, model: str = "gpt-4o", use_chroma: bool = True, allow_web_search: bool = False, web_max_results: int = 5) -> Dict:
+    prepared = _prepare_answer(guest, guest_dir, question, model, use_chroma, allow_web_search, web_max_results)
+    if "answer" in prepared:
+        return prepared
+    content = chat(prepared["messages"], model=model, temperature=0.2, timeout=120)
+    return {"answer": content, "citations": prepared["citations"], "retrieval": prepared["retrieval"]}
+
+
+def answer_question_stream(guest: str, guest_dir: Path, question: str, model: str = "gpt-4o", use_chroma: bool = True, allow_web_search: bool = False, web_max_results: int = 5) -> Dict:
+    """Like answer_question, but "stream" yields the answer text as it is generated.
+
+    Retrieval runs before this returns, so citations and retrieval stats are ready to
+    show once the stream is exhausted.
+    """
+    prepared = _prepare_answer(guest, guest_dir, question, model, use_chroma, allow_web_search, web_max_results)
+    if "answer" in prepared:
+        stream: Iterator[str] = iter([prepared["answer"]])
+    else:
+        stream = chat_stream(prepared["messages"], model=model, temperature=0.2, timeout=120)
+    return {"stream": stream, "citations": prepared["citations"], "retrieval": prepared["retrieval"]}
 
 
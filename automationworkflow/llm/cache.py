@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# Content-addressed cache of chat completions: identical (model, messages, temperature,
+# response_format) requests are answered from SQLite instead of the API. Entries expire
+# after a TTL and the least recently used ones are evicted past a size cap.
+
+CACHE_PATH_ENV = "LLM_CACHE_PATH"
+TTL_ENV = "LLM_CACHE_TTL_S"
+MAX_MB_ENV = "LLM_CACHE_MAX_MB"
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / "outputs" / "_cache" / "llm.sqlite"
+DEFAULT_TTL_S = 30 * 24 * 3600
+DEFAULT_MAX_MB = 200
+
+
+def request_key(model: str, messages: List[Dict], temperature: float, response_format: Optional[Dict] = None) -> bytes:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "response_format": response_format},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+class ResponseCache:
+    """SQLite response store with TTL expiry, LRU eviction by total size and hit/miss counters."""
+
+    def __init__(self, cache_path: Path, ttl_s: float = DEFAULT_TTL_S, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key BLOB PRIMARY KEY,
+                model TEXT,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed);
+            """
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Cached content, or None on a miss (expired entries and database errors count as misses)."""
+        try:
+            return self._get(key)
+        except sqlite3.Error:
+            self.misses += 1
+            return None
+
+    def _get(self, key: bytes) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_s:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: bytes, content: str, model: Optional[str] = None) -> None:
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, content, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, content, size, now, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error:
+                # A locked or full cache only costs the next identical call a request
+                self._conn.rollback()
+
+    def _evict(self, now: float) -> None:
+        cur = self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+        self.evictions += cur.rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until 90% of the cap, leaving room before the next sweep
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims: List[bytes] = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            victims.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in victims])
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries, "bytes": size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_key: Optional[tuple] = None
+_cache_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Process-wide cache from $LLM_CACHE_PATH ("none" disables it), $LLM_CACHE_TTL_S and $LLM_CACHE_MAX_MB."""
+    global _cache, _cache_key
+    raw = (os.getenv(CACHE_PATH_ENV) or "").strip()
+    if raw.lower() in ("none", "off", "0"):
+        return None
+    path = Path(raw) if raw else DEFAULT_CACHE_PATH
+    ttl_s = _env_float(TTL_ENV, DEFAULT_TTL_S)
+    max_bytes = int(_env_float(MAX_MB_ENV, DEFAULT_MAX_MB) * 1024 * 1024)
+    key = (str(path), ttl_s, max_bytes)
+    with _cache_lock:
+        if _cache is None or _cache_key != key:
+            try:
+                _cache = ResponseCache(path, ttl_s=ttl_s, max_bytes=max_bytes)
+            except (OSError, sqlite3.Error):
+                # An unwritable cache location must not break LLM calls
+                return None
+            _cache_key = key
+        return _cache
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from llm.cache import get_cache, request_key
+from llm.tokens import count_message_tokens, prompt_budget
+
+logger = logging.getLogger(__name__)
+
+# One OpenAI chat-completions client for every agent: a keep-alive session shared by
+# all threads, a semaphore bounding concurrent requests, and jittered retries on
+# 429/5xx and connection errors that honor Retry-After. chat_stream yields the reply
+# as it is generated (server-sent events) for interactive use.
+
+BASE_URL_ENV = "OPENAI_BASE_URL"
+TIMEOUT_ENV = "OPENAI_TIMEOUT"
+MAX_RETRIES_ENV = "OPENAI_MAX_RETRIES"
+CONCURRENCY_ENV = "OPENAI_MAX_CONCURRENCY"
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_CONCURRENCY = 8
+CONNECT_TIMEOUT = 10.0
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+_session_obj = None
+_semaphore_obj: Optional[threading.BoundedSemaphore] = None
+_lock = threading.Lock()
+
+
+def _env_number(name: str, default, cast=float):
+    try:
+        return cast(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _lazy_import_requests():
+    import requests
+    return requests
+
+
+def _session():
+    global _session_obj
+    with _lock:
+        if _session_obj is None:
+            requests = _lazy_import_requests()
+            size = _env_number(CONCURRENCY_ENV, DEFAULT_CONCURRENCY, int)
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, size))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session_obj = session
+        return _session_obj
+
+
+def _semaphore() -> threading.BoundedSemaphore:
+    global _semaphore_obj
+    with _lock:
+        if _semaphore_obj is None:
+            _semaphore_obj = threading.BoundedSemaphore(max(1, _env_number(CONCURRENCY_ENV, DEFAULT_CONCURRENCY, int)))
+        return _semaphore_obj
+
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): Retry-After if given, else full-jitter backoff."""
+    header = response.headers.get("Retry-After") if response is not None else None
+    if header:
+        try:
+            return min(BACKOFF_MAX_S, max(0.0, float(header)))
+        except ValueError:
+            try:
+                return min(BACKOFF_MAX_S, max(0.0, parsedate_to_datetime(header).timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+
+
+def chat(
+    messages: List[Dict],
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    response_format: Optional[Dict] = None,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    bypass_cache: bool = False,
+    validate: Optional[Callable[[str], object]] = None,
+) -> str:
+    """Content of the first choice of a chat completion.
+
+    Raises RuntimeError without OPENAI_API_KEY and the final HTTP or connection error
+    once retries are exhausted. `timeout` is the read timeout in seconds
+    (default $OPENAI_TIMEOUT, else 120). Identical requests are answered from the
+    response cache (llm/cache.py) unless `bypass_cache` is set; a bypassed call still
+    refreshes the cached entry.
+
+    Only complete replies are cached: not ones cut off at the token limit, nor ones for
+    which `validate` (e.g. json.loads) raises. A cached reply that fails `validate` is
+    fetched again.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    prompt_tokens = count_message_tokens(messages, model)
+    if prompt_tokens > prompt_budget(model):
+        logger.warning("%s request is ~%d prompt tokens, over its %d-token budget", model, prompt_tokens, prompt_budget(model))
+    else:
+        logger.debug("%s request is ~%d prompt tokens", model, prompt_tokens)
+    cache = get_cache()
+    key = request_key(model, messages, temperature, response_format) if cache is not None else None
+    if cache is not None and not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None and _valid(cached, validate):
+            return cached
+    response = _post(api_key, messages, model, temperature, response_format, timeout, max_retries)
+    choice = response.json()["choices"][0]
+    content = choice["message"]["content"]
+    if cache is not None and choice.get("finish_reason") != "length" and _valid(content, validate):
+        cache.put(key, content, model=model)
+    return content
+
+
+def _valid(content: str, validate: Optional[Callable[[str], object]]) -> bool:
+    if validate is None:
+        return True
+    try:
+        validate(content)
+    except Exception:
+        return False
+    return True
+
+
+def _post(
+    api_key: str,
+    messages: List[Dict],
+    model: str,
+    temperature: float,
+    response_format: Optional[Dict],
+    timeout: Optional[float],
+    max_retries: Optional[int],
+    stream: bool = False,
+):
+    """The successful HTTP response, after retries. A streamed response holds only headers
+    when returned; its body is read by the caller, outside the concurrency semaphore."""
+    url = (os.getenv(BASE_URL_ENV) or DEFAULT_BASE_URL).rstrip("/") + "/chat/completions"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload: Dict = {"model": model, "messages": messages, "temperature": temperature}
+    if response_format:
+        payload["response_format"] = response_format
+    extra: Dict = {}
+    if stream:
+        payload["stream"] = True
+        extra["stream"] = True
+    read_timeout = timeout or _env_number(TIMEOUT_ENV, DEFAULT_TIMEOUT)
+    retries = max_retries if max_retries is not None else _env_number(MAX_RETRIES_ENV, DEFAULT_MAX_RETRIES, int)
+
+    session = _session()
+    attempt = 0
+    while True:
+        response = None
+        try:
+            with _semaphore():
+                response = session.post(url, headers=headers, json=payload, timeout=(CONNECT_TIMEOUT, read_timeout), **extra)
+        except OSError:
+            # requests' connection and timeout errors are OSErrors
+            if attempt >= retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                if response.status_code >= 400:
+                    response.close()
+                response.raise_for_status()
+                return response
+        delay = _retry_delay(attempt, response)
+        if response is not None:
+            # A streamed response keeps its pooled connection until closed
+            response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def iter_sse_content(lines: Iterable, state: Optional[Dict] = None) -> Iterator[str]:
+    """Text deltas from the server-sent-event lines of a streamed chat completion.
+
+    `state`, when given, receives "finish_reason" from the final chunk and "done" once
+    the terminating [DONE] event arrives; a stream cut off early has neither.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line or not line.startswith("data:"):
+            # Blank separators, comments (": keep-alive") and other SSE fields
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            if state is not None:
+                state["done"] = True
+            return
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        for choice in event.get("choices") or []:
+            if state is not None and choice.get("finish_reason"):
+                state["finish_reason"] = choice["finish_reason"]
+            piece = (choice.get("delta") or {}).get("content")
+            if piece:
+                yield piece
+
+
+def chat_stream(
+    messages: List[Dict],
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    bypass_cache: bool = False,
+) -> Iterator[str]:
+    """Like `chat`, but yields the reply in pieces as the model produces them.
+
+    Retries only happen before the first piece arrives. A cached reply is yielded
+    whole, and a stream read to its [DONE] event is stored in the cache (unless it
+    stopped at the token limit); a stream cut off mid-reply is not.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY not set")
+    cache = get_cache()
+    key = request_key(model, messages, temperature, None) if cache is not None else None
+    if cache is not None and not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    response = _post(api_key, messages, model, temperature, None, timeout, max_retries, stream=True)
+    pieces: List[str] = []
+    state: Dict = {}
+    try:
+        for piece in iter_sse_content(response.iter_lines(), state):
+            pieces.append(piece)
+            yield piece
+    finally:
+        response.close()
+    if cache is not None and pieces and state.get("done") and state.get("finish_reason") != "length":
+        cache.put(key, "".join(pieces), model=model)
+
+
+def chat_json(
+    messages: List[Dict],
+    model: str = "gpt-4o",
+    temperature: float = 0.2,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    bypass_cache: bool = False,
+) -> Dict:
+    """`chat` in JSON mode, with the reply parsed. Replies that don't parse raise and are not cached."""
+    content = chat(
+        messages,
+        model=model,
+        temperature=temperature,
+        response_format={"type": "json_object"},
+        timeout=timeout,
+        max_retries=max_retries,
+        bypass_cache=bypass_cache,
+        validate=json.loads,
+    )
+    return json.loads(content)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Prompt token accounting. Counts come from tiktoken when it is installed and its
+# encoding files are available locally, else from the ~4 chars/token approximation
+# the chunker also uses. compact_context trims a prompt's context to a per-model
+# budget, dropping the lowest-priority items first. PROMPT_BUDGETS is the one per-model
+# table: the retrieved-passage budget of rag/packing.py is a share of it.
+
+logger = logging.getLogger(__name__)
+
+PROMPT_BUDGET_ENV = "PROMPT_TOKEN_BUDGET"
+DEFAULT_PROMPT_BUDGET = 16000
+# Input tokens per request by model family (well under the context window, for latency
+# and cost); the longest matching prefix wins
+PROMPT_BUDGETS = {
+    "gpt-4o-mini": 16000,
+    "gpt-4o": 24000,
+    "gpt-4.1-mini": 24000,
+    "gpt-4.1": 32000,
+    "gpt-3.5": 8000,
+}
+# Share of the prompt budget spent on packed retrieval passages; the rest is left for
+# instructions, other context and compaction headroom
+CONTEXT_SHARE = 0.375
+FALLBACK_ENCODING = "o200k_base"
+# Per-message framing tokens in the chat format
+MESSAGE_OVERHEAD = 4
+
+
+def _lazy_import_tiktoken():
+    import tiktoken
+    return tiktoken
+
+
+@functools.lru_cache(maxsize=16)
+def _encoding(model: Optional[str]):
+    try:
+        tiktoken = _lazy_import_tiktoken()
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        pass
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception:
+        # Encoding files not cached and no network: fall back to the estimate
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: Sequence[Dict], model: Optional[str] = None) -> int:
+    return sum(count_tokens(m.get("content") or "", model) + MESSAGE_OVERHEAD for m in messages) + 3
+
+
+def prompt_budget(model: Optional[str] = None) -> int:
+    """Input tokens allowed per request for `model`; $PROMPT_TOKEN_BUDGET overrides the table."""
+    override = os.getenv(PROMPT_BUDGET_ENV)
+    if override:
+        try:
+            return max(1, int(override))
+        except ValueError:
+            pass
+    name = (model or "").lower()
+    matches = [prefix for prefix in PROMPT_BUDGETS if name.startswith(prefix)]
+    return PROMPT_BUDGETS[max(matches, key=len)] if matches else DEFAULT_PROMPT_BUDGET
+
+
+def context_budget(model: Optional[str] = None) -> int:
+    """Tokens of retrieved passages to pack for `model` (CONTEXT_SHARE of its prompt budget)."""
+    return max(1, int(prompt_budget(model) * CONTEXT_SHARE))
+
+
+def remaining_budget(model: Optional[str], fixed_texts: Sequence[str]) -> int:
+    """Tokens left for variable context once the fixed parts of a prompt are counted."""
+    used = sum(count_tokens(t, model) + MESSAGE_OVERHEAD for t in fixed_texts) + 3
+    return max(0, prompt_budget(model) - used)
+
+
+def _json_tokens(obj, model: Optional[str]) -> int:
+    return count_tokens(json.dumps(obj, ensure_ascii=False), model)
+
+
+def compact_context(
+    context: Dict,
+    budget: int,
+    priority: Sequence[str],
+    model: Optional[str] = None,
+    label: str = "prompt",
+) -> Tuple[Dict, Dict]:
+    """Trim `context` so its JSON fits `budget` tokens; returns (compacted copy, report).
+
+    List values are cut from the end (callers order them best first), starting with
+    the key last in `priority` and moving up only once a lower-priority list is empty.
+    Keys not in `priority` are trimmed before all listed ones; other values are kept.
+    The report gives tokens before/after and how many items each key lost, and any
+    trimming is logged.
+    """
+    out = dict(context)
+    before = _json_tokens(out, model)
+    report: Dict = {"label": label, "budget": budget, "tokens_before": before, "tokens": before, "trimmed": {}}
+    if before <= budget:
+        return out, report
+    ranked = list(priority)
+    order = [k for k in out if k not in ranked and isinstance(out[k], list)] + [
+        k for k in reversed(ranked) if isinstance(out.get(k), list)
+    ]
+    tokens = before
+    for key in order:
+        items: List = out[key]
+        # Largest prefix of this list that fits, found by bisection
+        lo, hi = 0, len(items)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            out[key] = items[:mid]
+            if _json_tokens(out, model) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        out[key] = items[:lo]
+        if lo < len(items):
+            report["trimmed"][key] = len(items) - lo
+        tokens = _json_tokens(out, model)
+        if tokens <= budget:
+            break
+    report["tokens"] = tokens
+    logger.info(
+        "%s: context compacted from %d to %d tokens (budget %d); dropped %s",
+        label,
+        before,
+        tokens,
+        budget,
+        ", ".join(f"{n} {k}" for k, n in report["trimmed"].items()) or "nothing",
+    )
+    return out, report
@@ -1,26 +1,41 @@
 import argparse
 from pathlib import Path
 
-from rag.vectorstore import build_index
+from rag.numpy_store import QUANTIZATIONS
+from rag.vectorstore import BACKENDS, global_db_dir, sync_global_index, sync_index
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Build Chroma index from chunks.jsonl")
-    parser.add_argument("--guest", required=True)
+    parser = argparse.ArgumentParser(description="Build the vector index from chunks.jsonl")
+    parser.add_argument("--guest", default=None, help="Guest folder under outputs (required unless --all)")
     parser.add_argument("--outputs-root", default=str(Path(__file__).resolve().parents[1] / "outputs"))
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Defaults to $VECTOR_BACKEND, else chroma")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=None, help="numpy backend: also store float16/int8 vectors for queries (defaults to $VECTOR_QUANTIZATION, else the current setting)")
+    parser.add_argument("--global", dest="global_index", action="store_true", help="Index into the cross-guest collection under outputs/_global")
+    parser.add_argument("--all", action="store_true", help="With --global: index every guest folder")
     args = parser.parse_args()
 
-    guest_dir = Path(args.outputs_root) / args.guest
+    outputs_root = Path(args.outputs_root)
+    if args.all and not args.global_index:
+        parser.error("--all requires --global")
+    if not args.all and not args.guest:
+        parser.error("--guest is required unless --all is given")
+
+    if args.global_index:
+        guests = [args.guest] if not args.all else sorted(
+            d.name for d in outputs_root.iterdir() if d.is_dir() and not d.name.startswith("_")
+        )
+        for guest in guests:
+            stats = sync_global_index(outputs_root, guest, backend=args.backend, quantization=args.quantization)
+            print({"db": str(global_db_dir(outputs_root)), "guest": guest, **stats})
+        return
+
+    guest_dir = outputs_root / args.guest
     chunks_path = guest_dir / "chunks.jsonl"
     db_dir = guest_dir / "chroma"
-    count, path = build_index(chunks_path, db_dir)
-    print({"indexed_chunks": count, "db": path})
+    stats = sync_index(chunks_path, db_dir, backend=args.backend, quantization=args.quantization)
+    print({"db": str(db_dir), **stats})
 
 
 if __name__ == "__main__":
     main()
-
-
-
-
-
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# Embedders are plain callables: embedder(input=[texts]) -> list of float vectors.
+# That is the shape Chroma expects from an embedding function, so one object works
+# for both vector backends.
+#
+# Configuration (all optional):
+#   EMBEDDING_MODEL_PATH   directory with model.onnx + tokenizer.json (e.g. an exported
+#                          all-MiniLM-L6-v2); unset = Chroma's default MiniLM
+#   EMBEDDING_BATCH_SIZE   texts per inference batch (default 32)
+#   EMBEDDING_THREADS      onnxruntime intra-op threads (default 0 = runtime decides)
+#   EMBEDDING_CACHE_PATH   SQLite vector cache; "none" disables it
+
+HASHING_DIM = 384
+MODEL_PATH_ENV = "EMBEDDING_MODEL_PATH"
+BATCH_SIZE_ENV = "EMBEDDING_BATCH_SIZE"
+THREADS_ENV = "EMBEDDING_THREADS"
+CACHE_PATH_ENV = "EMBEDDING_CACHE_PATH"
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / "outputs" / "_cache" / "embeddings.sqlite"
+
+
+class HashingEmbedder:
+    """Offline, dependency-light fallback: signed feature hashing of word unigrams and
+    bigrams, L2-normalized. Far weaker than a neural model but deterministic and needs
+    no download, which keeps tests and offline benchmarks runnable."""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+
+    def name(self) -> str:
+        return f"hashing-{self.dim}"
+
+    def _features(self, text: str) -> List[str]:
+        toks = re.findall(r"\w+", (text or "").lower())
+        return toks + [f"{a}_{b}" for a, b in zip(toks, toks[1:])]
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        import numpy as np
+        out = np.zeros((len(input), self.dim), dtype=np.float32)
+        for i, text in enumerate(input):
+            for feat in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "little")
+                out[i, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (out / norms).tolist()
+
+
+def _file_fingerprint(path: Path) -> str:
+    """Short digest of a file's resolved path, size and mtime (distinct per model file, stable across runs)."""
+    st = path.stat()
+    raw = f"{path.resolve()}\x1f{st.st_size}\x1f{st.st_mtime_ns}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _lazy_import_onnx():
+    import numpy as np
+    import onnxruntime
+    from tokenizers import Tokenizer
+    return np, onnxruntime, Tokenizer
+
+
+class OnnxEmbedder:
+    """Sentence embeddings from local ONNX weights: batched CPU inference, mean pooling
+    over the attention mask, L2-normalized. No download at runtime."""
+
+    def __init__(self, model_dir: Path, batch_size: int = 32, threads: int = 0, max_length: int = 256):
+        np, ort, Tokenizer = _lazy_import_onnx()
+        self.model_dir = Path(model_dir)
+        model_path = next((p for p in (self.model_dir / "model.onnx", self.model_dir / "onnx" / "model.onnx") if p.exists()), None)
+        tok_path = next((p for p in (self.model_dir / "tokenizer.json", self.model_dir / "onnx" / "tokenizer.json") if p.exists()), None)
+        if model_path is None or tok_path is None:
+            raise FileNotFoundError(f"Expected model.onnx and tokenizer.json under {self.model_dir}")
+        self.batch_size = max(1, int(batch_size))
+        self.tokenizer = Tokenizer.from_file(str(tok_path))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(str(model_path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        # The directory name alone collides across versions stored as .../v1/model, .../v2/model
+        self._name = f"onnx:{self.model_dir.name}:{_file_fingerprint(model_path)}"
+
+    def name(self) -> str:
+        return self._name
+
+    def _embed_batch(self, np, texts: List[str]):
+        enc = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in enc], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+        m = mask[..., None].astype(np.float32)
+        pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return pooled / norms
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        np, _ort, _tok = _lazy_import_onnx()
+        if not input:
+            return []
+        # Length-sorted batches pad far less; results are put back in input order
+        order = sorted(range(len(input)), key=lambda i: len(input[i] or ""))
+        out: List[Optional[List[float]]] = [None] * len(input)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            vecs = self._embed_batch(np, [input[i] or "" for i in idx])
+            for i, vec in zip(idx, vecs.tolist()):
+                out[i] = vec
+        return out  # type: ignore[return-value]
+
+
+class CachedEmbedder:
+    """Wraps an embedder with a SQLite cache keyed by (model, text hash), so identical
+    text (duplicate comments, shared transcripts) is embedded once across runs and guests."""
+
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, inner, cache_path: Path):
+        self.inner = inner
+        self.model = embedder_name(inner) or type(inner).__name__
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def name(self) -> Optional[str]:
+        return embedder_name(self.inner)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b((text or "").encode("utf-8", errors="ignore"), digest_size=16).digest()
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._LOOKUP_BATCH):
+                part = keys[i:i + self._LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    [self.model, *part],
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+        return found
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in input]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, input):
+            if key not in found and key not in missing:
+                missing[key] = text or ""
+        self.hits += len(input) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            vecs = self.inner(input=list(missing.values()))
+            fresh = dict(zip(missing.keys(), [list(map(float, v)) for v in vecs]))
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    [(self.model, k, array("f", v).tobytes()) for k, v in fresh.items()],
+                )
+                self._conn.commit()
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+
+def _chroma_default_embedder():
+    # Same ONNX MiniLM model Chroma uses implicitly, so vectors match existing indexes
+    from chromadb.utils import embedding_functions
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def _cache_path() -> Optional[Path]:
+    raw = (os.getenv(CACHE_PATH_ENV) or "").strip()
+    if raw.lower() in ("none", "off", "0"):
+        return None
+    return Path(raw) if raw else DEFAULT_CACHE_PATH
+
+
+def load_embedder():
+    """Build the configured model embedder (uncached); raises if none is available."""
+    model_path = (os.getenv(MODEL_PATH_ENV) or "").strip()
+    if model_path:
+        return OnnxEmbedder(
+            Path(model_path),
+            batch_size=int(os.getenv(BATCH_SIZE_ENV) or 32),
+            threads=int(os.getenv(THREADS_ENV) or 0),
+        )
+    return _chroma_default_embedder()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def model_embedder():
+    """Process-wide model embedder (configured local ONNX weights, else Chroma's MiniLM)
+    behind the SQLite vector cache. Raises when no model can be loaded."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            inner = load_embedder()
+            cache = _cache_path()
+            _default = CachedEmbedder(inner, cache) if cache else inner
+        return _default
+
+
+def default_embedder(prefer_model: bool = True):
+    """`model_embedder()`, or the hashing fallback when no model is available."""
+    if prefer_model:
+        try:
+            return model_embedder()
+        except Exception:
+            pass
+    return HashingEmbedder()
+
+
+def embedder_name(embedder) -> Optional[str]:
+    name = getattr(embedder, "name", None)
+    try:
+        return name() if callable(name) else name
+    except Exception:
+        return None
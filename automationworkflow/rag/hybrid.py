@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.io import iter_jsonl
+
+
+# Dense retrieval misses exact names, titles and years; BM25 misses paraphrases.
+# Both run over the same chunks (so hits share chunk ids) and are merged with
+# reciprocal rank fusion, which needs no score calibration between the two.
+
+RRF_K = 60
+META_FIELDS = ("source_type", "url", "video_id", "comment_id", "guest")
+_STOPWORDS = frozenset("a an and are as at be by did do does for from has have how i in is it of on or that the this to was what when where which who why with you".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"\w+", (text or "").lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """In-memory Okapi BM25 over chunk texts."""
+
+    def __init__(self, docs: Iterable[Dict], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Dict] = []
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for obj in docs:
+            cid = obj.get("chunk_id") or f"auto_{len(self.docs)}"
+            n = len(self.docs)
+            tf: Dict[str, int] = {}
+            toks = tokenize(obj.get("text") or "")
+            for t in toks:
+                tf[t] = tf.get(t, 0) + 1
+            for t, c in tf.items():
+                self.postings.setdefault(t, []).append((n, c))
+            self.doc_len.append(len(toks))
+            self.docs.append({"id": cid, "text": obj.get("text") or "", "metadata": {f: obj.get(f) for f in META_FIELDS}})
+        self.avgdl = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def search(self, query: str, n_results: int = 10) -> List[Dict]:
+        """Top hits as {"id","text","metadata","score"}, best first."""
+        n_docs = len(self.docs)
+        if not n_docs:
+            return []
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc, tf in plist:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc] / (self.avgdl or 1.0))
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+        best = heapq.nlargest(n_results, scores.items(), key=lambda kv: kv[1])
+        return [{**self.docs[doc], "score": score} for doc, score in best]
+
+
+_bm25_cache: Dict[str, Tuple[tuple, BM25Index]] = {}
+_bm25_lock = threading.Lock()
+
+
+def _file_stamp(chunks_path: Path) -> Optional[tuple]:
+    from storage.indexed_jsonl import index_path_for
+    for p in (chunks_path, index_path_for(chunks_path)):
+        if p.exists():
+            st = p.stat()
+            return (str(p), st.st_mtime_ns, st.st_size)
+    return None
+
+
+def get_bm25_index(chunks_path: Path) -> Optional[BM25Index]:
+    """BM25 index over a chunks file, built on first use and rebuilt when the file changes."""
+    chunks_path = Path(chunks_path)
+    stamp = _file_stamp(chunks_path)
+    if stamp is None:
+        return None
+    key = str(chunks_path.resolve())
+    with _bm25_lock:
+        cached = _bm25_cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        index = BM25Index(iter_jsonl(chunks_path, keys=("chunk_id", "text") + META_FIELDS))
+        _bm25_cache[key] = (stamp, index)
+        return index
+
+
+def rrf_fuse(rankings: Sequence[Tuple[str, List[Dict]]], n_results: int, k: int = RRF_K) -> List[Dict]:
+    """Reciprocal rank fusion of named rankings: score(d) = sum over rankings of 1 / (k + rank)."""
+    fused: Dict[str, Dict] = {}
+    for name, hits in rankings:
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = {**hit, "rrf_score": 0.0, "sources": []}
+            entry["rrf_score"] += 1.0 / (k + rank)
+            entry["sources"].append(name)
+    return sorted(fused.values(), key=lambda h: h["rrf_score"], reverse=True)[:n_results]
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(2, min(8, os.cpu_count() or 2)), thread_name_prefix="hybrid")
+        return _executor
+
+
+def _timed(fn, *args, **kwargs) -> Tuple[List[Dict], float]:
+    start = time.perf_counter()
+    try:
+        hits = fn(*args, **kwargs)
+    except Exception:
+        hits = []
+    return hits, (time.perf_counter() - start) * 1000
+
+
+def _vector_hits(guest_dir: Path, query: str, n_results: int, backend: Optional[str] = None, embedder=None) -> List[Dict]:
+    from rag.vectorstore import GLOBAL_ID_SEP, global_db_dir, query as vector_query
+    db_dir = guest_dir / "chroma"
+    if db_dir.exists():
+        return vector_query(db_dir, query, n_results=n_results, backend=backend, embedder=embedder)
+    # No per-guest index: use the guest's slice of the cross-guest index, if there is one
+    shared = global_db_dir(guest_dir.parent)
+    if not shared.exists():
+        return []
+    prefix = f"{guest_dir.name}{GLOBAL_ID_SEP}"
+    hits = vector_query(shared, query, n_results=n_results, backend=backend, embedder=embedder, where={"guest": guest_dir.name})
+    return [{**h, "id": h["id"][len(prefix):] if h["id"].startswith(prefix) else h["id"]} for h in hits]
+
+
+def _bm25_hits(chunks_path: Path, query: str, n_results: int) -> List[Dict]:
+    index = get_bm25_index(chunks_path)
+    return index.search(query, n_results=n_results) if index is not None else []
+
+
+def hybrid_search(
+    guest_dir: Path,
+    query: str,
+    n_results: int = 6,
+    candidates: int = 20,
+    use_vector: bool = True,
+    backend: Optional[str] = None,
+    embedder=None,
+) -> Tuple[List[Dict], Dict]:
+    """Run BM25 and vector search over a guest's chunks in parallel and fuse them with RRF.
+
+    Returns (hits, stats); each hit keeps the vector-hit shape plus `rrf_score` and
+    `sources`, and stats carries per-retriever latency and hit counts. `backend` and
+    `embedder` are passed through to the vector query.
+    """
+    guest_dir = Path(guest_dir)
+    start = time.perf_counter()
+    bm25_future = _pool().submit(_timed, _bm25_hits, guest_dir / "chunks.jsonl", query, candidates)
+    if use_vector:
+        vector_hits, vector_ms = _timed(_vector_hits, guest_dir, query, candidates, backend=backend, embedder=embedder)
+    else:
+        vector_hits, vector_ms = [], 0.0
+    bm25_hits, bm25_ms = bm25_future.result()
+    hits = rrf_fuse([("vector", vector_hits), ("bm25", bm25_hits)], n_results=n_results)
+    stats = {
+        "vector_ms": round(vector_ms, 2),
+        "bm25_ms": round(bm25_ms, 2),
+        "total_ms": round((time.perf_counter() - start) * 1000, 2),
+        "vector_hits": len(vector_hits),
+        "bm25_hits": len(bm25_hits),
+        "both": sum(1 for h in hits if len(h["sources"]) > 1),
+        "returned": len(hits),
+    }
+    return hits, stats
+
+
+def recall_at_k(hits: List[Dict], relevant_ids: Iterable[str], k: int) -> float:
+    relevant = set(relevant_ids)
+    if not relevant:
+        return 0.0
+    return len({h["id"] for h in hits[:k]} & relevant) / len(relevant)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Background vector indexing for a guest, started by Agent 1 once chunks.jsonl is
+# written. Progress is mirrored to <guest>/index_status.json so the UI (possibly a
+# different process) can show it; in-process callers can block on the build thread.
+
+STATUS_FILENAME = "index_status.json"
+# Small batches make a Chroma build in progress queryable early
+BACKGROUND_BATCH_SIZE = 512
+# A "building" status not refreshed for this long belongs to a process that died
+STALE_AFTER_S = 600
+
+_builds: Dict[str, "_Build"] = {}
+_builds_lock = threading.Lock()
+
+
+class _Build:
+    def __init__(self, guest_dir: Path):
+        self.guest_dir = guest_dir
+        self.done = threading.Event()
+        self.rerun = False
+        self.thread: Optional[threading.Thread] = None
+
+
+def status_path(guest_dir: Path) -> Path:
+    return Path(guest_dir) / STATUS_FILENAME
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _write_status(guest_dir: Path, **fields) -> Dict:
+    path = status_path(guest_dir)
+    status = {**read_status(guest_dir, check_stale=False), **fields, "updated_at": _now(), "updated_ts": time.time()}
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        tmp.write_text(json.dumps(status, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return status
+
+
+def read_status(guest_dir: Path, check_stale: bool = True) -> Dict:
+    """Last recorded index status: {"state": "queued"|"building"|"ready"|"failed"|"stale", ...}; {} if never indexed."""
+    try:
+        status = json.loads(status_path(guest_dir).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if check_stale and status.get("state") in ("queued", "building") and not is_building(guest_dir):
+        if time.time() - float(status.get("updated_ts") or 0) > STALE_AFTER_S:
+            status["state"] = "stale"
+    return status
+
+
+def is_building(guest_dir: Path) -> bool:
+    with _builds_lock:
+        build = _builds.get(str(Path(guest_dir).resolve()))
+    return build is not None and not build.done.is_set()
+
+
+def _run(build: _Build, backend: Optional[str], total: Optional[int], embedder=None) -> None:
+    from rag.vectorstore import resolve_backend, sync_index
+
+    guest_dir = build.guest_dir
+    key = str(guest_dir.resolve())
+    while True:
+        with _builds_lock:
+            build.rerun = False
+        db_dir = guest_dir / "chroma"
+        started = time.perf_counter()
+        try:
+            backend_name = resolve_backend(db_dir, backend=backend)
+            _write_status(guest_dir, state="building", backend=backend_name, processed=0, total=total,
+                          started_at=_now(), finished_at=None, error=None)
+            stats = sync_index(
+                guest_dir / "chunks.jsonl",
+                db_dir,
+                backend=backend,
+                embedder=embedder,
+                batch_size=BACKGROUND_BATCH_SIZE,
+                progress=lambda n: _write_status(guest_dir, processed=n),
+            )
+            _write_status(guest_dir, state="ready", processed=stats.get("total"), total=stats.get("total"),
+                          stats=stats, finished_at=_now(), seconds=round(time.perf_counter() - started, 2))
+        except Exception as e:
+            _write_status(guest_dir, state="failed", error=f"{type(e).__name__}: {e}", finished_at=_now())
+        with _builds_lock:
+            if not build.rerun:
+                _builds.pop(key, None)
+                build.done.set()
+                return
+
+
+def start_background_index(
+    guest_dir: Path, backend: Optional[str] = None, total: Optional[int] = None, embedder=None
+) -> Dict:
+    """Start (or queue another pass of) an incremental index build for `guest_dir`; returns the status.
+
+    A build already running for the guest is not duplicated: it runs one more pass
+    when it finishes, so chunks written meanwhile are picked up.
+    """
+    guest_dir = Path(guest_dir)
+    key = str(guest_dir.resolve())
+    with _builds_lock:
+        build = _builds.get(key)
+        if build is not None and not build.done.is_set():
+            build.rerun = True
+            return read_status(guest_dir)
+        build = _builds[key] = _Build(guest_dir)
+        status = _write_status(guest_dir, state="queued", processed=0, total=total, error=None)
+        build.thread = threading.Thread(
+            target=_run, args=(build, backend, total, embedder), name=f"index-{guest_dir.name}", daemon=True
+        )
+        build.thread.start()
+    return status
+
+
+def wait_for_index(guest_dir: Path, timeout: Optional[float] = None, poll_s: float = 1.0) -> Dict:
+    """Block until the guest's index build finishes or `timeout` passes; returns the latest status.
+
+    Builds running in this process are awaited directly; builds started elsewhere are
+    followed through the status file.
+    """
+    guest_dir = Path(guest_dir)
+    with _builds_lock:
+        build = _builds.get(str(guest_dir.resolve()))
+    if build is not None:
+        build.done.wait(timeout)
+        return read_status(guest_dir)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = read_status(guest_dir)
+        if status.get("state") not in ("queued", "building"):
+            return status
+        if deadline is not None and time.monotonic() >= deadline:
+            return status
+        time.sleep(poll_s)
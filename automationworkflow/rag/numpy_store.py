@@ -0,0 +1,483 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rag.embeddings import HashingEmbedder, embedder_name, model_embedder
+from utils.normalize import compute_text_hash
+
+
+# One collection = <name>.npy (float32, rows L2-normalized, memory-mapped on read) +
+# <name>.sqlite (row number -> chunk id/text/metadata). Exact cosine top-k is a single
+# matmul, which for per-guest corpora of a few thousand chunks is faster than an ANN
+# index and needs nothing beyond numpy.
+#
+# Large indexes can add a quantized copy, <name>.float16.npy or <name>.int8.npy (int8
+# with a per-row scale in <name>.int8.scale.npy). Queries then scan the compact copy and
+# re-rank only the best candidates against the float32 rows, so the float32 file is
+# touched a few rows at a time. Both are memory-mapped read-only, so every process and
+# session serving the index shares one copy through the OS page cache.
+#
+# Each build writes all of these files into a fresh generation directory
+# <db_dir>/<name>.gen-<n>/ and then atomically replaces the pointer file <name>.current
+# naming it. Readers resolve the pointer once per query, so the matrix and row metadata
+# they use always come from the same build. The previous generation is kept for queries
+# still running against it and removed by the build after. Indexes from before
+# generations (files directly in <db_dir>) stay readable until the next build.
+
+logger = logging.getLogger(__name__)
+
+META_FIELDS = ("source_type", "url", "video_id", "comment_id", "guest")
+QUANTIZATION_ENV = "VECTOR_QUANTIZATION"
+QUANTIZATIONS = ("float32", "float16", "int8")
+# Quantized scores pick max(RERANK_FACTOR * k, RERANK_MIN) candidates for the float32 re-rank
+RERANK_FACTOR = 4
+RERANK_MIN = 32
+# Rows dequantized at a time while scanning, bounding the float32 scratch memory
+SCAN_BLOCK_ROWS = 32768
+POINTER_SUFFIX = ".current"
+GENERATION_INFIX = ".gen-"
+
+
+def _lazy_import_numpy():
+    import numpy as np
+    return np
+
+
+def vectors_path_for(db_dir: Path, collection_name: str) -> Path:
+    return Path(db_dir) / f"{collection_name}.npy"
+
+
+def meta_path_for(db_dir: Path, collection_name: str) -> Path:
+    return Path(db_dir) / f"{collection_name}.sqlite"
+
+
+def quantized_path_for(db_dir: Path, collection_name: str, quantization: str) -> Path:
+    return Path(db_dir) / f"{collection_name}.{quantization}.npy"
+
+
+def scale_path_for(db_dir: Path, collection_name: str) -> Path:
+    return Path(db_dir) / f"{collection_name}.int8.scale.npy"
+
+
+def pointer_path_for(db_dir: Path, collection_name: str) -> Path:
+    return Path(db_dir) / f"{collection_name}{POINTER_SUFFIX}"
+
+
+def current_dir(db_dir: Path, collection_name: str) -> Path:
+    """Directory holding the live generation's files (the *_for paths above are relative to it).
+
+    Falls back to `db_dir` itself for indexes built before generations existed.
+    """
+    try:
+        name = pointer_path_for(db_dir, collection_name).read_text(encoding="utf-8").strip()
+    except OSError:
+        return Path(db_dir)
+    return Path(db_dir) / name if name else Path(db_dir)
+
+
+def _remove_legacy_files(db_dir: Path, collection_name: str) -> None:
+    paths = [vectors_path_for(db_dir, collection_name), meta_path_for(db_dir, collection_name),
+             scale_path_for(db_dir, collection_name)]
+    paths += [quantized_path_for(db_dir, collection_name, q) for q in QUANTIZATIONS[1:]]
+    for path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def _quantize(np, mat, quantization: str):
+    """(quantized matrix, per-row scale or None) for L2-normalized float32 rows."""
+    if quantization == "float16":
+        return mat.astype(np.float16), None
+    peak = np.abs(mat).max(axis=1) if mat.shape[0] else np.zeros(0, dtype=np.float32)
+    scale = (np.where(peak > 0, peak, 1.0) / 127.0).astype(np.float32)
+    return np.clip(np.rint(mat / scale[:, None]), -127, 127).astype(np.int8), scale
+
+
+def _top_k(np, scores, k: int):
+    """Column indices and values of the k largest scores per row, best first."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def _normalize_rows(np, mat):
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+class NumpyVectorStore:
+    def __init__(self, db_dir: Path, collection_name: str = "guest_chunks"):
+        self.db_dir = Path(db_dir)
+        self.collection_name = collection_name
+        # (stamp, generation dir, float32 matrix, quantized) of the last loaded generation,
+        # replaced as a whole so concurrent queries never mix two builds
+        self._loaded = None
+        self._embedder = None
+
+    @classmethod
+    def exists(cls, db_dir: Path, collection_name: str = "guest_chunks") -> bool:
+        gen = current_dir(db_dir, collection_name)
+        return vectors_path_for(gen, collection_name).exists() and meta_path_for(gen, collection_name).exists()
+
+    def current_dir(self) -> Path:
+        return current_dir(self.db_dir, self.collection_name)
+
+    @property
+    def vectors_path(self) -> Path:
+        return vectors_path_for(self.current_dir(), self.collection_name)
+
+    @property
+    def meta_path(self) -> Path:
+        return meta_path_for(self.current_dir(), self.collection_name)
+
+    def _connect(self, path: Optional[Path] = None) -> sqlite3.Connection:
+        return sqlite3.connect(str(path or self.meta_path))
+
+    def info(self, gen: Optional[Path] = None) -> Dict[str, str]:
+        meta_path = meta_path_for(gen, self.collection_name) if gen is not None else self.meta_path
+        if not meta_path.exists():
+            return {}
+        conn = self._connect(meta_path)
+        try:
+            return dict(conn.execute("SELECT key, value FROM info").fetchall())
+        finally:
+            conn.close()
+
+    def quantization(self) -> str:
+        return self.info().get("quantization") or "float32"
+
+    def _resolve_quantization(self, quantization: Optional[str]) -> str:
+        # Explicit argument, then $VECTOR_QUANTIZATION, then whatever the current index uses
+        value = (quantization or os.getenv(QUANTIZATION_ENV) or self.quantization()).strip().lower()
+        if value not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization '{value}' (expected one of {', '.join(QUANTIZATIONS)})")
+        return value
+
+    def embedder(self):
+        """The embedder matching the one the index was built with (created once per store)."""
+        if self._embedder is None:
+            name = self.info().get("embedder") or ""
+            if name.startswith("hashing-"):
+                self._embedder = HashingEmbedder(dim=int(name.split("-", 1)[1]))
+            else:
+                # Never fall back to hashing here: its vectors aren't comparable to the model's
+                self._embedder = model_embedder()
+        return self._embedder
+
+    def _previous(self, gen: Path, embedder) -> Tuple[Dict[str, str], Dict[str, int], object]:
+        """chunk_id -> text_hash and text_hash -> row of generation `gen`, plus its matrix.
+
+        Vectors are only reusable when the index was built with the same embedder.
+        """
+        np = _lazy_import_numpy()
+        meta_path = meta_path_for(gen, self.collection_name)
+        vectors_path = vectors_path_for(gen, self.collection_name)
+        if not (meta_path.exists() and vectors_path.exists()):
+            return {}, {}, None
+        conn = self._connect(meta_path)
+        try:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(chunks)")}
+            if "text_hash" not in cols:
+                return {}, {}, None
+            ids = dict(conn.execute("SELECT chunk_id, text_hash FROM chunks").fetchall())
+            same_embedder = dict(conn.execute("SELECT key, value FROM info").fetchall()).get("embedder") == (embedder_name(embedder) or "")
+            rows = dict(conn.execute("SELECT text_hash, row FROM chunks").fetchall()) if same_embedder else {}
+        finally:
+            conn.close()
+        return ids, rows, (np.load(vectors_path, mmap_mode="r") if rows else None)
+
+    def _new_generation(self) -> Path:
+        gen = self.db_dir / f"{self.collection_name}{GENERATION_INFIX}{time.time_ns()}"
+        gen.mkdir(parents=True)
+        return gen
+
+    def _publish(self, gen: Path, previous: Path) -> None:
+        """Point readers at `gen`, then drop generations older than `previous`."""
+        pointer = pointer_path_for(self.db_dir, self.collection_name)
+        tmp = pointer.with_name(pointer.name + ".tmp")
+        tmp.write_text(gen.name, encoding="utf-8")
+        os.replace(tmp, pointer)
+        prefix = f"{self.collection_name}{GENERATION_INFIX}"
+        for old in self.db_dir.glob(prefix + "*"):
+            if old.is_dir() and old not in (gen, previous):
+                # Best effort: on Windows a generation still mapped by a reader can't be removed yet
+                shutil.rmtree(old, ignore_errors=True)
+        if previous != self.db_dir:
+            _remove_legacy_files(self.db_dir, self.collection_name)
+
+    def build(
+        self,
+        chunks: Iterable[Dict],
+        embedder=None,
+        batch_size: int = 256,
+        progress: Optional[Callable[[int], None]] = None,
+        quantization: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """Rewrite the collection from `chunks`, embedding only text not already indexed.
+
+        Vectors of unchanged text are copied from the previous index, so a rebuild after a
+        small refresh only pays for the new or edited chunks. The new files are written
+        to a fresh generation directory that replaces the old one in a single pointer
+        swap, so concurrent readers keep seeing the complete previous index until then.
+        Returns added/updated/unchanged/deleted/total counts (plus how many chunks were
+        actually embedded).
+
+        `quantization` ("float16" or "int8") also writes a compact copy of the vectors
+        that queries scan first; see the module comment.
+        """
+        np = _lazy_import_numpy()
+        # No silent hashing fallback: a degraded index must fail, not be published as complete
+        embedder = embedder or model_embedder()
+        quantization = self._resolve_quantization(quantization)
+        self.db_dir.mkdir(parents=True, exist_ok=True)
+        previous = self.current_dir()
+        prev_ids, prev_rows, prev_mat = self._previous(previous, embedder)
+        gen = self._new_generation()
+
+        conn = self._connect(meta_path_for(gen, self.collection_name))
+        conn.executescript(
+            """
+            CREATE TABLE chunks (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL,
+                text TEXT,
+                source_type TEXT, url TEXT, video_id TEXT, comment_id TEXT, guest TEXT,
+                text_hash TEXT
+            );
+            CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "embedded": 0, "duplicates": 0}
+        blocks = []
+        rows: List[tuple] = []
+        seen: set = set()
+
+        def flush() -> None:
+            reuse = [prev_rows.get(r[-1]) for r in rows]
+            todo = [i for i, old in enumerate(reuse) if old is None]
+            fresh = None
+            if todo:
+                fresh = np.asarray(embedder(input=[rows[i][2] for i in todo]), dtype=np.float32)
+                fresh = _normalize_rows(np, fresh)
+                stats["embedded"] += len(todo)
+            dim = fresh.shape[1] if fresh is not None else prev_mat.shape[1]
+            vecs = np.empty((len(rows), dim), dtype=np.float32)
+            if todo:
+                vecs[todo] = fresh
+            keep = [i for i, old in enumerate(reuse) if old is not None]
+            if keep:
+                vecs[keep] = prev_mat[[reuse[i] for i in keep]]
+            blocks.append(vecs)
+            conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            rows.clear()
+            if progress:
+                progress(len(seen))
+
+        try:
+            for obj in chunks:
+                cid = obj.get("chunk_id") or f"auto_{len(seen)}"
+                if cid in seen:
+                    # Rows are addressed by chunk id; a repeat means the ids aren't unique
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(cid)
+                text = obj.get("text") or ""
+                text_hash = compute_text_hash(text)
+                if cid not in prev_ids:
+                    stats["added"] += 1
+                elif prev_ids[cid] != text_hash:
+                    stats["updated"] += 1
+                else:
+                    stats["unchanged"] += 1
+                rows.append((len(seen) - 1, cid, text, *(obj.get(f) for f in META_FIELDS), text_hash))
+                if len(rows) >= batch_size:
+                    flush()
+            if rows:
+                flush()
+            dim = blocks[0].shape[1] if blocks else 0
+            matrix = np.concatenate(blocks) if blocks else np.zeros((0, dim), dtype=np.float32)
+            conn.executemany(
+                "INSERT INTO info (key, value) VALUES (?, ?)",
+                [
+                    ("embedder", embedder_name(embedder) or ""),
+                    ("dim", str(dim)),
+                    ("count", str(len(seen))),
+                    ("quantization", quantization),
+                ],
+            )
+            conn.execute("CREATE INDEX idx_chunks_chunk_id ON chunks(chunk_id)")
+            conn.execute("CREATE INDEX idx_chunks_guest ON chunks(guest, source_type)")
+            conn.commit()
+            np.save(vectors_path_for(gen, self.collection_name), matrix)
+            if quantization != "float32":
+                qmat, scale = _quantize(np, matrix, quantization)
+                np.save(quantized_path_for(gen, self.collection_name, quantization), qmat)
+                if scale is not None:
+                    np.save(scale_path_for(gen, self.collection_name), scale)
+        except BaseException:
+            conn.close()
+            shutil.rmtree(gen, ignore_errors=True)
+            raise
+        conn.close()
+        prev_mat = None
+        self._publish(gen, previous)
+        self._loaded = None
+        self._embedder = None
+        stats["deleted"] = sum(1 for cid in prev_ids if cid not in seen)
+        stats["total"] = len(seen)
+        if stats["duplicates"]:
+            logger.warning("%s: skipped %d chunks whose chunk_id was already indexed", self.db_dir, stats["duplicates"])
+        return stats
+
+    def _state(self) -> Tuple[Path, object, object]:
+        """(generation dir, memory-mapped float32 matrix, quantized or None) of the live index,
+        reloaded when the pointer moves to a new generation."""
+        np = _lazy_import_numpy()
+        gen = self.current_dir()
+        st = vectors_path_for(gen, self.collection_name).stat()
+        stamp = (str(gen), st.st_mtime_ns, st.st_size, st.st_ino)
+        loaded = self._loaded
+        if loaded is None or loaded[0] != stamp:
+            matrix = np.load(vectors_path_for(gen, self.collection_name), mmap_mode="r")
+            loaded = self._loaded = (stamp, gen, matrix, self._load_quantized(np, gen))
+            self._embedder = None
+        return loaded[1], loaded[2], loaded[3]
+
+    def _load_quantized(self, np, gen: Path):
+        quantization = self.info(gen).get("quantization") or "float32"
+        qpath = quantized_path_for(gen, self.collection_name, quantization)
+        if quantization == "float32" or not qpath.exists():
+            return None
+        scale = np.load(scale_path_for(gen, self.collection_name), mmap_mode="r") if quantization == "int8" else None
+        return np.load(qpath, mmap_mode="r"), scale
+
+    def matrix(self):
+        """Memory-mapped (n, dim) float32 matrix of the live generation."""
+        return self._state()[1]
+
+    def quantized(self):
+        """(memory-mapped quantized matrix, int8 row scales or None), or None for float32-only indexes."""
+        return self._state()[2]
+
+    def _fetch_rows(self, gen: Path, row_ids: List[int]) -> Dict[int, tuple]:
+        if not row_ids:
+            return {}
+        conn = self._connect(meta_path_for(gen, self.collection_name))
+        try:
+            placeholders = ",".join("?" * len(row_ids))
+            cur = conn.execute(
+                f"SELECT row, chunk_id, text, {', '.join(META_FIELDS)} FROM chunks WHERE row IN ({placeholders})",
+                row_ids,
+            )
+            return {r[0]: r for r in cur.fetchall()}
+        finally:
+            conn.close()
+
+    def iter_chunks(self, exclude_guest: Optional[str] = None) -> Iterator[Dict]:
+        """Stored chunks as chunk dicts (optionally without one guest's), in index order."""
+        if not self.exists(self.db_dir, self.collection_name):
+            return
+        conn = self._connect()
+        try:
+            sql = f"SELECT chunk_id, text, {', '.join(META_FIELDS)} FROM chunks"
+            params: List = []
+            if exclude_guest is not None:
+                sql += " WHERE guest IS NOT ?"
+                params.append(exclude_guest)
+            for r in conn.execute(sql + " ORDER BY row", params):
+                yield {"chunk_id": r[0], "text": r[1], **dict(zip(META_FIELDS, r[2:]))}
+        finally:
+            conn.close()
+
+    def _rows_matching(self, gen: Path, where: Dict) -> List[int]:
+        clauses: List[str] = []
+        params: List = []
+        for key, value in where.items():
+            if key not in META_FIELDS:
+                raise ValueError(f"Unsupported filter field: {key}")
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            clauses.append(f"{key} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        conn = self._connect(meta_path_for(gen, self.collection_name))
+        try:
+            sql = "SELECT row FROM chunks WHERE " + " AND ".join(clauses) + " ORDER BY row"
+            return [r[0] for r in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def query(self, query_texts: List[str], n_results: int = 6, embedder=None, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """Exact cosine top-k for each query; hits use the same shape as the Chroma backend
+        (`distance` is cosine distance, 1 - similarity). `where` restricts the search to
+        chunks whose metadata matches every given field (a list value matches any of it)."""
+        np = _lazy_import_numpy()
+        if not query_texts:
+            return []
+        if not self.exists(self.db_dir, self.collection_name):
+            return [[] for _ in query_texts]
+        gen, mat, quantized = self._state()
+        candidates = None
+        if where:
+            candidates = np.asarray(self._rows_matching(gen, where), dtype=np.int64)
+        n_rows = mat.shape[0] if candidates is None else len(candidates)
+        if n_rows == 0 or n_results <= 0:
+            return [[] for _ in query_texts]
+        embedder = embedder or self.embedder()
+        q = _normalize_rows(np, np.asarray(embedder(input=list(query_texts)), dtype=np.float32))
+        if q.shape[1] != mat.shape[1]:
+            raise ValueError(f"Query embedding dim {q.shape[1]} does not match index dim {mat.shape[1]}")
+        k = min(n_results, n_rows)
+        if quantized is None:
+            scores = q @ (mat if candidates is None else mat[candidates]).T
+            top, top_scores = _top_k(np, scores, k)
+            if candidates is not None:
+                top = candidates[top]
+        else:
+            top, top_scores = self._quantized_top_k(np, q, mat, quantized, candidates, k)
+
+        rows = self._fetch_rows(gen, sorted({int(i) for i in top.ravel()}))
+        out: List[List[Dict]] = []
+        for qi in range(len(query_texts)):
+            hits: List[Dict] = []
+            for i, score in zip(top[qi], top_scores[qi]):
+                r = rows.get(int(i))
+                if r is None:
+                    continue
+                hits.append({
+                    "id": r[1],
+                    "text": r[2],
+                    "metadata": dict(zip(META_FIELDS, r[3:])),
+                    "distance": float(1.0 - score),
+                })
+            out.append(hits)
+        return out
+
+    def _quantized_top_k(self, np, q, mat, quantized, candidates, k: int):
+        """Top k rows by exact float32 score among the best candidates by quantized score."""
+        qmat, scale = quantized
+        n_rows = qmat.shape[0] if candidates is None else len(candidates)
+        coarse = np.empty((q.shape[0], n_rows), dtype=np.float32)
+        for start in range(0, n_rows, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, n_rows)
+            rows = slice(start, stop) if candidates is None else candidates[start:stop]
+            block = q @ np.asarray(qmat[rows], dtype=np.float32).T
+            if scale is not None:
+                block *= scale[rows]
+            coarse[:, start:stop] = block
+        pool, _ = _top_k(np, coarse, min(n_rows, max(k * RERANK_FACTOR, RERANK_MIN)))
+        if candidates is not None:
+            pool = candidates[pool]
+        # One sorted gather from the float32 map serves every query's candidates
+        unique = np.unique(pool)
+        exact = np.take_along_axis(q @ np.asarray(mat[unique]).T, np.searchsorted(unique, pool), axis=1)
+        pos, top_scores = _top_k(np, exact, k)
+        return np.take_along_axis(pool, pos, axis=1), top_scores
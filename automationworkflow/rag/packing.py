@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from llm.tokens import count_tokens
+from rag.hybrid import tokenize
+
+
+# Shared prompt-context packer: candidate passages (best first) lose near-duplicates,
+# are reordered by maximal marginal relevance so similar passages don't crowd out
+# distinct evidence, and are added until the token budget (llm.tokens.context_budget)
+# is spent.
+
+MMR_LAMBDA = 0.7
+DUPLICATE_THRESHOLD = 0.8
+MAX_PASSAGE_TOKENS = 300
+
+
+def _term_vector(text: str) -> Dict[str, float]:
+    counts: Dict[str, float] = {}
+    for t in tokenize(text):
+        counts[t] = counts.get(t, 0.0) + 1.0
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {t: c / norm for t, c in counts.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(t, 0.0) for t, w in a.items())
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    toks = tokenize(text)
+    if len(toks) < n:
+        return {" ".join(toks)} if toks else set()
+    return {" ".join(toks[i:i + n]) for i in range(len(toks) - n + 1)}
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + " …"
+
+
+def pack_context(
+    passages: Sequence[Dict],
+    budget_tokens: int,
+    query: Optional[str] = None,
+    text_key: str = "text",
+    mmr_lambda: float = MMR_LAMBDA,
+    duplicate_threshold: float = DUPLICATE_THRESHOLD,
+    max_passage_tokens: int = MAX_PASSAGE_TOKENS,
+    model: Optional[str] = None,
+) -> Tuple[List[Dict], Dict]:
+    """Pick passages for a prompt. `passages` are ranked best first; returns (packed, stats).
+
+    Passages whose word 3-gram Jaccard overlap with an earlier one reaches
+    `duplicate_threshold` are dropped. The rest are ordered by MMR, with relevance
+    taken from the input rank (blended with term overlap with `query` when given),
+    and each is cut to `max_passage_tokens` and added while it fits `budget_tokens`.
+    Packed passages are copies of the inputs in selection order. Tokens are counted
+    with `model`'s tokenizer when available (llm/tokens.py).
+    """
+    items: List[Dict] = []
+    kept_shingles: List[set] = []
+    duplicates = 0
+    for p in passages:
+        text = (p.get(text_key) or "").strip()
+        if not text:
+            continue
+        sh = _shingles(text)
+        if any(sh and len(sh & other) / len(sh | other) >= duplicate_threshold for other in kept_shingles):
+            duplicates += 1
+            continue
+        kept_shingles.append(sh)
+        items.append({"passage": p, "text": _truncate(text, max_passage_tokens), "vec": _term_vector(text)})
+
+    n = len(items)
+    query_vec = _term_vector(query) if query else None
+    for rank, item in enumerate(items):
+        relevance = 1.0 - rank / max(1, n)
+        if query_vec:
+            relevance = 0.5 * relevance + 0.5 * _cosine(query_vec, item["vec"])
+        item["relevance"] = relevance
+
+    packed: List[Dict] = []
+    used = 0
+    remaining = list(range(n))
+    max_sim = [0.0] * n
+    while remaining and used < budget_tokens:
+        best = max(remaining, key=lambda i: mmr_lambda * items[i]["relevance"] - (1 - mmr_lambda) * max_sim[i])
+        remaining.remove(best)
+        item = items[best]
+        cost = count_tokens(item["text"], model)
+        if used + cost > budget_tokens:
+            continue
+        used += cost
+        packed.append({**item["passage"], text_key: item["text"]})
+        for i in remaining:
+            max_sim[i] = max(max_sim[i], _cosine(item["vec"], items[i]["vec"]))
+    stats = {
+        "candidates": len(passages),
+        "duplicates": duplicates,
+        "packed": len(packed),
+        "tokens": used,
+        "budget": budget_tokens,
+    }
+    return packed, stats
@@ -1,8 +1,21 @@
 from __future__ import annotations
 
-import json
+import logging
+import os
+import threading
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rag.embeddings import embedder_name, model_embedder
+from utils.io import iter_jsonl
+from utils.normalize import compute_text_hash
+
+
+logger = logging.getLogger(__name__)
+
+VECTOR_BACKEND_ENV = "VECTOR_BACKEND"
+BACKENDS = ("chroma", "numpy")
 
 
 def _lazy_import_chroma():
@@ -11,58 +24,380 @@ def _lazy_import_chroma():
     return chromadb
 
 
-def build_index(chunks_path: Path, db_dir: Path, collection_name: str = "guest_chunks") -> Tuple[int, str]:
-    chroma = _lazy_import_chroma()
-    client = chroma.PersistentClient(path=str(db_dir))
-    coll = client.get_or_create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
+# Process-wide handles keyed by resolved db_dir, so repeated queries (agent 2 probes,
+# chatbot turns) skip client startup, collection load and embedder initialisation.
+_clients: Dict[str, object] = {}
+_collections: Dict[tuple, object] = {}
+_numpy_stores: Dict[tuple, object] = {}
+_registry_lock = threading.RLock()
+
+
+def _registry_key(db_dir: Path) -> str:
+    return str(Path(db_dir).resolve())
+
+
+def get_client(db_dir: Path):
+    key = _registry_key(db_dir)
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _lazy_import_chroma().PersistentClient(path=key)
+        return client
+
+
+def get_collection(db_dir: Path, collection_name: str = "guest_chunks", embedder=None):
+    """Cached collection handle. Without an explicit `embedder` the configured model
+    embedder (with its vector cache) is used for both indexing and queries."""
+    if embedder is None:
+        embedder = model_embedder()
+    key = (_registry_key(db_dir), collection_name, embedder_name(embedder) or id(embedder))
+    with _registry_lock:
+        coll = _collections.get(key)
+        if coll is None:
+            coll = get_client(db_dir).get_or_create_collection(
+                name=collection_name, metadata={"hnsw:space": "cosine"}, embedding_function=embedder
+            )
+            _collections[key] = coll
+        return coll
+
+
+def get_numpy_store(db_dir: Path, collection_name: str = "guest_chunks"):
+    from rag.numpy_store import NumpyVectorStore
+    key = (_registry_key(db_dir), collection_name)
+    with _registry_lock:
+        store = _numpy_stores.get(key)
+        if store is None:
+            store = _numpy_stores[key] = NumpyVectorStore(db_dir, collection_name)
+        return store
+
+
+def invalidate(db_dir: Path, release_client: bool = False) -> None:
+    """Forget cached handles for `db_dir` after a rebuild; `release_client` also drops
+    the Chroma client (e.g. before deleting the directory)."""
+    key = _registry_key(db_dir)
+    with _registry_lock:
+        for k in [k for k in _collections if k[0] == key]:
+            del _collections[k]
+        for k in [k for k in _numpy_stores if k[0] == key]:
+            del _numpy_stores[k]
+        client = _clients.pop(key, None) if release_client else None
+    if client is not None:
+        try:
+            client.clear_system_cache()
+        except Exception:
+            pass
+
+
+def resolve_backend(db_dir: Path, collection_name: str = "guest_chunks", backend: Optional[str] = None) -> str:
+    """Explicit `backend`, else $VECTOR_BACKEND, else whichever index exists in `db_dir` (Chroma by default)."""
+    backend = (backend or os.getenv(VECTOR_BACKEND_ENV) or "").strip().lower()
+    if not backend:
+        from rag.numpy_store import NumpyVectorStore
+        only_numpy = NumpyVectorStore.exists(db_dir, collection_name) and not (Path(db_dir) / "chroma.sqlite3").exists()
+        backend = "numpy" if only_numpy else "chroma"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    return backend
+
+
+UPSERT_BATCH_SIZE = 5000
+_GET_PAGE_SIZE = 10000
+
+# Cross-guest index: one collection for every guest, ids "<guest>::<chunk_id>" (chunk ids
+# are only unique within a guest) and `guest` metadata to filter on.
+GLOBAL_DIRNAME = "_global"
+GLOBAL_ID_SEP = "::"
+WHERE_FIELDS = ("guest", "source_type", "video_id", "comment_id", "url")
+
+
+def global_db_dir(outputs_root: Path) -> Path:
+    return Path(outputs_root) / GLOBAL_DIRNAME / "chroma"
+
+
+def _scoped_chunks(chunks: Iterable[Dict], guest: Optional[str]) -> Iterator[Dict]:
+    """Chunks as stored in the index: in the global collection, ids carry the guest prefix."""
+    for n, obj in enumerate(chunks):
+        if guest is None:
+            yield obj
+        else:
+            cid = obj.get("chunk_id") or f"auto_{n}"
+            yield {**obj, "chunk_id": f"{guest}{GLOBAL_ID_SEP}{cid}", "guest": guest}
+
+
+def _chroma_where(where: Optional[Dict]) -> Optional[Dict]:
+    """{"guest": "A", "source_type": ["x", "y"]} -> Chroma's $and/$in filter syntax."""
+    if not where:
+        return None
+    clauses = []
+    for key, value in where.items():
+        if key not in WHERE_FIELDS:
+            raise ValueError(f"Unsupported filter field: {key}")
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": list(value)}})
+        else:
+            clauses.append({key: value})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
 
+def _chunk_meta(obj: Dict, text_hash: str, embedder: Optional[str] = None) -> Dict:
+    meta = {
+        "source_type": obj.get("source_type"),
+        "url": obj.get("url"),
+        "video_id": obj.get("video_id"),
+        "comment_id": obj.get("comment_id"),
+        "guest": obj.get("guest"),
+        "text_hash": text_hash,
+        # Vectors are only comparable to queries embedded by the same model
+        "embedder": embedder,
+    }
+    # Chroma only accepts scalar metadata values
+    return {k: v for k, v in meta.items() if v is not None}
+
+
+def _existing_metas(coll, where: Optional[Dict] = None) -> Dict[str, Dict]:
+    """chunk_id -> stored metadata for everything in the collection (matching `where`), read page by page."""
+    out: Dict[str, Dict] = {}
+    offset = 0
+    while True:
+        res = coll.get(where=_chroma_where(where), include=["metadatas"], limit=_GET_PAGE_SIZE, offset=offset)
+        ids = res.get("ids") or []
+        for cid, meta in zip(ids, res.get("metadatas") or [None] * len(ids)):
+            out[cid] = meta or {}
+        if len(ids) < _GET_PAGE_SIZE:
+            return out
+        offset += len(ids)
+
+
+def _batch_size(client) -> int:
+    limit = None
+    try:
+        getter = getattr(client, "get_max_batch_size", None)
+        limit = getter() if callable(getter) else getattr(client, "max_batch_size", None)
+    except Exception:
+        pass
+    return min(UPSERT_BATCH_SIZE, limit) if limit else UPSERT_BATCH_SIZE
+
+
+def sync_index(
+    chunks_path: Path,
+    db_dir: Path,
+    collection_name: str = "guest_chunks",
+    backend: Optional[str] = None,
+    embedder=None,
+    guest: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None,
+    quantization: Optional[str] = None,
+) -> Dict[str, int]:
+    """Bring the index in line with `chunks_path`, embedding only what changed.
+
+    Chunks are diffed against the collection by chunk ID, text hash and embedding model:
+    new or changed chunks (including any embedded by a different model) are upserted in
+    large batches, unchanged ones are skipped and chunks that are no longer in the file
+    are deleted. Returns added/updated/unchanged/deleted/total counts. Without an explicit
+    `embedder` the configured model is required; a build never falls back to hashing.
+
+    With `guest`, `db_dir` is treated as the shared cross-guest index: ids are prefixed
+    with the guest and only that guest's chunks are diffed or deleted.
+
+    `progress` is called with the number of chunks processed so far after every batch.
+    Chroma batches are queryable as soon as they are upserted, so a smaller `batch_size`
+    makes a build in progress usable sooner.
+
+    `quantization` (numpy backend only: "float32", "float16" or "int8", default
+    $VECTOR_QUANTIZATION or the index's current setting) adds a compact vector copy
+    that queries scan before an exact float32 re-rank.
+    """
+    chunks = _scoped_chunks(iter_jsonl(Path(chunks_path)), guest)
+    try:
+        if resolve_backend(db_dir, collection_name, backend) == "numpy":
+            store = get_numpy_store(db_dir, collection_name)
+            if guest is not None:
+                # The matrix is rewritten as a whole; other guests' vectors are copied, not re-embedded
+                chunks = chain(store.iter_chunks(exclude_guest=guest), chunks)
+            return store.build(
+                chunks, embedder=embedder, batch_size=batch_size or 256, progress=progress, quantization=quantization
+            )
+        where = {"guest": guest} if guest is not None else None
+        return _sync_chroma(chunks, db_dir, collection_name, embedder, where=where, batch_size=batch_size, progress=progress)
+    finally:
+        invalidate(db_dir)
+
+
+def sync_global_index(
+    outputs_root: Path, guest: str, backend: Optional[str] = None, embedder=None, quantization: Optional[str] = None
+) -> Dict[str, int]:
+    """Add or refresh one guest's chunks in the cross-guest index under outputs/_global."""
+    chunks_path = Path(outputs_root) / guest / "chunks.jsonl"
+    return sync_index(
+        chunks_path, global_db_dir(outputs_root), backend=backend, embedder=embedder, guest=guest, quantization=quantization
+    )
+
+
+def remove_from_global_index(outputs_root: Path, guest: str, backend: Optional[str] = None) -> None:
+    """Drop one guest's chunks from the cross-guest index (e.g. when the guest is deleted)."""
+    db_dir = global_db_dir(outputs_root)
+    if not db_dir.exists():
+        return
+    try:
+        if resolve_backend(db_dir, backend=backend) == "numpy":
+            store = get_numpy_store(db_dir)
+            store.build(store.iter_chunks(exclude_guest=guest), embedder=store.embedder())
+        else:
+            get_collection(db_dir).delete(where=_chroma_where({"guest": guest}))
+    finally:
+        invalidate(db_dir)
+
+
+def _sync_chroma(
+    chunks: Iterable[Dict],
+    db_dir: Path,
+    collection_name: str,
+    embedder,
+    where: Optional[Dict] = None,
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, int]:
+    if embedder is None:
+        embedder = model_embedder()
+    model = embedder_name(embedder) or type(embedder).__name__
+    coll = get_collection(db_dir, collection_name, embedder=embedder)
+    existing = _existing_metas(coll, where=where)
+    limit = _batch_size(get_client(db_dir))
+    batch_size = min(batch_size, limit) if batch_size else limit
+
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "duplicates": 0}
     ids: List[str] = []
     docs: List[str] = []
     metas: List[Dict] = []
-    # Read chunks.jsonl
-    count = 0
-    with Path(chunks_path).open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            obj = json.loads(line)
-            cid = obj.get("chunk_id") or f"auto_{count}"
-            txt = obj.get("text") or ""
-            meta = {
-                "source_type": obj.get("source_type"),
-                "url": obj.get("url"),
-                "video_id": obj.get("video_id"),
-                "comment_id": obj.get("comment_id"),
-                "guest": obj.get("guest"),
-            }
-            ids.append(cid)
-            docs.append(txt)
-            metas.append(meta)
-            count += 1
-            if count % 1000 == 0:
-                coll.add(ids=ids, documents=docs, metadatas=metas)
-                ids, docs, metas = [], [], []
+    seen: set = set()
+    for obj in chunks:
+        cid = obj.get("chunk_id") or f"auto_{len(seen)}"
+        if cid in seen:
+            # One id can hold one vector; a repeat means the chunk ids aren't unique
+            stats["duplicates"] += 1
+            continue
+        seen.add(cid)
+        txt = obj.get("text") or ""
+        meta = _chunk_meta(obj, compute_text_hash(txt), model)
+        old = existing.get(cid)
+        if old == meta:
+            stats["unchanged"] += 1
+            continue
+        stats["added" if old is None else "updated"] += 1
+        ids.append(cid)
+        docs.append(txt)
+        metas.append(meta)
+        if len(ids) >= batch_size:
+            coll.upsert(ids=ids, documents=docs, metadatas=metas)
+            ids, docs, metas = [], [], []
+            if progress:
+                progress(len(seen))
     if ids:
-        coll.add(ids=ids, documents=docs, metadatas=metas)
-    return count, str(db_dir)
-
-
-def query(db_dir: Path, query_text: str, n_results: int = 6, collection_name: str = "guest_chunks") -> List[Dict]:
-    chroma = _lazy_import_chroma()
-    client = chroma.PersistentClient(path=str(db_dir))
-    coll = client.get_or_create_collection(name=collection_name)
-    res = coll.query(query_texts=[query_text], n_results=n_results)
-    out: List[Dict] = []
-    for i in range(len(res.get("ids", [[]])[0])):
-        out.append({
-            "id": res["ids"][0][i],
-            "text": res["documents"][0][i],
-            "metadata": res["metadatas"][0][i],
-            "distance": res.get("distances", [[None]])[0][i],
-        })
+        coll.upsert(ids=ids, documents=docs, metadatas=metas)
+    if progress:
+        progress(len(seen))
+
+    stale = [cid for cid in existing if cid not in seen]
+    for i in range(0, len(stale), batch_size):
+        coll.delete(ids=stale[i:i + batch_size])
+    stats["deleted"] = len(stale)
+    stats["total"] = len(seen)
+    if stats["duplicates"]:
+        logger.warning("%s: skipped %d chunks whose chunk_id was already indexed", db_dir, stats["duplicates"])
+    return stats
+
+
+def build_index(
+    chunks_path: Path,
+    db_dir: Path,
+    collection_name: str = "guest_chunks",
+    backend: Optional[str] = None,
+    embedder=None,
+) -> Tuple[int, str]:
+    """Incrementally (re)build the index; returns (chunks indexed, db_dir). See `sync_index`."""
+    stats = sync_index(chunks_path, db_dir, collection_name=collection_name, backend=backend, embedder=embedder)
+    return stats["total"], str(db_dir)
+
+
+def _search(
+    db_dir: Path,
+    query_texts: List[str],
+    n_results: int,
+    collection_name: str,
+    backend: Optional[str],
+    embedder,
+    where: Optional[Dict] = None,
+) -> List[List[Dict]]:
+    """One batched search: all queries are embedded and scored in a single call."""
+    if resolve_backend(db_dir, collection_name, backend) == "numpy":
+        return get_numpy_store(db_dir, collection_name).query(query_texts, n_results=n_results, embedder=embedder, where=where)
+
+    coll = get_collection(db_dir, collection_name, embedder=embedder)
+    kwargs = {"where": _chroma_where(where)} if where else {}
+    res = coll.query(query_texts=query_texts, n_results=n_results, **kwargs)
+    ids = res.get("ids") or []
+    docs = res.get("documents") or [[None] * len(r) for r in ids]
+    metas = res.get("metadatas") or [[{}] * len(r) for r in ids]
+    dists = res.get("distances") or [[None] * len(r) for r in ids]
+    out: List[List[Dict]] = []
+    for qi in range(len(query_texts)):
+        hits: List[Dict] = []
+        for i in range(len(ids[qi]) if qi < len(ids) else 0):
+            hits.append({
+                "id": ids[qi][i],
+                "text": docs[qi][i],
+                "metadata": metas[qi][i] or {},
+                "distance": dists[qi][i],
+            })
+        out.append(hits)
     return out
 
 
+def query_many(
+    db_dir: Path,
+    query_texts: List[str],
+    n_results: int = 6,
+    collection_name: str = "guest_chunks",
+    backend: Optional[str] = None,
+    embedder=None,
+    dedupe: bool = True,
+    where: Optional[Dict] = None,
+) -> List[List[Dict]]:
+    """Search several queries in one batch; returns one hit list per query, in order.
 
+    With `dedupe`, a chunk is only returned for the first query that retrieves it;
+    later queries are over-fetched so each can still fill `n_results` with new chunks.
+    `where` filters on metadata, e.g. {"guest": "A", "source_type": ["web_article"]}.
+    """
+    if not query_texts:
+        return []
+    fetch = n_results * len(query_texts) if dedupe else n_results
+    results = _search(db_dir, list(query_texts), fetch, collection_name, backend, embedder, where)
+    if not dedupe:
+        return results
+    seen: set = set()
+    out: List[List[Dict]] = []
+    for hits in results:
+        kept: List[Dict] = []
+        for hit in hits:
+            if hit["id"] in seen:
+                continue
+            seen.add(hit["id"])
+            kept.append(hit)
+            if len(kept) >= n_results:
+                break
+        out.append(kept)
+    return out
 
 
+def query(
+    db_dir: Path,
+    query_text: str,
+    n_results: int = 6,
+    collection_name: str = "guest_chunks",
+    backend: Optional[str] = None,
+    embedder=None,
+    where: Optional[Dict] = None,
+) -> List[Dict]:
+    return _search(db_dir, [query_text], n_results, collection_name, backend, embedder, where)[0]
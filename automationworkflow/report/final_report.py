@@ -2,8 +2,14 @@ from __future__ import annotations
 
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
+
+from llm.client import chat_json
+from llm.tokens import compact_context, remaining_budget
+from storage import guest_corpus
+from utils.io import read_jsonl
 
 
 def _read_json(path: Path) -> Dict:
@@ -15,45 +21,33 @@ def _read_json(path: Path) -> Dict:
         return {}
 
 
-def _read_jsonl(path: Path) -> List[Dict]:
-    if not path.exists():
-        return []
-    out: List[Dict] = []
+def _call_openai_json(messages: List[Dict], model: str = "gpt-4o") -> Dict:
+    """Report sections are optional: no API key or a failed call yields {}."""
+    if not os.getenv("OPENAI_API_KEY"):
+        return {}
     try:
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    out.append(json.loads(line))
-                except Exception:
-                    continue
+        return chat_json(messages, model=model, temperature=0.2, timeout=180)
     except Exception:
-        return []
-    return out
+        return {}
 
 
-def _call_openai_json(messages: List[Dict], model: str = "gpt-4o") -> Dict:
-    import requests
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return {}
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {
-        "model": model,
-        "response_format": {"type": "json_object"},
-        "messages": messages,
-        "temperature": 0.2,
-    }
+def _retrieve_snippets(guest_dir: Path, probes: List[str], n_results: int = 3, max_chars: int = 800) -> List[Dict]:
+    """Vector-retrieved chunks for several probes in one batched query; empty if the guest has no index."""
+    db_dir = guest_dir / "chroma"
+    if not db_dir.exists():
+        return []
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=180)
-        r.raise_for_status()
-        content = r.json()["choices"][0]["message"]["content"]
-        return json.loads(content)
+        from rag.vectorstore import query_many
+        batches = query_many(db_dir, probes, n_results=n_results)
     except Exception:
-        return {}
+        return []
+    out: List[Dict] = []
+    for hits in batches:
+        for hit in hits:
+            text = (hit.get("text") or "").strip()
+            if text:
+                out.append({"title": "retrieved", "url": (hit.get("metadata") or {}).get("url"), "text": text[:max_chars]})
+    return out
 
 
 def _build_about_sections(guest: str, guest_dir: Path, model: str = "gpt-4o") -> Dict:
@@ -78,21 +72,25 @@ def _build_about_sections(guest: str, guest_dir: Path, model: str = "gpt-4o") ->
             pass
 
     # Gather compact context from Agent 1 outputs
-    about = _read_jsonl(guest_dir / "about_guest.jsonl")
-    web = _read_jsonl(guest_dir / "web.jsonl")
-    yt = _read_jsonl(guest_dir / "raw" / "youtube.jsonl")
+    about = read_jsonl(guest_dir / "about_guest.jsonl")
+    web = guest_corpus.web_records(guest_dir, limit=8)
 
     about_text = (about[0] or {}).get("summary", "") if about else ""
     web_snips: List[Dict] = []
-    for r in web[:8]:
+    for r in web:
         if (r.get("text") or "").strip():
             web_snips.append({"title": r.get("title"), "url": r.get("url"), "text": (r.get("text") or "")[:800]})
     # A few transcript snippets for concrete milestones
-    transcripts = [r for r in yt if r.get("source_type") == "youtube_transcript" and r.get("text")]
+    transcripts = [r for r in guest_corpus.transcripts(guest_dir, limit=8) if r.get("text")]
     for t in transcripts[:4]:
         web_snips.append({"title": "yt_transcript", "url": f"https://www.youtube.com/watch?v={t.get('video_id')}", "text": (t.get("text") or "")[:800]})
+    web_snips += _retrieve_snippets(guest_dir, [
+        f"{guest} early life and background",
+        f"{guest} turning point",
+        f"{guest} breakthrough and recognition",
+        f"{guest} recent focus",
+    ])
 
-    context_json = json.dumps({"about": about_text, "sources": web_snips}, ensure_ascii=False)
     system = (
         "You are a biographical editor. Structure key life milestones and insights from the given context. "
         "Return strict JSON with keys: {\n"
@@ -106,7 +104,14 @@ def _build_about_sections(guest: str, guest_dir: Path, model: str = "gpt-4o") ->
         "}\n"
         "Formatting rules for timeline bullets: Start each item with a year or date when identifiable (YYYY or YYYY-MM). If unknown, use 'n.d.'. Then an en dash and a concise description, e.g., '2018 — Joined X'."
     )
-    user = f"Guest: {guest}\n\nContext JSON:\n{context_json}"
+    context, _ = compact_context(
+        {"about": about_text, "sources": web_snips},
+        remaining_budget(model, [system, f"Guest: {guest}\n\nContext JSON:\n"]),
+        ["about", "sources"],
+        model=model,
+        label="report about sections",
+    )
+    user = f"Guest: {guest}\n\nContext JSON:\n{json.dumps(context, ensure_ascii=False)}"
     messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
     result = _call_openai_json(messages, model=model)
     if result:
@@ -128,7 +133,7 @@ def _build_communication_assessment(guest: str, guest_dir: Path, model: str = "g
             return json.loads(out_path.read_text(encoding="utf-8"))
         except Exception:
             pass
-    about = _read_jsonl(guest_dir / "about_guest.jsonl")
+    about = read_jsonl(guest_dir / "about_guest.jsonl")
     plan = _read_json(guest_dir / "agent3" / "plan.json")
     topics = plan.get("topics", []) if plan else []
     questions = plan.get("questions", []) if plan else []
@@ -163,8 +168,8 @@ def _build_podcast_appearances(guest: str, guest_dir: Path, model: str = "gpt-4o
             return json.loads(out_path.read_text(encoding="utf-8"))
         except Exception:
             pass
-    web = _read_jsonl(guest_dir / "web.jsonl")
-    yt = _read_jsonl(guest_dir / "raw" / "youtube.jsonl")
+    web = guest_corpus.web_records(guest_dir, with_text=False)
+    yt = guest_corpus.videos(guest_dir)
     candidates: List[Dict] = []
     for r in web:
         title = (r.get("title") or "").lower()
@@ -205,7 +210,7 @@ def _build_topic_deep_dive(guest: str, guest_dir: Path, model: str = "gpt-4o") -
             return json.loads(out_path.read_text(encoding="utf-8"))
         except Exception:
             pass
-    about = _read_jsonl(guest_dir / "about_guest.jsonl")
+    about = read_jsonl(guest_dir / "about_guest.jsonl")
     plan = _read_json(guest_dir / "agent3" / "plan.json")
     about_text = (about[0] or {}).get("summary", "") if about else ""
     topics = plan.get("topics", []) if plan else []
@@ -237,8 +242,7 @@ def _build_shorts_ideas(guest: str, guest_dir: Path, model: str = "gpt-4o") -> L
             return json.loads(out_path.read_text(encoding="utf-8"))
         except Exception:
             pass
-    yt = _read_jsonl(guest_dir / "raw" / "youtube.jsonl")
-    videos = [r for r in yt if r.get("source_type") == "youtube_video"]
+    videos = guest_corpus.videos(guest_dir, limit=12)
     links = [{"title": v.get("title"), "url": v.get("url") or f"https://www.youtube.com/watch?v={v.get('video_id')}"} for v in videos[:12]]
     context = {"videos": links}
     system = (
@@ -256,6 +260,56 @@ def _build_shorts_ideas(guest: str, guest_dir: Path, model: str = "gpt-4o") -> L
         pass
     return items
 
+# Sections generated by their own LLM call, with the file each builder caches to
+REPORT_SECTION_FILES = {
+    "about_sections": "about_sections.json",
+    "topics_blocks": "topics_blocks.json",
+    "appearances": "appearances.json",
+    "communication": "communication.json",
+    "shorts": "shorts_ideas.json",
+}
+
+
+def _section_builder(name: str):
+    return {
+        "about_sections": _build_about_sections,
+        "topics_blocks": _build_topics_blocks,
+        "appearances": _build_podcast_appearances,
+        "communication": _build_communication_assessment,
+        "shorts": _build_shorts_ideas,
+    }[name]
+
+
+def _report_sections(guest: str, guest_dir: Path, names: List[str]) -> Dict[str, Any]:
+    """Results of the named section builders, keyed by name.
+
+    The sections are independent, so every one without a cache file is started at
+    once on its own thread (the LLM client bounds actual request concurrency);
+    cached ones are just read. Callers then assemble the document in order.
+    """
+    uncached = [n for n in names if not (guest_dir / REPORT_SECTION_FILES[n]).exists()]
+    if len(uncached) < 2:
+        return {n: _section_builder(n)(guest, guest_dir) for n in names}
+    with ThreadPoolExecutor(max_workers=len(uncached), thread_name_prefix="report-section") as pool:
+        futures = {n: pool.submit(_section_builder(n), guest, guest_dir) for n in uncached}
+        results = {n: _section_builder(n)(guest, guest_dir) for n in names if n not in futures}
+        results.update({n: f.result() for n, f in futures.items()})
+    return results
+
+
+def _wanted_sections(about_text: str, link_sections: Dict[str, List[str]], plan_obj: Dict) -> List[str]:
+    """Sections the report will actually render, mirroring the assembly conditions."""
+    names = []
+    if about_text:
+        names.append("about_sections")
+    if link_sections.get("books"):
+        names += ["topics_blocks", "appearances"]
+    names.append("communication")
+    if plan_obj:
+        names.append("shorts")
+    return names
+
+
 def _format_about_sections_markdown(sections: Dict) -> str:
     if not sections:
         return ""
@@ -305,26 +359,37 @@ def _build_topics_blocks(guest: str, guest_dir: Path, model: str = "gpt-4o") ->
             return json.loads(out_path.read_text(encoding="utf-8"))
         except Exception:
             pass
-    about = _read_jsonl(guest_dir / "about_guest.jsonl")
-    web = _read_jsonl(guest_dir / "web.jsonl")
-    yt = _read_jsonl(guest_dir / "raw" / "youtube.jsonl")
+    about = read_jsonl(guest_dir / "about_guest.jsonl")
+    web = guest_corpus.web_records(guest_dir, limit=12, with_text=False)
     plan = _read_json(guest_dir / "agent3" / "plan.json")
     topics = plan.get("topics", []) if plan else []
     questions = plan.get("questions", []) if plan else []
-    comments = [r for r in yt if (r.get("source_type") or "").startswith("youtube_comment")]
-    comments = sorted(comments, key=lambda c: int(c.get("like_count", 0) or 0), reverse=True)[:120]
+    comments = guest_corpus.top_comments(guest_dir, limit=120)
 
     context = {
         "about": (about[0] or {}).get("summary", "") if about else "",
         "web": [{"title": r.get("title"), "url": r.get("url")} for r in web[:12]],
         "plan_topics": [t.get("title") for t in topics[:10]],
         "plan_questions": [q.get("q") for q in questions[:15]],
-        "top_comments": [c.get("text") for c in comments[:60]],
+        "top_comments": [c.get("text") for c in comments],
+        "retrieved": [r["text"] for r in _retrieve_snippets(guest_dir, [
+            f"{guest} recurring story",
+            f"{guest} strong opinion",
+            f"{guest} rarely discussed",
+        ], max_chars=500)],
     }
     system = (
         "You are an editorial strategist. From the context, list recurring narratives and fresh angles. "
         "Return strict JSON: {\"common_topics\": [string], \"unexplored_depths\": [string]}"
     )
+    # Comments are the first to go when the context outgrows the model's prompt budget
+    context, _ = compact_context(
+        context,
+        remaining_budget(model, [system, f"Guest: {guest}\n\nContext JSON:\n"]),
+        ["about", "plan_topics", "plan_questions", "retrieved", "web", "top_comments"],
+        model=model,
+        label="report topics blocks",
+    )
     user = f"Guest: {guest}\n\nContext JSON:\n{json.dumps(context, ensure_ascii=False)}"
     messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
     result = _call_openai_json(messages, model=model)
@@ -336,10 +401,10 @@ def _build_topics_blocks(guest: str, guest_dir: Path, model: str = "gpt-4o") ->
     return result or {}
 
 def _summarize_agent1(guest_dir: Path) -> Tuple[str, Dict[str, List[str]], List[str], List[Dict]]:
-    about = _read_jsonl(guest_dir / "about_guest.jsonl")
-    web = _read_jsonl(guest_dir / "web.jsonl")
-    books = _read_jsonl(guest_dir / "books_written.jsonl")
-    social = _read_jsonl(guest_dir / "social_bio.jsonl")
+    about = read_jsonl(guest_dir / "about_guest.jsonl")
+    web = guest_corpus.web_records(guest_dir, limit=10, with_text=False)
+    books = read_jsonl(guest_dir / "books_written.jsonl")
+    social = read_jsonl(guest_dir / "social_bio.jsonl")
 
     about_text = ""
     if about:
@@ -366,17 +431,16 @@ def _summarize_agent1(guest_dir: Path) -> Tuple[str, Dict[str, List[str]], List[
             link_sections["social"].append(f"- [Social]({url})")
 
     stats: List[str] = []
-    youtube = _read_jsonl(guest_dir / "raw" / "youtube.jsonl")
+    counts = guest_corpus.source_type_counts(guest_dir)
     # YouTube video links
-    yt_videos = [r for r in youtube if r.get("source_type") == "youtube_video"]
-    for v in yt_videos[:10]:
+    for v in guest_corpus.videos(guest_dir, limit=10):
         url = v.get("url") or (f"https://www.youtube.com/watch?v={v.get('video_id')}" if v.get("video_id") else None)
         title = (v.get("title") or url or "").strip()
         if url:
             link_sections["youtube"].append(f"- [{title}]({url})")
-    videos = len(yt_videos)
-    comments = sum(1 for r in youtube if (r.get("source_type") or "").startswith("youtube_comment"))
-    transcripts = sum(1 for r in youtube if r.get("source_type") == "youtube_transcript")
+    videos = counts.get("youtube_video", 0)
+    comments = counts.get("youtube_comment", 0) + counts.get("youtube_comment_reply", 0)
+    transcripts = counts.get("youtube_transcript", 0)
     if any([videos, comments, transcripts]):
         stats.append(f"YouTube videos: {videos}")
         stats.append(f"Transcripts: {transcripts}")
@@ -406,7 +470,7 @@ def _format_north_star(north_star_obj: Dict) -> str:
     return "\n".join(lines)
 
 
-def _format_plan(plan_obj: Dict, comment_analysis: Optional[Dict] = None, *, guest: str = "", guest_dir: Optional[Path] = None) -> str:
+def _format_plan(plan_obj: Dict, comment_analysis: Optional[Dict] = None, *, guest: str = "", guest_dir: Optional[Path] = None, shorts: Optional[List[Dict]] = None) -> str:
     lines: List[str] = []
     outline = plan_obj.get("outline", [])
     if outline:
@@ -623,7 +687,8 @@ def _format_plan(plan_obj: Dict, comment_analysis: Optional[Dict] = None, *, gue
         lines.append("")
 
     # Shorts/Reels ideas
-    shorts = _build_shorts_ideas(guest, guest_dir) if guest and guest_dir else []
+    if shorts is None:
+        shorts = _build_shorts_ideas(guest, guest_dir) if guest and guest_dir else []
     if shorts:
         lines.append("### Shorts / Reels ideas")
         for it in shorts[:10]:
@@ -716,7 +781,7 @@ def build_markdown_report(guest: str, guest_dir: Path) -> str:
     north_star_obj = _read_json(north_star_path)
     plan_obj = _read_json(plan_path)
     comment_analysis = _read_json(guest_dir / "agent3" / "comment_analysis.json")
-    comment_analysis = _read_json(guest_dir / "agent3" / "comment_analysis.json")
+    sections = _report_sections(guest, guest_dir, _wanted_sections(about_text, link_sections, plan_obj))
 
     lines: List[str] = []
     lines.append(f"# Final Interview Research Report — {guest}")
@@ -726,7 +791,7 @@ def build_markdown_report(guest: str, guest_dir: Path) -> str:
         lines.append(about_text)
         lines.append("")
         # Optional structured subsections (generate if missing)
-        about_sections = _build_about_sections(guest, guest_dir)
+        about_sections = sections["about_sections"]
         if about_sections:
             lines.append(_format_about_sections_markdown(about_sections))
         if about_sources:
@@ -772,7 +837,7 @@ def build_markdown_report(guest: str, guest_dir: Path) -> str:
             lines.extend(books)
             lines.append("")
             # Insert Common topics / Unexplored depths after books
-            topics_blocks = _build_topics_blocks(guest, guest_dir)
+            topics_blocks = sections["topics_blocks"]
             if topics_blocks:
                 if (topics_blocks.get("common_topics") or []):
                     lines.append("### Common topics / stories")
@@ -785,7 +850,7 @@ def build_markdown_report(guest: str, guest_dir: Path) -> str:
                         lines.append(f"- {it}")
                     lines.append("")
             # Insert Podcast appearances
-            appearances = _build_podcast_appearances(guest, guest_dir)
+            appearances = sections["appearances"]
             if appearances:
                 lines.append("### Podcast appearances")
                 for a in appearances[:10]:
@@ -816,7 +881,7 @@ def build_markdown_report(guest: str, guest_dir: Path) -> str:
         lines.append("")
 
     # Communication assessment
-    comm = _build_communication_assessment(guest, guest_dir)
+    comm = sections["communication"]
     if comm:
         lines.append("## Communication assessment")
         if comm.get("style"):
@@ -844,7 +909,7 @@ def build_markdown_report(guest: str, guest_dir: Path) -> str:
 
     if plan_obj:
         lines.append("## Conversation plan")
-        lines.append(_format_plan(plan_obj, comment_analysis=comment_analysis, guest=guest, guest_dir=guest_dir))
+        lines.append(_format_plan(plan_obj, comment_analysis=comment_analysis, guest=guest, guest_dir=guest_dir, shorts=sections["shorts"]))
     else:
         lines.append("## Conversation plan")
         lines.append("_Not available. Run Agent 3 to generate the plan._\n")
@@ -909,6 +974,7 @@ def generate_final_report_docx(guest: str, outputs_root: Path) -> Path:
         ns_path = guest_dir / "agent2" / "north_star.json"
     north_star_obj = _read_json(ns_path)
     plan_obj = _read_json(guest_dir / "agent3" / "plan.json")
+    sections = _report_sections(guest, guest_dir, _wanted_sections(about_text, link_sections, plan_obj))
 
     doc = Document()
 
@@ -1021,7 +1087,7 @@ def generate_final_report_docx(guest: str, outputs_root: Path) -> Path:
         doc.add_heading("About the guest", level=1)
         doc.add_paragraph(about_text)
         # Structured subsections (if generated/available)
-        about_sections = _build_about_sections(guest, guest_dir)
+        about_sections = sections["about_sections"]
         if about_sections:
             tl = (about_sections.get("timeline") or {})
             if any(tl.values()):
@@ -1083,7 +1149,7 @@ def generate_final_report_docx(guest: str, outputs_root: Path) -> Path:
                 else:
                     p.add_run(title)
             # Insert Common topics / Unexplored depths after books
-            topics_blocks = _build_topics_blocks(guest, guest_dir)
+            topics_blocks = sections["topics_blocks"]
             if topics_blocks:
                 ct = topics_blocks.get("common_topics") or []
                 ud = topics_blocks.get("unexplored_depths") or []
@@ -1096,7 +1162,7 @@ def generate_final_report_docx(guest: str, outputs_root: Path) -> Path:
                     for it in ud[:10]:
                         add_bullet(it)
             # Insert Podcast appearances
-            appearances = _build_podcast_appearances(guest, guest_dir)
+            appearances = sections["appearances"]
             if appearances:
                 doc.add_heading("Podcast appearances", level=2)
                 for a in appearances[:10]:
@@ -1125,7 +1191,7 @@ def generate_final_report_docx(guest: str, outputs_root: Path) -> Path:
             add_bullet(s)
 
     # Communication assessment
-    comm = _build_communication_assessment(guest, guest_dir)
+    comm = sections["communication"]
     if comm:
         doc.add_heading("Communication assessment", level=1)
         if comm.get("style"):
@@ -1280,7 +1346,7 @@ def generate_final_report_docx(guest: str, outputs_root: Path) -> Path:
                 if desc:
                     doc.add_paragraph(f"  - {desc}")
         # Shorts/Reels ideas
-        shorts = _build_shorts_ideas(guest, guest_dir)
+        shorts = sections["shorts"]
         if shorts:
             doc.add_heading("Shorts / Reels ideas", level=2)
             for it in shorts[:10]:
@@ -1,5 +1,6 @@
 import argparse
 import os
+from itertools import chain
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -9,7 +10,8 @@ from ingestion.tavily import TavilyClient
 from utils.io import write_jsonl, ensure_dir
 from utils.normalize import ChunkNormalizer, compute_text_hash
 from urllib.parse import urlparse
-from storage.sqlite_store import SQLiteStore
+from storage.sqlite_store import SQLiteStore, guest_db_path
+from storage.indexed_jsonl import STORAGE_FORMATS, write_records
 
 try:
     # Load environment variables from automationworkflow/.env if present
@@ -18,7 +20,7 @@ try:
 except Exception:
     pass
 
-def run_agent1(guest: str, max_videos: int, max_comments: int, include_replies: bool, sort: str, max_web_results: int):
+def run_agent1(guest: str, max_videos: int, max_comments: int, include_replies: bool, sort: str, max_web_results: int, chunk_workers: int = 0, storage_format: str = "jsonl", build_index: bool = True):
 
     timestamp = datetime.now(timezone.utc).isoformat()
     base_dir = Path(__file__).parent
@@ -83,7 +85,7 @@ def run_agent1(guest: str, max_videos: int, max_comments: int, include_replies:
         r for r in records
         if r.get("source_type") in ("youtube_video", "youtube_transcript", "youtube_comment", "youtube_comment_reply")
     ]
-    write_jsonl(raw_dir / "youtube.jsonl", youtube_records)
+    write_records(raw_dir / "youtube.jsonl", youtube_records, storage_format)
 
     # Write web.jsonl with metadata; include web_article and fallback web_link entries
     web_articles = [r for r in web_results if r.get("source_type") == "web_article"]
@@ -111,11 +113,19 @@ def run_agent1(guest: str, max_videos: int, max_comments: int, include_replies:
                 "text_hash": "",
                 "estimated_tokens": 0,
             })
-    write_jsonl(out_dir / "web.jsonl", web_enriched)
+    write_records(out_dir / "web.jsonl", web_enriched, storage_format)
 
-    normalizer = ChunkNormalizer()
-    chunks = normalizer.normalize(records, guest=guest)
-    write_jsonl(out_dir / "chunks.jsonl", chunks)
+    normalizer = ChunkNormalizer(workers=chunk_workers)
+    chunk_count = write_records(out_dir / "chunks.jsonl", normalizer.iter_chunks(records, guest=guest), storage_format)
+
+    # Embed chunks in the background while the summary and exports below run
+    index_status = None
+    if build_index:
+        try:
+            from rag.indexer import start_background_index
+            index_status = start_background_index(out_dir, total=chunk_count)
+        except Exception as e:
+            index_status = {"state": "failed", "error": f"{type(e).__name__}: {e}"}
 
     # Summary file with requested sections
     # Build about_guest from multiple sources: Wikipedia + personal site + blogs + top web articles
@@ -219,25 +229,44 @@ def run_agent1(guest: str, max_videos: int, max_comments: int, include_replies:
     write_jsonl(out_dir / "social_bio.jsonl", [{"url": u} for u in summary.get("/social_bio", [])])
 
     # Persist to SQLite database for future agents/chatbot
-    store = SQLiteStore(out_dir / "db.sqlite")
-    guest_id = store.ensure_guest(guest)
-    store.upsert_records(guest_id, records)
-    store.upsert_links(guest_id, "books_written", summary.get("/books_written", []))
-    store.upsert_links(guest_id, "social_bio", summary.get("/social_bio", []))
-    store.upsert_about(guest_id, (summary.get("/about_guest") or {}).get("summary"))
+    db_path = guest_db_path(out_dir)
+    with SQLiteStore(db_path) as store:
+        guest_id = store.ensure_guest(guest)
+        # A re-run replaces the previous run's rows, like the JSONL files it rewrites.
+        # web.jsonl may hold category fallbacks fetched after `records` was assembled; known rows are skipped
+        store.replace_records(
+            guest_id,
+            chain(records, web_enriched),
+            links={
+                "books_written": summary.get("/books_written", []),
+                "social_bio": summary.get("/social_bio", []),
+            },
+        )
+        store.upsert_about(guest_id, (summary.get("/about_guest") or {}).get("summary"))
+
+    # Keep the cross-guest Parquet dataset current when pyarrow is installed
+    columnar_rows = None
+    try:
+        from analysis.columnar import default_dataset_root, export_guest
+        columnar_rows = export_guest(out_dir, default_dataset_root(base_dir / "outputs"))
+    except Exception:
+        # pyarrow missing or export failed; analytics are optional
+        columnar_rows = None
 
     return {
         "web_records": len(web_results),
         "videos": len(videos),
         "total_records": len(records),
-        "chunks": len(chunks),
+        "chunks": chunk_count,
         "output_dir": str(out_dir),
         "timestamp": timestamp,
         "comments_skipped": not yt.comments_enabled,
         "comments_count": sum(1 for r in records if r.get("source_type") in ("youtube_comment", "youtube_comment_reply")),
         # web_summary_sections omitted since summary.jsonl is not written
         "tavily_enabled": bool(tavily.api_key),
-        "sqlite_path": str(out_dir / "db.sqlite"),
+        "sqlite_path": str(db_path),
+        "columnar_rows": columnar_rows,
+        "index": index_status,
     }
 
 
@@ -249,6 +278,9 @@ def main():
     parser.add_argument("--include-replies", action="store_true")
     parser.add_argument("--sort", choices=["relevance", "time"], default="relevance")
     parser.add_argument("--max-web-results", type=int, default=10)
+    parser.add_argument("--chunk-workers", type=int, default=0, help="Process pool size for chunking very large texts (0 = inline)")
+    parser.add_argument("--storage-format", choices=STORAGE_FORMATS, default="jsonl", help="gzip/zstd write block-compressed JSONL with a sidecar offset index")
+    parser.add_argument("--no-index", action="store_true", help="Skip the background vector index build")
     args = parser.parse_args()
 
     stats = run_agent1(
@@ -258,7 +290,14 @@ def main():
         include_replies=args.include_replies,
         sort=args.sort,
         max_web_results=args.max_web_results,
+        chunk_workers=args.chunk_workers,
+        storage_format=args.storage_format,
+        build_index=not args.no_index,
     )
+    if stats.get("index"):
+        # The build thread is a daemon; let it finish before the process exits
+        from rag.indexer import wait_for_index
+        stats["index"] = wait_for_index(Path(stats["output_dir"]))
     print(stats)
 
 
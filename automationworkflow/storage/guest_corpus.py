@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage.sqlite_store import open_guest_store
+from utils.io import iter_jsonl, read_jsonl
+
+
+# Read helpers for Agent 1 data used by Agents 2-4 and the report. Each one asks
+# SQLite (indexed, only the rows needed) and falls back to scanning the JSONL
+# outputs when the guest has no database yet.
+
+COMMENT_TYPES = ("youtube_comment", "youtube_comment_reply")
+
+
+def _youtube_path(guest_dir: Path) -> Path:
+    return guest_dir / "raw" / "youtube.jsonl"
+
+
+def _likes(rec: Dict) -> int:
+    try:
+        return int(rec.get("like_count", 0) or 0)
+    except Exception:
+        return 0
+
+
+def top_comments(guest_dir: Path, limit: int = 50, video_id: Optional[str] = None) -> List[Dict]:
+    """Most-liked comments and replies, best first."""
+    opened = open_guest_store(guest_dir)
+    if opened:
+        store, gid = opened
+        return store.top_comments(gid, limit=limit, video_id=video_id)
+    comments = [
+        c for c in iter_jsonl(_youtube_path(guest_dir), source_types=COMMENT_TYPES)
+        if video_id is None or c.get("video_id") == video_id
+    ]
+    comments.sort(key=_likes, reverse=True)
+    return comments[:limit]
+
+
+def transcripts(guest_dir: Path, video_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+    opened = open_guest_store(guest_dir)
+    if opened:
+        store, gid = opened
+        return store.transcripts(gid, video_id=video_id, limit=limit)
+    out: List[Dict] = []
+    for t in iter_jsonl(_youtube_path(guest_dir), source_types=("youtube_transcript",)):
+        if video_id is None or t.get("video_id") == video_id:
+            out.append(t)
+            if limit is not None and len(out) >= limit:
+                break
+    return out
+
+
+def videos(guest_dir: Path, limit: Optional[int] = None) -> List[Dict]:
+    opened = open_guest_store(guest_dir)
+    if opened:
+        store, gid = opened
+        return store.videos(gid, limit=limit)
+    out = read_jsonl(_youtube_path(guest_dir), source_types=("youtube_video",))
+    return out[:limit] if limit is not None else out
+
+
+def web_records(guest_dir: Path, limit: Optional[int] = None, articles_only: bool = False, with_text: bool = True) -> List[Dict]:
+    """Web pages in ingestion order (articles, plus fallback links unless `articles_only`)."""
+    types = ("web_article",) if articles_only else ("web_article", "web_link")
+    opened = open_guest_store(guest_dir)
+    if opened:
+        store, gid = opened
+        return store.records_by_type(gid, types, limit=limit, with_text=with_text)
+    keys = None if with_text else ("source_type", "url", "title", "domain")
+    out: List[Dict] = []
+    for r in iter_jsonl(guest_dir / "web.jsonl", keys=keys, source_types=types):
+        out.append(r)
+        if limit is not None and len(out) >= limit:
+            break
+    return out
+
+
+def source_type_counts(guest_dir: Path) -> Dict[str, int]:
+    opened = open_guest_store(guest_dir)
+    if opened:
+        store, gid = opened
+        return store.counts_by_source_type(gid)
+    counts: Dict[str, int] = {}
+    for path in (_youtube_path(guest_dir), guest_dir / "web.jsonl"):
+        for r in iter_jsonl(path, keys=("source_type",)):
+            st = r.get("source_type")
+            if st:
+                counts[st] = counts.get(st, 0) + 1
+    return counts
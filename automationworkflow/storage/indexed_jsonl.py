@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from utils.io import _dumps, _loads, ensure_dir, write_jsonl
+
+
+# Records are compressed in independent blocks (one gzip member / zstd frame each),
+# so the concatenated file is still a valid .gz/.zst stream for command-line tools
+# while readers can seek to a block and decompress only that block.
+CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+STORAGE_FORMATS = ("jsonl", "gzip", "zstd")
+
+
+def _lazy_import_zstd():
+    import zstandard
+    return zstandard
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if codec == "zstd":
+        return _lazy_import_zstd().ZstdCompressor(level=10).compress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd":
+        return _lazy_import_zstd().ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def data_path_for(path: Path, codec: str) -> Path:
+    """`raw/youtube.jsonl` -> `raw/youtube.jsonl.gz` (or `.zst`)."""
+    path = Path(path)
+    return path.with_name(path.name + CODEC_SUFFIXES[codec])
+
+
+def index_path_for(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def write_indexed_jsonl(path: Path, records: Iterable[Dict], codec: str = "gzip", block_records: int = 256) -> int:
+    """Write `records` as block-compressed JSONL next to `path` plus a sidecar offset index.
+
+    The index maps `source_type`, `video_id` and `chunk_id` values to record numbers;
+    record n lives in block n // block_records at line n % block_records.
+    """
+    path = Path(path)
+    if codec not in CODEC_SUFFIXES:
+        raise ValueError(f"Unknown codec: {codec}")
+    data_path = data_path_for(path, codec)
+    ensure_dir(data_path.parent)
+
+    blocks: List[List[int]] = []
+    by_source_type: Dict[str, List[int]] = {}
+    by_video_id: Dict[str, List[int]] = {}
+    by_chunk_id: Dict[str, int] = {}
+    pending: List[bytes] = []
+    count = 0
+    offset = 0
+    with data_path.open("wb") as f:
+        def flush() -> None:
+            nonlocal offset
+            payload = _compress(codec, b"".join(pending))
+            f.write(payload)
+            blocks.append([offset, len(payload)])
+            offset += len(payload)
+            pending.clear()
+
+        for rec in records:
+            st = rec.get("source_type")
+            if st:
+                by_source_type.setdefault(st, []).append(count)
+            vid = rec.get("video_id")
+            if vid:
+                by_video_id.setdefault(vid, []).append(count)
+            cid = rec.get("chunk_id")
+            if cid:
+                by_chunk_id[cid] = count
+            pending.append(_dumps(rec) + b"\n")
+            count += 1
+            if len(pending) >= block_records:
+                flush()
+        if pending:
+            flush()
+
+    index = {
+        "version": INDEX_VERSION,
+        "codec": codec,
+        "data": data_path.name,
+        "block_records": block_records,
+        "count": count,
+        "blocks": blocks,
+        "by_source_type": by_source_type,
+        "by_video_id": by_video_id,
+        "by_chunk_id": by_chunk_id,
+    }
+    index_path_for(path).write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+    return count
+
+
+def write_records(path: Path, records: Iterable[Dict], storage_format: str = "jsonl") -> int:
+    """Write a guest output file in the requested storage format.
+
+    Files of the other format left over from earlier runs are removed so readers
+    never pick up stale data.
+    """
+    path = Path(path)
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format: {storage_format}")
+    stale = [path, index_path_for(path)] + [data_path_for(path, c) for c in CODEC_SUFFIXES]
+    if storage_format == "jsonl":
+        count = write_jsonl(path, records)
+        keep = {path}
+    else:
+        count = write_indexed_jsonl(path, records, codec=storage_format)
+        keep = {index_path_for(path), data_path_for(path, storage_format)}
+    for p in stale:
+        if p not in keep and p.exists():
+            try:
+                p.unlink()
+            except OSError:
+                pass
+    return count
+
+
+class IndexedJsonl:
+    """Random-access reader for files written by `write_indexed_jsonl`."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.index = json.loads(index_path_for(self.path).read_text(encoding="utf-8"))
+        self.codec = self.index["codec"]
+        self.data_path = self.path.with_name(self.index["data"])
+        self.block_records = int(self.index["block_records"])
+
+    @classmethod
+    def open(cls, path: Path) -> Optional["IndexedJsonl"]:
+        """Return a reader if an indexed variant of `path` exists, else None."""
+        idx = index_path_for(Path(path))
+        if not idx.exists():
+            return None
+        try:
+            reader = cls(path)
+        except Exception:
+            return None
+        return reader if reader.data_path.exists() else None
+
+    def __len__(self) -> int:
+        return int(self.index.get("count", 0))
+
+    def source_types(self) -> Dict[str, int]:
+        return {k: len(v) for k, v in self.index.get("by_source_type", {}).items()}
+
+    def _select(
+        self,
+        source_types: Optional[Iterable[str]],
+        video_id: Optional[str],
+        chunk_ids: Optional[Iterable[str]],
+    ) -> Optional[List[int]]:
+        selected: Optional[set] = None
+
+        def narrow(nums: Iterable[int]) -> None:
+            nonlocal selected
+            nums = set(nums)
+            selected = nums if selected is None else (selected & nums)
+
+        if source_types is not None:
+            by_type = self.index.get("by_source_type", {})
+            narrow(n for st in source_types for n in by_type.get(st, []))
+        if video_id is not None:
+            narrow(self.index.get("by_video_id", {}).get(video_id, []))
+        if chunk_ids is not None:
+            by_chunk = self.index.get("by_chunk_id", {})
+            narrow(by_chunk[c] for c in chunk_ids if c in by_chunk)
+        return None if selected is None else sorted(selected)
+
+    def _read_block(self, f, block_no: int) -> List[bytes]:
+        offset, length = self.index["blocks"][block_no]
+        f.seek(offset)
+        return _decompress(self.codec, f.read(length)).splitlines()
+
+    def iter_records(
+        self,
+        source_types: Optional[Iterable[str]] = None,
+        video_id: Optional[str] = None,
+        chunk_ids: Optional[Iterable[str]] = None,
+        keys: Optional[Sequence[str]] = None,
+    ) -> Iterator[Dict]:
+        """Yield matching records in file order, decompressing only the blocks that hold them."""
+        wanted = self._select(source_types, video_id, chunk_ids)
+        with self.data_path.open("rb") as f:
+            if wanted is None:
+                block_iter = ((b, None) for b in range(len(self.index["blocks"])))
+            else:
+                grouped: Dict[int, List[int]] = {}
+                for n in wanted:
+                    grouped.setdefault(n // self.block_records, []).append(n % self.block_records)
+                block_iter = iter(grouped.items())
+            for block_no, lines in block_iter:
+                raw = self._read_block(f, block_no)
+                picked = raw if lines is None else [raw[i] for i in lines if i < len(raw)]
+                for line in picked:
+                    try:
+                        rec = _loads(line)
+                    except Exception:
+                        continue
+                    if keys is not None:
+                        rec = {k: rec[k] for k in keys if k in rec}
+                    yield rec
+
+    def get(self, chunk_id: str) -> Optional[Dict]:
+        for rec in self.iter_records(chunk_ids=[chunk_id]):
+            return rec
+        return None
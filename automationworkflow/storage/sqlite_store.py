@@ -1,24 +1,150 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import re
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 from datetime import datetime, timezone
 
+from utils.io import _dumps
 from utils.normalize import compute_text_hash
 
 
+RECORD_FIELDS = ("source_type", "url", "title", "video_id", "comment_id", "author", "like_count", "reply_count", "published_at", "text")
+_RECORD_FIELD_SET = frozenset(RECORD_FIELDS)
+UPSERT_BATCH_SIZE = 5000
+# Bumped whenever _init_schema needs to migrate existing files (stored in PRAGMA user_version)
+SCHEMA_VERSION = 1
+# GUEST_DB_MODE=shared keeps every guest in outputs/guests.sqlite instead of outputs/<guest>/db.sqlite
+DB_MODE_ENV = "GUEST_DB_MODE"
+SHARED_DB_NAME = "guests.sqlite"
+# Very common words only add posting-list scans to OR queries without helping BM25 ranking
+_FTS_STOPWORDS = frozenset("a an and are as at be by did do does for from has have how i in is it of on or that the this to was what when where which who why with you".split())
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 OR-query of quoted terms (no FTS syntax leaks through)."""
+    terms: List[str] = []
+    for tok in re.findall(r"\w+", text.lower()):
+        if tok in _FTS_STOPWORDS or tok in terms:
+            continue
+        terms.append(tok)
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+def record_key(guest_id, source_type, url, comment_id, video_id, text_hash) -> bytes:
+    """16-byte identity of a record. NULL and "" hash the same, so web articles
+    (no comment/video id) dedupe across runs, unlike a NULL-bearing UNIQUE index."""
+    raw = (
+        f"{'' if guest_id is None else guest_id}\x1f{'' if source_type is None else source_type}\x1f"
+        f"{'' if url is None else url}\x1f{'' if comment_id is None else comment_id}\x1f"
+        f"{'' if video_id is None else video_id}\x1f{'' if text_hash is None else text_hash}"
+    )
+    return hashlib.blake2b(raw.encode("utf-8", errors="ignore"), digest_size=16).digest()
+
+
+def _bindable(v):
+    # sqlite3 can't bind lists/dicts; keep them as JSON text instead of dropping the row
+    if v is None or isinstance(v, (str, int, float, bytes)):
+        return v
+    return _dumps(v).decode("utf-8")
+
+
+def _url_domain(url: str) -> str:
+    # Fast path for plain http(s) URLs; comment URLs are all unique (&lc=...), so
+    # full urlparse per row dominated bulk inserts
+    if url.startswith(("https://", "http://")):
+        host = url.split("://", 1)[1]
+        for sep in ("/", "?", "#"):
+            host = host.split(sep, 1)[0]
+        return host
+    return urlparse(url).netloc
+
+
+def _record_rows(guest_id: int, batch: List[Dict]) -> List[tuple]:
+    """Build INSERT tuples for a batch, hashing each distinct text and parsing each distinct URL once."""
+    domains = {u: _url_domain(u) for u in {r.get("url") for r in batch} if u}
+    hashes = {t: compute_text_hash(t) for t in {r.get("text") for r in batch} if t}
+    rows: List[tuple] = []
+    for r in batch:
+        url = r.get("url")
+        text = r.get("text")
+        text_hash = hashes.get(text) if text else None
+        source_type, video_id, comment_id = r.get("source_type"), r.get("video_id"), r.get("comment_id")
+        extra = {k: v for k, v in r.items() if k not in _RECORD_FIELD_SET}
+        rows.append((
+            record_key(guest_id, source_type, url, comment_id, video_id, text_hash),
+            guest_id, source_type, url, r.get("title"), domains.get(url) if url else None,
+            video_id, comment_id, r.get("author"), r.get("like_count"), r.get("reply_count"),
+            r.get("published_at"), text, text_hash,
+            _dumps(extra).decode("utf-8") if extra else None,
+        ))
+    return rows
+
+
+def guest_db_path(guest_dir: Path) -> Path:
+    """Database holding `guest_dir`'s records: the shared outputs DB or the per-guest file."""
+    guest_dir = Path(guest_dir)
+    if os.getenv(DB_MODE_ENV, "").strip().lower() == "shared":
+        return guest_dir.parent / SHARED_DB_NAME
+    return guest_dir / "db.sqlite"
+
+
 class SQLiteStore:
+    """SQLite-backed record store with one connection per thread.
+
+    Connections are opened lazily by the thread that first touches `conn` and are
+    all closed by `close()` (or leaving a `with` block).
+    """
+
     def __init__(self, db_path: Path):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path))
-        self.conn.execute("PRAGMA journal_mode=WAL;")
-        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._closed = False
         self._init_schema()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError(f"SQLiteStore for {self.db_path} is closed")
+            # check_same_thread=False only so close() may run from another thread;
+            # each thread still uses its own connection
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute("PRAGMA busy_timeout=5000;")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._conns_lock:
+            self._closed = True
+            conns, self._conns = self._conns, []
+        for c in conns:
+            try:
+                c.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def __enter__(self) -> "SQLiteStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
     def _init_schema(self) -> None:
         cur = self.conn.cursor()
         cur.execute(
@@ -30,10 +156,15 @@ class SQLiteStore:
             );
             """
         )
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        has_records = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='records'").fetchone() is not None
+        if has_records and version < 1:
+            self._migrate_record_key()
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS records (
                 id INTEGER PRIMARY KEY,
+                record_key BLOB NOT NULL UNIQUE,
                 guest_id INTEGER,
                 source_type TEXT,
                 url TEXT,
@@ -47,11 +178,19 @@ class SQLiteStore:
                 published_at TEXT,
                 text TEXT,
                 text_hash TEXT,
-                extra_json TEXT,
-                UNIQUE(guest_id, source_type, url, comment_id, video_id, text_hash)
+                extra_json TEXT
             );
             """
         )
+        # Dashboard/batch access paths: per-guest type and video scans, like-ordered comments.
+        # Not covering on purpose: records_by_type returns text and extra_json, so a covering
+        # index would copy the table. They save the scan and the sort; each LIMITed row is
+        # then one rowid lookup.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_records_guest_source ON records(guest_id, source_type);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_records_guest_video ON records(guest_id, video_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_records_like_count ON records(like_count);")
+        # Lets top_comments() walk one guest's comments already in like order
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_records_guest_source_likes ON records(guest_id, source_type, like_count);")
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS links (
@@ -72,7 +211,94 @@ class SQLiteStore:
             );
             """
         )
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+        self.fts_enabled = self._init_fts()
+
+    def _migrate_record_key(self) -> None:
+        """v0 -> v1: replace the wide UNIQUE(guest_id, source_type, url, comment_id, video_id, text_hash)
+        with a 16-byte record_key. Rows that now collide (NULL-id duplicates) keep the oldest id.
+        The FTS index is dropped here and rebuilt by _init_fts."""
+        conn = self.conn
+        conn.create_function("record_key", 6, record_key, deterministic=True)
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS records_fts")
+            conn.execute(
+                """
+                CREATE TABLE records_v1 (
+                    id INTEGER PRIMARY KEY,
+                    record_key BLOB NOT NULL UNIQUE,
+                    guest_id INTEGER,
+                    source_type TEXT,
+                    url TEXT,
+                    title TEXT,
+                    domain TEXT,
+                    video_id TEXT,
+                    comment_id TEXT,
+                    author TEXT,
+                    like_count INTEGER,
+                    reply_count INTEGER,
+                    published_at TEXT,
+                    text TEXT,
+                    text_hash TEXT,
+                    extra_json TEXT
+                );
+                """
+            )
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO records_v1
+                (id, record_key, guest_id, source_type, url, title, domain, video_id, comment_id, author, like_count, reply_count, published_at, text, text_hash, extra_json)
+                SELECT id, record_key(guest_id, source_type, url, comment_id, video_id, text_hash),
+                       guest_id, source_type, url, title, domain, video_id, comment_id, author, like_count, reply_count, published_at, text, text_hash, extra_json
+                FROM records ORDER BY id
+                """
+            )
+            conn.execute("DROP TABLE records")
+            conn.execute("ALTER TABLE records_v1 RENAME TO records")
+        # Reclaim the space of the old composite index
+        conn.execute("VACUUM")
+
+    def _init_fts(self) -> bool:
+        """External-content FTS5 index over records(title, text).
+
+        Inserts are synced in bulk by upsert_records; updates/deletes by triggers.
+
+        Returns False when this SQLite build lacks FTS5; search() then returns nothing.
+        """
+        cur = self.conn.cursor()
+        existed = cur.execute("SELECT 1 FROM sqlite_master WHERE name='records_fts'").fetchone() is not None
+        try:
+            cur.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+                    title, text, content='records', content_rowid='id', tokenize='porter unicode61'
+                );
+                """
+            )
+        except sqlite3.OperationalError:
+            return False
+        cur.executescript(
+            """
+            DROP TRIGGER IF EXISTS records_fts_ai;
+            CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON records BEGIN
+                INSERT INTO records_fts(records_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF title, text ON records BEGIN
+                INSERT INTO records_fts(records_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+                INSERT INTO records_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+            END;
+            """
+        )
+        if not existed:
+            # Databases created before the index existed: index their current rows once
+            cur.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
         self.conn.commit()
+        return True
+
+    def get_guest_id(self, name: str) -> Optional[int]:
+        row = self.conn.execute("SELECT id FROM guests WHERE name=?", (name,)).fetchone()
+        return int(row[0]) if row else None
 
     def ensure_guest(self, name: str) -> int:
         cur = self.conn.cursor()
@@ -82,50 +308,104 @@ class SQLiteStore:
         row = cur.fetchone()
         return int(row[0])
 
-    def upsert_records(self, guest_id: int, records: Iterable[Dict]) -> int:
+    # Re-ingesting a known record only refreshes its engagement counts (so "top by likes"
+    # stays current); the WHERE keeps unchanged rows out of the returned count
+    _INSERT_RECORD_SQL = """
+        INSERT INTO records
+        (record_key, guest_id, source_type, url, title, domain, video_id, comment_id, author, like_count, reply_count, published_at, text, text_hash, extra_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(record_key) DO UPDATE SET like_count=excluded.like_count, reply_count=excluded.reply_count
+        WHERE records.like_count IS NOT excluded.like_count OR records.reply_count IS NOT excluded.reply_count
+    """
+
+    def _insert_many(self, sql: str, rows: List[tuple], sync_fts: bool = False) -> int:
+        """executemany in one explicit write transaction.
+
+        If the batch fails (e.g. a list where a scalar was expected), it is retried
+        row by row with non-scalar values JSON-encoded, skipping rows that still fail.
+        With `sync_fts`, rows new to `records` are added to records_fts in one
+        INSERT ... SELECT before commit (much cheaper than a per-row trigger).
+        Inside a transaction the caller already has open, a savepoint is used instead,
+        so the caller's pending writes are neither committed nor rolled back here.
+        """
         cur = self.conn.cursor()
+        sync_fts = sync_fts and self.fts_enabled
+        nested = self.conn.in_transaction
+
+        def begin() -> int:
+            if nested:
+                cur.execute("SAVEPOINT insert_many")
+            else:
+                # IMMEDIATE takes the write lock now, so MAX(id) can't race another writer
+                cur.execute("BEGIN IMMEDIATE")
+            return cur.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0] if sync_fts else 0
+
+        def commit(start_id: int) -> None:
+            if sync_fts:
+                cur.execute("INSERT INTO records_fts(rowid, title, text) SELECT id, title, text FROM records WHERE id > ?", (start_id,))
+            if nested:
+                cur.execute("RELEASE SAVEPOINT insert_many")
+            else:
+                self.conn.commit()
+
+        def rollback() -> None:
+            if nested:
+                cur.execute("ROLLBACK TO SAVEPOINT insert_many")
+                cur.execute("RELEASE SAVEPOINT insert_many")
+            else:
+                self.conn.rollback()
+
+        try:
+            start_id = begin()
+            cur.executemany(sql, rows)
+            inserted = cur.rowcount
+            commit(start_id)
+            return max(inserted, 0)
+        except sqlite3.Error:
+            rollback()
         inserted = 0
-        for r in records:
-            source_type = r.get("source_type")
-            url = r.get("url")
-            title = r.get("title")
-            video_id = r.get("video_id")
-            comment_id = r.get("comment_id")
-            author = r.get("author")
-            like_count = r.get("like_count")
-            reply_count = r.get("reply_count")
-            published_at = r.get("published_at")
-            text = r.get("text")
-            text_hash = compute_text_hash(text) if text else None
-            domain = urlparse(url).netloc if url else None
-            extra = {k: v for k, v in r.items() if k not in {"source_type", "url", "title", "video_id", "comment_id", "author", "like_count", "reply_count", "published_at", "text"}}
-            extra_json = json.dumps(extra, ensure_ascii=False) if extra else None
+        start_id = begin()
+        for row in rows:
             try:
-                cur.execute(
-                    """
-                    INSERT OR IGNORE INTO records
-                    (guest_id, source_type, url, title, domain, video_id, comment_id, author, like_count, reply_count, published_at, text, text_hash, extra_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (guest_id, source_type, url, title, domain, video_id, comment_id, author, like_count, reply_count, published_at, text, text_hash, extra_json),
-                )
+                cur.execute(sql, tuple(_bindable(v) for v in row))
                 inserted += cur.rowcount
-            except Exception:
+            except sqlite3.Error:
                 continue
-        self.conn.commit()
+        commit(start_id)
+        return inserted
+
+    def upsert_records(self, guest_id: int, records: Iterable[Dict]) -> int:
+        inserted = 0
+        batch: List[Dict] = []
+        for r in records:
+            batch.append(r)
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                inserted += self._insert_many(self._INSERT_RECORD_SQL, _record_rows(guest_id, batch), sync_fts=True)
+                batch = []
+        if batch:
+            inserted += self._insert_many(self._INSERT_RECORD_SQL, _record_rows(guest_id, batch), sync_fts=True)
+        return inserted
+
+    def replace_records(self, guest_id: int, records: Iterable[Dict], links: Optional[Dict[str, List[str]]] = None) -> int:
+        """Swap a guest's records (and links, when given) for a new run's in one transaction.
+
+        Upserting alone would keep rows from earlier Agent 1 runs that the latest run no
+        longer returns. Deleted rows leave records_fts through its delete trigger.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM records WHERE guest_id=?", (guest_id,))
+            inserted = self.upsert_records(guest_id, records)
+            if links is not None:
+                self.conn.execute("DELETE FROM links WHERE guest_id=?", (guest_id,))
+                for link_type, urls in links.items():
+                    self.upsert_links(guest_id, link_type, urls)
         return inserted
 
     def upsert_links(self, guest_id: int, link_type: str, urls: List[str]) -> int:
-        cur = self.conn.cursor()
-        count = 0
-        for u in urls:
-            try:
-                cur.execute("INSERT OR IGNORE INTO links(guest_id, link_type, url, title) VALUES (?, ?, ?, ?)", (guest_id, link_type, u, None))
-                count += cur.rowcount
-            except Exception:
-                continue
-        self.conn.commit()
-        return count
+        rows = [(guest_id, link_type, u, None) for u in urls]
+        if not rows:
+            return 0
+        return self._insert_many("INSERT OR IGNORE INTO links(guest_id, link_type, url, title) VALUES (?, ?, ?, ?)", rows)
 
     def upsert_about(self, guest_id: int, summary: Optional[str]) -> None:
         if not summary:
@@ -134,4 +414,194 @@ class SQLiteStore:
         cur.execute("INSERT INTO about_guest(guest_id, summary) VALUES (?, ?) ON CONFLICT(guest_id) DO UPDATE SET summary=excluded.summary", (guest_id, summary))
         self.conn.commit()
 
+    # ---- Query layer (indexed reads for Agents 2-4 and the report) ----
+
+    _RECORD_COLUMNS = ("source_type", "url", "title", "domain", "video_id", "comment_id", "author", "like_count", "reply_count", "published_at", "text", "text_hash", "extra_json")
+
+    @staticmethod
+    def _to_record(row: tuple, with_text: bool = True) -> Dict:
+        """Rebuild the Agent 1 record dict: stored columns plus fields kept in extra_json."""
+        (source_type, url, title, domain, video_id, comment_id, author,
+         like_count, reply_count, published_at, text, text_hash, extra_json) = row
+        rec: Dict = json.loads(extra_json) if extra_json else {}
+        for k, v in (
+            ("source_type", source_type), ("url", url), ("title", title), ("domain", domain),
+            ("video_id", video_id), ("comment_id", comment_id), ("author", author),
+            ("like_count", like_count), ("reply_count", reply_count), ("published_at", published_at),
+            ("text", text if with_text else None), ("text_hash", text_hash),
+        ):
+            if v is not None:
+                rec[k] = v
+        return rec
+
+    def records_by_type(
+        self,
+        guest_id: int,
+        source_types: Iterable[str],
+        limit: Optional[int] = None,
+        video_id: Optional[str] = None,
+        domain: Optional[str] = None,
+        order_by_likes: bool = False,
+        with_text: bool = True,
+    ) -> List[Dict]:
+        types = list(source_types)
+        if not types:
+            return []
+        cols = ", ".join("NULL" if (c == "text" and not with_text) else c for c in self._RECORD_COLUMNS)
+        sql = f"SELECT {cols} FROM records WHERE guest_id = ? AND source_type IN ({','.join('?' * len(types))})"
+        params: List = [guest_id, *types]
+        if video_id is not None:
+            sql += " AND video_id = ?"
+            params.append(video_id)
+        if domain is not None:
+            sql += " AND domain = ?"
+            params.append(domain)
+        sql += " ORDER BY like_count DESC, id" if order_by_likes else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [self._to_record(r, with_text) for r in self.conn.execute(sql, params)]
+
+    def top_comments(self, guest_id: int, limit: int = 50, video_id: Optional[str] = None, include_replies: bool = True) -> List[Dict]:
+        types = ["youtube_comment", "youtube_comment_reply"] if include_replies else ["youtube_comment"]
+        return self.records_by_type(guest_id, types, limit=limit, video_id=video_id, order_by_likes=True)
+
+    def transcripts(self, guest_id: int, video_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        return self.records_by_type(guest_id, ["youtube_transcript"], limit=limit, video_id=video_id)
+
+    def videos(self, guest_id: int, limit: Optional[int] = None) -> List[Dict]:
+        return self.records_by_type(guest_id, ["youtube_video"], limit=limit)
+
+    def web_articles(self, guest_id: int, domain: Optional[str] = None, limit: Optional[int] = None, with_text: bool = True) -> List[Dict]:
+        return self.records_by_type(guest_id, ["web_article"], limit=limit, domain=domain, with_text=with_text)
+
+    def counts_by_source_type(self, guest_id: int) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT source_type, COUNT(*) FROM records WHERE guest_id = ? GROUP BY source_type", (guest_id,))
+        return {st: n for st, n in rows if st}
+
+    def links(self, guest_id: int, link_type: str) -> List[str]:
+        rows = self.conn.execute("SELECT url FROM links WHERE guest_id = ? AND link_type = ? ORDER BY id", (guest_id, link_type))
+        return [r[0] for r in rows]
+
+    def about(self, guest_id: int) -> Optional[str]:
+        row = self.conn.execute("SELECT summary FROM about_guest WHERE guest_id = ?", (guest_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete_guest(self, name: str) -> bool:
+        """Remove a guest and all of its rows (used when a guest is deleted in shared mode)."""
+        guest_id = self.get_guest_id(name)
+        if guest_id is None:
+            return False
+        with self.conn:
+            for table in ("records", "links", "about_guest"):
+                self.conn.execute(f"DELETE FROM {table} WHERE guest_id=?", (guest_id,))
+            self.conn.execute("DELETE FROM guests WHERE id=?", (guest_id,))
+        return True
+
+    def search(
+        self,
+        query: str,
+        guest_id: Optional[int] = None,
+        limit: int = 10,
+        source_types: Optional[Iterable[str]] = None,
+    ) -> List[Dict]:
+        """BM25-ranked keyword search over record titles and text.
+
+        Returns [{id, source_type, url, title, video_id, snippet, text, score}], best
+        first; higher score is better. Titles weigh twice as much as body text.
+        """
+        match = _fts_query(query)
+        if not self.fts_enabled or not match:
+            return []
+        sql = """
+            SELECT r.id, r.source_type, r.url, r.title, r.video_id,
+                   snippet(records_fts, 1, '[', ']', '…', 24), r.text,
+                   bm25(records_fts, 2.0, 1.0) AS rank
+            FROM records_fts JOIN records r ON r.id = records_fts.rowid
+            WHERE records_fts MATCH ?
+        """
+        params: List = [match]
+        if guest_id is not None:
+            sql += " AND r.guest_id = ?"
+            params.append(guest_id)
+        if source_types:
+            types = list(source_types)
+            sql += f" AND r.source_type IN ({','.join('?' * len(types))})"
+            params.extend(types)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [
+            {
+                "id": r[0], "source_type": r[1], "url": r[2], "title": r[3], "video_id": r[4],
+                "snippet": r[5], "text": r[6], "score": -r[7],
+            }
+            for r in rows
+        ]
+
+
+_stores: Dict[str, Tuple[SQLiteStore, Optional[tuple]]] = {}
+_stores_lock = threading.Lock()
+
+
+def _file_stamp(path: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def get_store(db_path: Path) -> SQLiteStore:
+    """Process-wide SQLiteStore per database file, for long-lived callers (UI, chatbot, batch jobs).
+
+    The cached store is keyed on the file's (device, inode), so ordinary writes and WAL
+    checkpoints keep reusing it. A database deleted and rebuilt (e.g. by an Agent 1 re-run)
+    gets a new inode - the open handle pins the old one - and the stale store is closed
+    before a fresh one replaces it.
+    """
+    key = str(Path(db_path).resolve())
+    stamp = _file_stamp(db_path)
+    with _stores_lock:
+        entry = _stores.get(key)
+        if entry is not None:
+            store, opened = entry
+            if not store._closed and opened == stamp:
+                return store
+            store.close()
+        store = SQLiteStore(Path(db_path))
+        _stores[key] = (store, _file_stamp(db_path))
+        return store
+
+
+def evict_store(db_path: Path) -> None:
+    """Close and forget the cached store for `db_path`; call before deleting the file."""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        entry = _stores.pop(key, None)
+    if entry is not None:
+        entry[0].close()
+
+
+def open_guest_store(guest_dir: Path) -> Optional[tuple]:
+    """(store, guest_id) for a guest's Agent 1 data in SQLite, or None if it was never loaded.
+
+    Guests are keyed by their output folder name, which is what run_agent1 uses.
+    """
+    db_path = guest_db_path(guest_dir)
+    if not db_path.exists():
+        return None
+    store = get_store(db_path)
+    guest_id = store.get_guest_id(Path(guest_dir).name)
+    return (store, guest_id) if guest_id is not None else None
+
 
+def close_all_stores() -> None:
+    with _stores_lock:
+        stores = [store for store, _stamp in _stores.values()]
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -20,3 +20,32 @@ def test_normalize_and_write_tmp(tmp_path: Path):
     assert out.read_text(encoding="utf-8").strip() != ""
 
 
+def test_normalize_to_file_streams_in_order(tmp_path: Path):
+    records = iter([
+        {"source_type": "youtube_transcript", "video_id": "v1", "text": "a" * 10000},
+        {"source_type": "youtube_video", "video_id": "v1", "title": "skip me"},
+        {"source_type": "youtube_comment", "video_id": "v1", "comment_id": "c1", "text": "short"},
+    ])
+    norm = ChunkNormalizer(workers=2, parallel_min_chars=5000)
+    out = tmp_path / "chunks.jsonl"
+    count = norm.normalize_to_file(records, guest="Guest", out_path=out)
+
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert count == len(lines) == 5
+    assert '"youtube_transcript_v1__0"' in lines[0]
+    assert '"youtube_comment_v1_c1_0"' in lines[-1]
+
+
+def test_web_chunk_ids_are_unique_per_page():
+    records = [
+        {"source_type": "web_article", "url": "https://a.example/one", "text": "first article"},
+        {"source_type": "web_article", "url": "https://a.example/two", "text": "second article"},
+        {"source_type": "web_article", "text": "no url at all"},
+        {"source_type": "youtube_comment", "video_id": "v1", "comment_id": "c1", "text": "short"},
+    ]
+    chunks = ChunkNormalizer().normalize(records, guest="Guest")
+    ids = [c["chunk_id"] for c in chunks]
+    assert len(set(ids)) == len(ids) == 4
+    assert ids[-1] == "youtube_comment_v1_c1_0"
+    # Stable across runs, so incremental index syncs see unchanged pages as unchanged
+    assert [c["chunk_id"] for c in ChunkNormalizer().normalize(records, guest="Guest")] == ids
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from utils.io import write_jsonl
+
+pytest.importorskip("pyarrow")
+
+from analysis.columnar import comment_volume_by_guest, export_all, open_dataset  # noqa: E402
+
+
+def _write_guest(outputs: Path, name: str, comments, web=()):
+    guest_dir = outputs / name
+    (guest_dir / "raw").mkdir(parents=True)
+    write_jsonl(guest_dir / "raw" / "youtube.jsonl", [
+        {"source_type": "youtube_video", "video_id": "v1", "title": "Interview", "url": "https://www.youtube.com/watch?v=v1"},
+        *comments,
+    ])
+    write_jsonl(guest_dir / "web.jsonl", list(web))
+
+
+def _comment(i: int, likes):
+    return {"source_type": "youtube_comment", "video_id": "v1", "comment_id": f"c{i}", "text": f"comment {i}", "like_count": likes}
+
+
+def test_export_partitions_and_comment_volume(tmp_path: Path):
+    outputs = tmp_path / "outputs"
+    _write_guest(outputs, "Ada Lovelace", [_comment(1, 5), _comment(2, None), _comment(3, 2)],
+                 web=[{"source_type": "web_article", "url": "https://a.example/x", "title": "Profile", "text": "Bio"}])
+    _write_guest(outputs, "Bob", [_comment(1, None)])
+    (outputs / "_cache").mkdir()
+
+    dataset_root = tmp_path / "dataset"
+    assert export_all(outputs, dataset_root) == {"Ada Lovelace": 5, "Bob": 2}
+    assert (dataset_root / "guest=Ada%20Lovelace" / "source_type=youtube_comment" / "part-0.parquet").exists()
+    assert (dataset_root / "guest=Bob" / "source_type=youtube_video" / "part-0.parquet").exists()
+
+    table = open_dataset(dataset_root).to_table()
+    assert table.num_rows == 7
+    assert set(table.column("guest").to_pylist()) == {"Ada Lovelace", "Bob"}
+    web = [r for r in table.to_pylist() if r["source_type"] == "web_article"]
+    assert web[0]["domain"] == "a.example"
+
+    # Null like counts still count towards the comment volume
+    assert comment_volume_by_guest(dataset_root) == [
+        {"guest": "Ada Lovelace", "comments": 3, "likes": 7},
+        {"guest": "Bob", "comments": 1, "likes": 0},
+    ]
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from rag.hybrid import BM25Index, hybrid_search, recall_at_k, rrf_fuse
+from utils.io import write_jsonl
+
+
+def _chunks():
+    return [
+        {"chunk_id": "c0", "text": "He wrote Can't Hurt Me in 2018 after years of ultra running.", "url": "https://a.example"},
+        {"chunk_id": "c1", "text": "Running long distances builds mental toughness.", "url": "https://b.example"},
+        {"chunk_id": "c2", "text": "Navy SEAL training and the callused mind.", "url": "https://c.example"},
+    ]
+
+
+def test_bm25_ranks_exact_terms_first():
+    index = BM25Index(_chunks())
+    hits = index.search("what happened in 2018", n_results=2)
+    assert [h["id"] for h in hits] == ["c0"]
+    assert hits[0]["metadata"]["url"] == "https://a.example"
+    assert index.search("", n_results=2) == []
+
+
+def test_rrf_prefers_documents_ranked_by_both():
+    a = [{"id": "x"}, {"id": "y"}, {"id": "z"}]
+    b = [{"id": "y"}, {"id": "w"}]
+    fused = rrf_fuse([("vector", a), ("bm25", b)], n_results=3)
+    assert fused[0]["id"] == "y"
+    assert fused[0]["sources"] == ["vector", "bm25"]
+    assert recall_at_k(fused, ["y", "x"], k=1) == 0.5
+
+
+def test_hybrid_search_without_vector_index(tmp_path: Path):
+    write_jsonl(tmp_path / "chunks.jsonl", _chunks())
+    hits, stats = hybrid_search(tmp_path, "SEAL training", n_results=3)
+    assert hits[0]["id"] == "c2"
+    assert hits[0]["sources"] == ["bm25"]
+    assert stats["vector_hits"] == 0 and stats["bm25_hits"] >= 1
+    assert "total_ms" in stats
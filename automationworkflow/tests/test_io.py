@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from utils.io import append_jsonl, iter_jsonl, read_jsonl, write_jsonl
+
+
+def test_read_jsonl_filters_and_projects(tmp_path: Path):
+    path = tmp_path / "youtube.jsonl"
+    write_jsonl(path, [
+        {"source_type": "youtube_video", "video_id": "v1", "title": "Talk"},
+        {"source_type": "youtube_comment", "video_id": "v1", "text": "nice", "like_count": 3},
+        {"source_type": "youtube_comment_reply", "video_id": "v1", "text": "agreed", "like_count": 1},
+    ])
+    with path.open("a", encoding="utf-8") as f:
+        f.write("not json\n\n")
+
+    comments = read_jsonl(path, keys=("text", "like_count"), source_types=("youtube_comment",))
+    assert comments == [{"text": "nice", "like_count": 3}]
+    assert len(read_jsonl(path)) == 3
+    assert list(iter_jsonl(tmp_path / "missing.jsonl")) == []
+
+
+def test_append_jsonl(tmp_path: Path):
+    path = tmp_path / "web.jsonl"
+    assert write_jsonl(path, [{"url": "https://a.example", "text": "é"}]) == 1
+    assert append_jsonl(path, [{"url": "https://b.example"}]) == 1
+    assert [r["url"] for r in read_jsonl(path)] == ["https://a.example", "https://b.example"]
+    assert read_jsonl(path)[0]["text"] == "é"
+
+
+def test_indexed_jsonl_roundtrip_and_seek(tmp_path: Path):
+    from storage.indexed_jsonl import IndexedJsonl, write_records
+
+    path = tmp_path / "raw" / "youtube.jsonl"
+    write_jsonl(path, [{"source_type": "stale"}])
+    records = [{"source_type": "youtube_video", "video_id": f"v{i}"} for i in range(3)]
+    records += [
+        {"source_type": "youtube_comment", "video_id": f"v{i % 3}", "comment_id": f"c{i}", "text": f"comment {i}"}
+        for i in range(20)
+    ]
+    assert write_records(path, records, storage_format="gzip") == 23
+    assert not path.exists()
+
+    reader = IndexedJsonl.open(path)
+    assert reader is not None and len(reader) == 23
+    assert reader.source_types() == {"youtube_video": 3, "youtube_comment": 20}
+    v1_comments = list(reader.iter_records(source_types=["youtube_comment"], video_id="v1"))
+    assert [r["comment_id"] for r in v1_comments] == [f"c{i}" for i in range(1, 20, 3)]
+
+    # Plain readers transparently fall back to the indexed file
+    assert len(read_jsonl(path, source_types=("youtube_video",))) == 3
+    assert len(read_jsonl(path)) == 23
+
+
+def test_indexed_jsonl_small_blocks(tmp_path: Path):
+    from storage.indexed_jsonl import IndexedJsonl, write_indexed_jsonl
+
+    path = tmp_path / "chunks.jsonl"
+    chunks = [{"chunk_id": f"k{i}", "source_type": "web_article", "text": "x" * i} for i in range(10)]
+    write_indexed_jsonl(path, chunks, codec="gzip", block_records=3)
+    reader = IndexedJsonl(path)
+    assert len(reader.index["blocks"]) == 4
+    assert reader.get("k7") == chunks[7]
+    assert reader.get("missing") is None
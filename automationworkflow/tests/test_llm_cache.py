@@ -0,0 +1,28 @@
+from llm.cache import ResponseCache, request_key
+
+
+def test_request_key_ignores_dict_order():
+    a = request_key("m", [{"role": "user", "content": "x"}], 0.2, {"type": "json_object"})
+    b = request_key("m", [{"content": "x", "role": "user"}], 0.2, {"type": "json_object"})
+    assert a == b
+    assert a != request_key("m", [{"role": "user", "content": "x"}], 0.2, None)
+
+
+def test_cache_expires_and_evicts_least_recently_used(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path / "llm.sqlite", ttl_s=100, max_bytes=250)
+    clock = [1000.0]
+    monkeypatch.setattr("llm.cache.time.time", lambda: clock[0])
+    for i in range(3):
+        cache.put(bytes([i]), "x" * 100)
+        clock[0] += 1
+    # 300 bytes > 250: the oldest entry went first
+    assert cache.get(bytes([0])) is None
+    assert cache.get(bytes([1])) == "x" * 100
+    clock[0] += 1
+    cache.put(bytes([3]), "y" * 100)
+    # Entry 1 was just read, so 2 is now the least recently used
+    assert cache.get(bytes([2])) is None
+    assert cache.get(bytes([1])) is not None
+    clock[0] += 200
+    assert cache.get(bytes([3])) is None
+    assert cache.stats()["evictions"] >= 2
@@ -0,0 +1,153 @@
+import json
+
+import pytest
+
+from llm import client
+
+
+class _Response:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._body
+
+
+class _Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def post(self, url, headers=None, json=None, timeout=None, stream=False):
+        self.calls.append({"url": url, "json": json, "timeout": timeout})
+        item = self.responses.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+def _ok(content):
+    return _Response(200, {"choices": [{"message": {"content": content}}]})
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_CACHE_PATH", "none")
+    sleeps = []
+    monkeypatch.setattr(client.time, "sleep", sleeps.append)
+
+    def install(responses):
+        session = _Session(responses)
+        monkeypatch.setattr(client, "_session", lambda: session)
+        return session, sleeps
+
+    return install
+
+
+def test_chat_retries_429_and_honors_retry_after(fake):
+    session, sleeps = fake([_Response(429, headers={"Retry-After": "2"}), ConnectionError("reset"), _ok("hi")])
+    assert client.chat([{"role": "user", "content": "x"}], model="m", timeout=5) == "hi"
+    assert len(session.calls) == 3
+    assert sleeps[0] == 2.0
+    assert 0 <= sleeps[1] <= client.BACKOFF_BASE_S * 2
+    assert session.calls[0]["timeout"] == (client.CONNECT_TIMEOUT, 5)
+
+
+def test_chat_json_gives_up_after_max_retries(fake):
+    responses = [_Response(503) for _ in range(3)]
+    session, _ = fake(responses)
+    with pytest.raises(RuntimeError, match="503"):
+        client.chat_json([{"role": "user", "content": "x"}], max_retries=2)
+    assert len(session.calls) == 3
+    assert all(r.closed for r in responses)
+    assert session.calls[0]["json"]["response_format"] == {"type": "json_object"}
+
+
+def test_chat_json_does_not_retry_client_errors(fake):
+    session, _ = fake([_Response(400), _ok(json.dumps({"a": 1}))])
+    with pytest.raises(RuntimeError, match="400"):
+        client.chat_json([{"role": "user", "content": "x"}])
+    assert len(session.calls) == 1
+
+
+def test_identical_requests_are_served_from_cache(fake, monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    session, _ = fake([_ok(json.dumps({"a": 1})), _ok(json.dumps({"a": 2})), _ok(json.dumps({"a": 3}))])
+    messages = [{"role": "user", "content": "x"}]
+    assert client.chat_json(messages, model="m") == {"a": 1}
+    assert client.chat_json(messages, model="m") == {"a": 1}
+    assert len(session.calls) == 1
+    # Any change to model, messages or temperature is a different entry
+    assert client.chat_json(messages, model="m", temperature=0.3) == {"a": 2}
+    # Bypassing calls the API and refreshes the entry
+    assert client.chat_json(messages, model="m", bypass_cache=True) == {"a": 3}
+    assert client.chat_json(messages, model="m") == {"a": 3}
+    stats = client.get_cache().stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+
+class _StreamResponse(_Response):
+    def __init__(self, lines):
+        super().__init__(200)
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+def test_chat_stream_parses_sse_and_caches_the_full_reply(fake, monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    lines = [
+        b": keep-alive",
+        b'data: {"choices":[{"delta":{"role":"assistant"}}]}',
+        b"",
+        b'data: {"choices":[{"delta":{"content":"Hel"}}]}',
+        b'data: {"choices":[{"delta":{"content":"lo"}}]}',
+        b"data: [DONE]",
+        b'data: {"choices":[{"delta":{"content":"ignored"}}]}',
+    ]
+    response = _StreamResponse(lines)
+    throttled = _Response(429)
+    session, _ = fake([throttled, response])
+    messages = [{"role": "user", "content": "x"}]
+    assert list(client.chat_stream(messages, model="m")) == ["Hel", "lo"]
+    # The retried response is released before the next attempt
+    assert throttled.closed
+    assert response.closed
+    assert session.calls[-1]["json"]["stream"] is True
+    # Non-streaming calls with the same request share the cached reply
+    assert client.chat(messages, model="m") == "Hello"
+    assert len(session.calls) == 2
+
+
+def test_unparseable_or_cut_off_replies_are_not_cached(fake, monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    truncated = _Response(200, {"choices": [{"message": {"content": "partial"}, "finish_reason": "length"}]})
+    cut_off = _StreamResponse([b'data: {"choices":[{"delta":{"content":"Hel"}}]}'])
+    session, _ = fake([_ok('{"a": '), _ok(json.dumps({"a": 1})), truncated, _ok("whole"), cut_off, _ok("Hello")])
+    messages = [{"role": "user", "content": "x"}]
+
+    with pytest.raises(json.JSONDecodeError):
+        client.chat_json(messages, model="m")
+    # The retry reaches the API instead of replaying the broken reply from the cache
+    assert client.chat_json(messages, model="m") == {"a": 1}
+    assert client.chat_json(messages, model="m") == {"a": 1}
+    assert len(session.calls) == 2
+
+    assert client.chat(messages, model="t") == "partial"
+    assert client.chat(messages, model="t") == "whole"
+
+    assert list(client.chat_stream(messages, model="s")) == ["Hel"]
+    assert client.chat(messages, model="s") == "Hello"
+    assert len(session.calls) == 6
@@ -0,0 +1,59 @@
+from llm.tokens import context_budget, count_tokens, prompt_budget
+from rag.packing import pack_context
+
+
+def test_pack_context_drops_near_duplicates_and_respects_budget():
+    base = "She rowed solo from Lisbon to Barbados in seventy one days on the boat Kestrel"
+    passages = [
+        {"source": "a", "text": base},
+        {"source": "b", "text": base + " again"},
+        {"source": "c", "text": "Her first book The Quiet Ledger covered money habits of rowers"},
+        {"source": "d", "text": "word " * 2000},
+    ]
+    packed, stats = pack_context(passages, budget_tokens=60)
+    sources = [p["source"] for p in packed]
+    assert "a" in sources and "b" not in sources
+    assert stats["duplicates"] == 1
+    assert stats["tokens"] <= 60
+    assert sum(count_tokens(p["text"]) for p in packed) == stats["tokens"]
+
+
+def test_mmr_prefers_distinct_evidence():
+    passages = [
+        {"source": "a", "text": "ocean rowing storm capsized boat night Atlantic"},
+        {"source": "b", "text": "ocean rowing storm boat Atlantic crossing waves"},
+        {"source": "c", "text": "startup founded forecasting company investors raised"},
+    ]
+    packed, _ = pack_context(passages, budget_tokens=1000, mmr_lambda=0.5)
+    assert [p["source"] for p in packed][:2] == ["a", "c"]
+
+
+def test_context_budget_is_a_share_of_the_prompt_budget(monkeypatch):
+    monkeypatch.delenv("PROMPT_TOKEN_BUDGET", raising=False)
+    assert prompt_budget("gpt-4o-mini-2024-07-18") == 16000
+    assert context_budget("gpt-4o-mini-2024-07-18") == 6000
+    assert context_budget("gpt-4o") == 9000
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "8000")
+    assert context_budget("gpt-4o") == 3000
+
+
+def test_compact_context_trims_lowest_priority_first(monkeypatch):
+    monkeypatch.delenv("PROMPT_TOKEN_BUDGET", raising=False)
+    from llm.tokens import _json_tokens, compact_context, prompt_budget
+
+    context = {
+        "north_star": ["rowed the Atlantic solo"],
+        "transcripts": ["transcript " * 50] * 4,
+        "comments": ["great episode " * 10] * 40,
+    }
+    budget = _json_tokens({**context, "comments": []}, None) + 20
+    out, report = compact_context(context, budget, ["north_star", "transcripts", "comments"])
+    assert out["north_star"] == context["north_star"]
+    assert out["transcripts"] == context["transcripts"]
+    assert len(out["comments"]) < 40
+    assert report["trimmed"] == {"comments": 40 - len(out["comments"])}
+    assert report["tokens"] <= budget < report["tokens_before"]
+    # Untouched when it already fits
+    same, report = compact_context(context, 10 ** 6, ["north_star"])
+    assert same == context and report["trimmed"] == {}
+    assert prompt_budget("gpt-4o-mini") < prompt_budget("gpt-4o")
@@ -0,0 +1,36 @@
+import json
+import threading
+from pathlib import Path
+
+from report import final_report
+
+
+def test_uncached_sections_are_generated_concurrently(tmp_path: Path, monkeypatch):
+    (tmp_path / "communication.json").write_text(json.dumps({"style": "cached"}), encoding="utf-8")
+    threads = {}
+    # Every uncached builder must be running at the same time to get past the barrier;
+    # run one after another, the first wait times out and breaks it
+    barrier = threading.Barrier(3, timeout=10)
+
+    def slow(name, value):
+        def build(guest, guest_dir):
+            threads[name] = threading.current_thread().name
+            if not (guest_dir / final_report.REPORT_SECTION_FILES[name]).exists():
+                barrier.wait()
+            return value
+        return build
+
+    monkeypatch.setattr(final_report, "_build_about_sections", slow("about_sections", {"timeline": {}}))
+    monkeypatch.setattr(final_report, "_build_topics_blocks", slow("topics_blocks", {"common_topics": ["a"]}))
+    monkeypatch.setattr(final_report, "_build_podcast_appearances", slow("appearances", [{"title": "x"}]))
+    monkeypatch.setattr(final_report, "_build_communication_assessment", slow("communication", {"style": "cached"}))
+
+    names = final_report._wanted_sections("about", {"books": ["- [b](u)"]}, {})
+    assert names == ["about_sections", "topics_blocks", "appearances", "communication"]
+    sections = final_report._report_sections("Guest", tmp_path, names)
+    assert not barrier.broken
+    assert sections["topics_blocks"] == {"common_topics": ["a"]}
+    assert sections["communication"] == {"style": "cached"}
+    # Cached sections are read inline; the rest ran on pool threads
+    assert threads["communication"] == threading.current_thread().name
+    assert threads["about_sections"].startswith("report-section")
@@ -0,0 +1,220 @@
+import json
+from pathlib import Path
+
+from storage.sqlite_store import SQLiteStore
+
+
+def _comment(i: int, **extra):
+    return {
+        "source_type": "youtube_comment",
+        "video_id": "vid",
+        "comment_id": f"c{i}",
+        "text": f"comment {i}",
+        "like_count": i,
+        "url": f"https://www.youtube.com/watch?v=vid&lc=c{i}",
+        **extra,
+    }
+
+
+def test_bulk_upsert_records_and_links(tmp_path: Path):
+    store = SQLiteStore(tmp_path / "db.sqlite")
+    gid = store.ensure_guest("Guest")
+    records = [_comment(i) for i in range(10)]
+    # A non-scalar field forces the row-by-row fallback for its batch without losing rows
+    records.append(_comment(10, author=["not", "a", "string"]))
+    assert store.upsert_records(gid, records) == 11
+    assert store.upsert_records(gid, records) == 0
+
+    row = store.conn.execute("SELECT domain, author FROM records WHERE comment_id='c10'").fetchone()
+    assert row[0] == "www.youtube.com"
+    assert json.loads(row[1]) == ["not", "a", "string"]
+    assert store.upsert_links(gid, "books_written", ["https://a.example", "https://a.example"]) == 1
+
+
+def test_insert_inside_caller_transaction_uses_savepoint(tmp_path: Path):
+    store = SQLiteStore(tmp_path / "db.sqlite")
+    gid = store.ensure_guest("Guest")
+    store.conn.execute("INSERT INTO about_guest(guest_id, summary) VALUES (?, 'pending')", (gid,))
+    assert store.conn.in_transaction
+    # The bad row forces the rollback-and-retry path, which must not touch the caller's write
+    assert store.upsert_records(gid, [_comment(1), _comment(2, author=["x"])]) == 2
+    assert store.conn.in_transaction
+    store.conn.rollback()
+    assert store.about(gid) is None
+    assert store.counts_by_source_type(gid) == {}
+    assert store.search("comment", guest_id=gid) == []
+
+
+def test_fts_search_ranks_and_filters(tmp_path: Path):
+    store = SQLiteStore(tmp_path / "db.sqlite")
+    gid = store.ensure_guest("Guest")
+    other = store.ensure_guest("Other")
+    store.upsert_records(gid, [
+        {"source_type": "web_article", "url": "https://a.example", "title": "Burnout and recovery", "text": "How she handled burnout in 2019."},
+        {"source_type": "web_article", "url": "https://b.example", "title": "Cooking", "text": "Recipes and kitchens."},
+        _comment(1, text="Loved the burnout story"),
+    ])
+    store.upsert_records(other, [{"source_type": "web_article", "url": "https://c.example", "title": "Burnout", "text": "burnout burnout"}])
+
+    hits = store.search("What about burnout?", guest_id=gid)
+    assert [h["url"] for h in hits][0] == "https://a.example"
+    assert {h["url"] for h in hits} == {"https://a.example", "https://www.youtube.com/watch?v=vid&lc=c1"}
+    assert "[burnout]" in hits[0]["snippet"].lower()
+    assert store.search("burnout", guest_id=gid, source_types=["youtube_comment"])[0]["source_type"] == "youtube_comment"
+    assert store.search('"); DROP TABLE records; --') == []
+
+
+def test_shared_store_threads_and_close(tmp_path: Path, monkeypatch):
+    import sqlite3
+    import threading
+
+    from storage.sqlite_store import SHARED_DB_NAME, guest_db_path
+
+    monkeypatch.setenv("GUEST_DB_MODE", "shared")
+    db_path = guest_db_path(tmp_path / "Guest")
+    assert db_path == tmp_path / SHARED_DB_NAME
+
+    with SQLiteStore(db_path) as store:
+        gid = store.ensure_guest("Guest")
+        main_conn = store.conn
+        seen = {}
+
+        def worker():
+            seen["conn"] = store.conn
+            seen["inserted"] = store.upsert_records(gid, [_comment(1)])
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        assert seen["conn"] is not main_conn
+        assert seen["inserted"] == 1
+        indexes = {r[0] for r in store.conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        assert {"idx_records_guest_source", "idx_records_guest_video", "idx_records_like_count"} <= indexes
+        assert store.delete_guest("Guest")
+        assert store.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] == 0
+
+    try:
+        main_conn.execute("SELECT 1")
+        raise AssertionError("connection should be closed")
+    except sqlite3.ProgrammingError:
+        pass
+
+
+def test_web_records_dedupe_across_runs(tmp_path: Path):
+    store = SQLiteStore(tmp_path / "db.sqlite")
+    gid = store.ensure_guest("Guest")
+    article = {"source_type": "web_article", "url": "https://a.example", "title": "A", "text": "body"}
+    assert store.upsert_records(gid, [article]) == 1
+    assert store.upsert_records(gid, [article]) == 0
+    assert len(store.search("body", guest_id=gid)) == 1
+
+
+def test_migrates_legacy_unique_constraint(tmp_path: Path):
+    import sqlite3
+
+    db_path = tmp_path / "db.sqlite"
+    legacy = sqlite3.connect(str(db_path))
+    legacy.execute(
+        "CREATE TABLE records (id INTEGER PRIMARY KEY, guest_id INTEGER, source_type TEXT, url TEXT, title TEXT, "
+        "domain TEXT, video_id TEXT, comment_id TEXT, author TEXT, like_count INTEGER, reply_count INTEGER, "
+        "published_at TEXT, text TEXT, text_hash TEXT, extra_json TEXT, "
+        "UNIQUE(guest_id, source_type, url, comment_id, video_id, text_hash))"
+    )
+    legacy.execute("CREATE TABLE guests (id INTEGER PRIMARY KEY, name TEXT UNIQUE, created_at TEXT)")
+    legacy.execute("INSERT INTO guests(id, name) VALUES (1, 'Guest')")
+    for _ in range(2):
+        # NULL comment/video ids never collide in the old UNIQUE, so every run duplicated articles
+        legacy.execute("INSERT INTO records(guest_id, source_type, url, title, text, text_hash) VALUES (1, 'web_article', 'https://a.example', 'A', 'burnout', 'h')")
+    legacy.commit()
+    legacy.close()
+
+    with SQLiteStore(db_path) as store:
+        assert store.conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        assert store.conn.execute("SELECT id FROM records").fetchall() == [(1,)]
+        assert [h["id"] for h in store.search("burnout")] == [1]
+
+
+def test_query_layer_and_guest_corpus_fallback(tmp_path: Path, monkeypatch):
+    from storage import guest_corpus
+    from utils.io import write_jsonl
+
+    monkeypatch.delenv("GUEST_DB_MODE", raising=False)
+    guest_dir = tmp_path / "Guest"
+    records = [
+        {"source_type": "youtube_video", "video_id": "vid", "title": "Talk", "channel": "Chan", "url": "https://www.youtube.com/watch?v=vid"},
+        {"source_type": "youtube_transcript", "video_id": "vid", "text": "transcript text"},
+        {"source_type": "web_article", "url": "https://news.example/a", "title": "A", "text": "article"},
+    ] + [_comment(i) for i in (5, 50, 7)]
+    write_jsonl(guest_dir / "raw" / "youtube.jsonl", [r for r in records if r["source_type"] != "web_article"])
+    write_jsonl(guest_dir / "web.jsonl", [records[2]])
+
+    # JSONL fallback before Agent 1 data is in SQLite
+    assert [c["comment_id"] for c in guest_corpus.top_comments(guest_dir, limit=2)] == ["c50", "c7"]
+
+    with SQLiteStore(guest_dir / "db.sqlite") as store:
+        gid = store.ensure_guest("Guest")
+        store.upsert_records(gid, records)
+        assert store.upsert_records(gid, [_comment(5, like_count=500)]) == 1
+        assert store.counts_by_source_type(gid)["youtube_comment"] == 3
+        assert store.web_articles(gid, domain="news.example")[0]["title"] == "A"
+        assert store.videos(gid)[0]["channel"] == "Chan"
+
+    assert [c["comment_id"] for c in guest_corpus.top_comments(guest_dir, limit=2)] == ["c5", "c50"]
+    assert guest_corpus.transcripts(guest_dir, video_id="vid")[0]["text"] == "transcript text"
+    assert "text" not in guest_corpus.web_records(guest_dir, with_text=False)[0]
+
+
+def test_cached_store_follows_rebuilt_database(tmp_path: Path, monkeypatch):
+    import shutil
+
+    from storage import guest_corpus
+    from storage.sqlite_store import close_all_stores, evict_store, get_store
+
+    monkeypatch.delenv("GUEST_DB_MODE", raising=False)
+    guest_dir = tmp_path / "Guest"
+
+    def build(text: str) -> None:
+        with SQLiteStore(guest_dir / "db.sqlite") as store:
+            store.upsert_records(store.ensure_guest("Guest"), [_comment(1, text=text)])
+
+    build("old comment")
+    assert guest_corpus.top_comments(guest_dir)[0]["text"] == "old comment"
+    # Deleted and rebuilt behind the cache's back: the next read reopens the new file
+    shutil.rmtree(guest_dir)
+    build("new comment")
+    assert guest_corpus.top_comments(guest_dir)[0]["text"] == "new comment"
+
+    store = get_store(guest_dir / "db.sqlite")
+    evict_store(guest_dir / "db.sqlite")
+    assert store._closed
+    assert get_store(guest_dir / "db.sqlite") is not store
+    close_all_stores()
+
+
+def test_cached_store_survives_writes_and_checkpoints(tmp_path: Path):
+    from storage.sqlite_store import close_all_stores, get_store
+
+    db_path = tmp_path / "db.sqlite"
+    cached = get_store(db_path)
+    with SQLiteStore(db_path) as writer:
+        writer.upsert_records(writer.ensure_guest("Guest"), [_comment(1)])
+        writer.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    assert get_store(db_path) is cached
+    assert not cached._closed
+    close_all_stores()
+
+
+def test_replace_records_drops_previous_run(tmp_path: Path):
+    store = SQLiteStore(tmp_path / "db.sqlite")
+    gid = store.ensure_guest("Guest")
+    other = store.ensure_guest("Other")
+    store.upsert_records(other, [_comment(9, text="other guest burnout")])
+    store.replace_records(gid, [_comment(1, text="first run burnout"), _comment(2)], links={"social_bio": ["https://old.example"]})
+    store.replace_records(gid, [_comment(2), _comment(3, text="second run burnout")], links={"social_bio": ["https://new.example"]})
+
+    assert [c["comment_id"] for c in store.top_comments(gid)] == ["c3", "c2"]
+    assert store.links(gid, "social_bio") == ["https://new.example"]
+    assert [h["text"] for h in store.search("burnout", guest_id=gid)] == ["second run burnout"]
+    assert store.counts_by_source_type(other) == {"youtube_comment": 1}
+    assert not store.conn.in_transaction
+    store.close()
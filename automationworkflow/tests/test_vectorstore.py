@@ -0,0 +1,329 @@
+from pathlib import Path
+
+import pytest
+
+from utils.io import write_jsonl
+
+
+def _chunks():
+    texts = [
+        "morning routine and cold showers",
+        "raising venture capital for a startup",
+        "sleep quality and recovery after training",
+        "writing a book every single day",
+    ]
+    return [
+        {"chunk_id": f"c{i}", "text": t, "source_type": "youtube_transcript", "video_id": "v1", "guest": "Guest"}
+        for i, t in enumerate(texts)
+    ]
+
+
+def test_numpy_backend_build_and_query(tmp_path: Path, monkeypatch):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.vectorstore import build_index, query, resolve_backend
+
+    monkeypatch.delenv("VECTOR_BACKEND", raising=False)
+    chunks_path = tmp_path / "chunks.jsonl"
+    write_jsonl(chunks_path, _chunks())
+    db_dir = tmp_path / "chroma"
+
+    count, _ = build_index(chunks_path, db_dir, backend="numpy", embedder=HashingEmbedder())
+    assert count == 4
+    # Without config, queries pick up the index that exists
+    assert resolve_backend(db_dir) == "numpy"
+
+    hits = query(db_dir, "how to raise venture capital", n_results=2)
+    assert [h["id"] for h in hits][0] == "c1"
+    assert len(hits) == 2
+    assert hits[0]["metadata"]["video_id"] == "v1"
+    assert hits[0]["distance"] <= hits[1]["distance"]
+    assert query(tmp_path / "missing", "anything", backend="numpy") == []
+
+
+def test_numpy_sync_only_embeds_changes(tmp_path: Path):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.vectorstore import sync_index
+
+    class CountingEmbedder(HashingEmbedder):
+        calls = 0
+
+        def __call__(self, input):
+            CountingEmbedder.calls += len(input)
+            return super().__call__(input)
+
+    chunks_path = tmp_path / "chunks.jsonl"
+    db_dir = tmp_path / "chroma"
+    chunks = _chunks()
+    write_jsonl(chunks_path, chunks)
+    first = sync_index(chunks_path, db_dir, backend="numpy", embedder=CountingEmbedder())
+    assert first["added"] == 4 and first["embedded"] == 4
+
+    chunks[1]["text"] = "bootstrapping instead of raising money"
+    write_jsonl(chunks_path, chunks[:3])
+    CountingEmbedder.calls = 0
+    second = sync_index(chunks_path, db_dir, backend="numpy", embedder=CountingEmbedder())
+    assert CountingEmbedder.calls == 1
+    assert (second["added"], second["updated"], second["unchanged"], second["deleted"], second["total"]) == (0, 1, 2, 1, 3)
+
+
+def test_numpy_store_handles_are_cached_until_rebuild(tmp_path: Path):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.vectorstore import build_index, get_numpy_store, query
+
+    chunks_path = tmp_path / "chunks.jsonl"
+    db_dir = tmp_path / "chroma"
+    write_jsonl(chunks_path, _chunks())
+    build_index(chunks_path, db_dir, backend="numpy", embedder=HashingEmbedder())
+
+    query(db_dir, "sleep", backend="numpy")
+    store = get_numpy_store(db_dir)
+    assert get_numpy_store(db_dir) is store
+    assert store._loaded is not None
+
+    write_jsonl(chunks_path, _chunks()[:2])
+    build_index(chunks_path, db_dir, backend="numpy", embedder=HashingEmbedder())
+    assert get_numpy_store(db_dir) is not store
+    assert len(query(db_dir, "sleep", n_results=10, backend="numpy")) == 2
+
+
+def test_query_many_dedupes_across_queries(tmp_path: Path):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.vectorstore import build_index, query_many
+
+    chunks_path = tmp_path / "chunks.jsonl"
+    db_dir = tmp_path / "chroma"
+    write_jsonl(chunks_path, _chunks())
+    build_index(chunks_path, db_dir, backend="numpy", embedder=HashingEmbedder())
+
+    first, second = query_many(db_dir, ["raising venture capital", "venture capital startup"], n_results=2)
+    assert first[0]["id"] == "c1"
+    assert len(second) == 2
+    assert not {h["id"] for h in first} & {h["id"] for h in second}
+    raw = query_many(db_dir, ["raising venture capital", "venture capital startup"], n_results=2, dedupe=False)
+    assert raw[1][0]["id"] == "c1"
+
+
+def test_cached_embedder_embeds_each_text_once(tmp_path: Path):
+    from rag.embeddings import CachedEmbedder
+
+    seen = []
+
+    class FakeModel:
+        def name(self):
+            return "fake"
+
+        def __call__(self, input):
+            seen.extend(input)
+            return [[float(len(t)), 1.0] for t in input]
+
+    cache_path = tmp_path / "embeddings.sqlite"
+    emb = CachedEmbedder(FakeModel(), cache_path)
+    assert emb(input=["same", "same", "other"]) == [[4.0, 1.0], [4.0, 1.0], [5.0, 1.0]]
+    assert seen == ["same", "other"]
+
+    # A fresh process (new wrapper) reads the persisted vectors
+    again = CachedEmbedder(FakeModel(), cache_path)
+    assert again(input=["other", "new"]) == [[5.0, 1.0], [3.0, 1.0]]
+    assert seen == ["same", "other", "new"]
+    assert (again.hits, again.misses) == (1, 1)
+    assert again.name() == "fake"
+
+
+def test_onnx_embedder_names_differ_per_model_file(tmp_path: Path):
+    from rag.embeddings import _file_fingerprint
+
+    v1 = tmp_path / "v1" / "model" / "model.onnx"
+    v2 = tmp_path / "v2" / "model" / "model.onnx"
+    for path in (v1, v2):
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"weights")
+    # Same directory name, different model files: cache keys and index metadata must not collide
+    assert _file_fingerprint(v1) != _file_fingerprint(v2)
+    assert _file_fingerprint(v1) == _file_fingerprint(v1)
+
+
+def test_chroma_sync_reembeds_when_the_model_changes(tmp_path: Path, monkeypatch):
+    from rag import vectorstore
+    from rag.embeddings import HashingEmbedder
+
+    class FakeCollection:
+        def __init__(self):
+            self.metas = {}
+            self.upserted = []
+
+        def get(self, where=None, include=None, limit=None, offset=0):
+            ids = list(self.metas)[offset:offset + limit]
+            return {"ids": ids, "metadatas": [self.metas[i] for i in ids]}
+
+        def upsert(self, ids, documents, metadatas):
+            self.upserted.extend(ids)
+            self.metas.update(zip(ids, metadatas))
+
+        def delete(self, ids=None, where=None):
+            for i in ids or []:
+                self.metas.pop(i, None)
+
+    coll = FakeCollection()
+    monkeypatch.setattr(vectorstore, "get_collection", lambda *a, **k: coll)
+    monkeypatch.setattr(vectorstore, "get_client", lambda db_dir: object())
+    chunks_path = tmp_path / "chunks.jsonl"
+    write_jsonl(chunks_path, _chunks())
+
+    vectorstore.sync_index(chunks_path, tmp_path / "chroma", backend="chroma", embedder=HashingEmbedder(384))
+    again = vectorstore.sync_index(chunks_path, tmp_path / "chroma", backend="chroma", embedder=HashingEmbedder(384))
+    assert again["unchanged"] == 4
+    coll.upserted.clear()
+    switched = vectorstore.sync_index(chunks_path, tmp_path / "chroma", backend="chroma", embedder=HashingEmbedder(256))
+    assert switched["updated"] == 4 and len(coll.upserted) == 4
+    assert {m["embedder"] for m in coll.metas.values()} == {"hashing-256"}
+
+
+def test_background_index_fails_without_a_model(tmp_path: Path, monkeypatch):
+    pytest.importorskip("numpy")
+    from rag import numpy_store
+    from rag.indexer import start_background_index, wait_for_index
+
+    def no_model():
+        raise RuntimeError("no embedding model available")
+
+    # The build must not fall back to hashing vectors and report the index as ready
+    monkeypatch.setattr(numpy_store, "model_embedder", no_model)
+    guest_dir = tmp_path / "Guest"
+    write_jsonl(guest_dir / "chunks.jsonl", _chunks())
+    start_background_index(guest_dir, backend="numpy", total=4)
+    status = wait_for_index(guest_dir, timeout=30)
+    assert status["state"] == "failed"
+    assert "no embedding model" in status["error"]
+    assert not numpy_store.NumpyVectorStore.exists(guest_dir / "chroma")
+
+
+def test_global_index_filters_by_guest(tmp_path: Path):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.hybrid import hybrid_search
+    from rag.vectorstore import global_db_dir, query, remove_from_global_index, sync_global_index
+
+    for guest in ("Ada", "Bob"):
+        write_jsonl(tmp_path / guest / "chunks.jsonl", [{**c, "guest": guest} for c in _chunks()])
+        sync_global_index(tmp_path, guest, backend="numpy", embedder=HashingEmbedder())
+    db_dir = global_db_dir(tmp_path)
+
+    everyone = query(db_dir, "venture capital", n_results=2)
+    assert {h["metadata"]["guest"] for h in everyone} == {"Ada", "Bob"}
+    only_bob = query(db_dir, "venture capital", n_results=3, where={"guest": "Bob"})
+    assert [h["id"] for h in only_bob][0] == "Bob::c1"
+    assert all(h["metadata"]["guest"] == "Bob" for h in only_bob)
+    assert query(db_dir, "venture capital", where={"guest": "Bob", "source_type": ["web_article"]}) == []
+
+    # Refreshing one guest leaves the other guest's chunks alone
+    write_jsonl(tmp_path / "Ada" / "chunks.jsonl", _chunks()[:1])
+    stats = sync_global_index(tmp_path, "Ada", backend="numpy", embedder=HashingEmbedder())
+    assert stats["deleted"] == 3 and stats["total"] == 5
+    assert len(query(db_dir, "anything", n_results=10, where={"guest": "Bob"})) == 4
+
+    # Guests without their own index retrieve from their slice of the global one
+    hits, _ = hybrid_search(tmp_path / "Bob", "venture capital", n_results=3)
+    assert hits[0]["id"] == "c1" and hits[0]["sources"] == ["vector", "bm25"]
+
+    remove_from_global_index(tmp_path, "Bob")
+    assert query(db_dir, "venture capital", where={"guest": "Bob"}) == []
+    assert len(query(db_dir, "anything", n_results=10)) == 1
+
+
+def test_background_index_reaches_ready(tmp_path: Path):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.indexer import read_status, start_background_index, wait_for_index
+    from rag.vectorstore import query
+
+    guest_dir = tmp_path / "Guest"
+    write_jsonl(guest_dir / "chunks.jsonl", _chunks())
+    embedder = HashingEmbedder()
+    started = start_background_index(guest_dir, backend="numpy", total=4, embedder=embedder)
+    assert started["state"] in ("queued", "building", "ready")
+
+    status = wait_for_index(guest_dir, timeout=30)
+    assert status["state"] == "ready"
+    assert status["processed"] == status["total"] == 4
+    assert read_status(guest_dir)["stats"]["added"] == 4
+    hits = query(guest_dir / "chroma", "venture capital", n_results=1, backend="numpy", embedder=embedder)
+    assert hits[0]["id"] == "c1"
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_numpy_quantized_index_reranks_exactly(tmp_path: Path, quantization: str):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.numpy_store import NumpyVectorStore, quantized_path_for
+
+    words = ["rowing", "ocean", "startup", "book", "sleep", "storm", "investors", "podcast", "family", "data"]
+    chunks = [
+        {"chunk_id": f"c{i}", "text": f"{words[i % 10]} {words[(i * 3) % 10]} {words[(i * 7) % 10]} note {i}", "guest": "G"}
+        for i in range(200)
+    ]
+    embedder = HashingEmbedder()
+    exact = NumpyVectorStore(tmp_path / "exact")
+    exact.build(chunks, embedder=embedder)
+    store = NumpyVectorStore(tmp_path / "quant")
+    store.build(chunks, embedder=embedder, quantization=quantization)
+    assert quantized_path_for(store.current_dir(), store.collection_name, quantization).exists()
+    assert store.quantized() is not None and store.quantized()[0].dtype.name == quantization
+
+    queries = ["ocean storm", "startup investors podcast", "note 17"]
+    for want, got in zip(exact.query(queries, n_results=5, embedder=embedder), store.query(queries, n_results=5, embedder=embedder)):
+        assert [h["id"] for h in got] == [h["id"] for h in want]
+        assert [h["distance"] for h in got] == pytest.approx([h["distance"] for h in want], abs=1e-6)
+
+    # A rebuild keeps the stored setting unless told otherwise
+    store.build(chunks[:50], embedder=embedder)
+    assert store.quantization() == quantization
+    store.build(chunks[:50], embedder=embedder, quantization="float32")
+    assert store.quantized() is None
+    assert not quantized_path_for(store.current_dir(), store.collection_name, quantization).exists()
+
+
+def test_numpy_rebuild_swaps_generations_atomically(tmp_path: Path):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.numpy_store import NumpyVectorStore, meta_path_for
+
+    embedder = HashingEmbedder()
+    chunks = [{"chunk_id": f"c{i}", "text": f"topic {i} " + "ocean " * (i % 3), "guest": "G"} for i in range(20)]
+    writer = NumpyVectorStore(tmp_path)
+    writer.build(chunks, embedder=embedder)
+    first = writer.current_dir()
+
+    # A reader holding the first generation keeps a consistent matrix/metadata pair
+    reader = NumpyVectorStore(tmp_path)
+    gen, mat, _ = reader._state()
+    assert gen == first and mat.shape[0] == 20
+
+    writer.build(chunks[:5], embedder=embedder)
+    second = writer.current_dir()
+    assert second != first and first.exists()
+    assert reader._fetch_rows(gen, [19])[19][1] == "c19"
+    hits = reader.query(["topic 17"], n_results=10, embedder=embedder)[0]
+    assert reader._state()[0] == second
+    assert sorted(h["id"] for h in hits) == [f"c{i}" for i in range(5)]
+
+    # The build after that removes the generation no reader can still be using
+    writer.build(chunks[:3], embedder=embedder)
+    assert not first.exists() and second.exists()
+    assert not meta_path_for(tmp_path, "guest_chunks").exists()
+
+
+def test_sync_counts_duplicate_chunk_ids(tmp_path: Path, caplog):
+    pytest.importorskip("numpy")
+    from rag.embeddings import HashingEmbedder
+    from rag.vectorstore import sync_index
+
+    chunks_path = tmp_path / "chunks.jsonl"
+    write_jsonl(chunks_path, _chunks() + [{"chunk_id": "c0", "text": "a different chunk reusing an id"}])
+    with caplog.at_level("WARNING"):
+        stats = sync_index(chunks_path, tmp_path / "chroma", backend="numpy", embedder=HashingEmbedder())
+    assert (stats["total"], stats["duplicates"]) == (4, 1)
+    assert "1 chunks whose chunk_id was already indexed" in caplog.text
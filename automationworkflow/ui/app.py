@@ -13,7 +13,7 @@ if str(PROJECT_ROOT) not in sys.path:
 from ingestion.youtube import YouTubeIngestor
 from ingestion.web import WebIngestor
 from utils.normalize import ChunkNormalizer
-from utils.io import write_jsonl, ensure_dir
+from utils.io import write_jsonl, ensure_dir, jsonl_exists
 from run_agent1 import run_agent1
 # keep the imported agent2 main under a distinct name so it doesn't collide with the button variable
 from run_agent2 import main as run_agent2_cli
@@ -80,16 +80,35 @@ guest_dir = outputs_root / guest
 # Persist chosen guest to session state for cross-page consistency
 if guest and guest != st.session_state.get("selected_guest"):
     st.session_state["selected_guest"] = guest
-agent1_done = (guest_dir / "chunks.jsonl").exists()
+agent1_done = jsonl_exists(guest_dir / "chunks.jsonl")
 agent2_done = (guest_dir / "agent2" / "north_star.json").exists()
 agent3_done = (guest_dir / "agent3" / "plan.json").exists()
 
 with st.container():
     st.subheader("Completion Status")
-    c1, c2, c3 = st.columns(3)
+    c1, c2, c3, c4 = st.columns(4)
     c1.markdown(f"**Agent 1:** {'✅ Done' if agent1_done else '⏳ Pending'}")
     c2.markdown(f"**Agent 2:** {'✅ Done' if agent2_done else '⏳ Pending'}")
     c3.markdown(f"**Agent 3:** {'✅ Done' if agent3_done else '⏳ Pending'}")
+    try:
+        from rag.indexer import read_status
+        idx = read_status(guest_dir)
+    except Exception:
+        idx = {}
+    idx_state = idx.get("state")
+    if idx_state == "ready":
+        c4.markdown("**Index:** ✅ Ready")
+    elif idx_state in ("queued", "building"):
+        done_n, total_n = idx.get("processed") or 0, idx.get("total")
+        c4.markdown(f"**Index:** 🔄 Building ({done_n}/{total_n})" if total_n else "**Index:** 🔄 Building")
+        if total_n:
+            c4.progress(min(1.0, done_n / total_n))
+    elif idx_state in ("failed", "stale"):
+        c4.markdown(f"**Index:** ⚠️ {idx_state.capitalize()}")
+        if idx.get("error"):
+            c4.caption(idx["error"])
+    else:
+        c4.markdown(f"**Index:** {'✅ Ready' if (guest_dir / 'chroma').exists() else '⏳ Pending'}")
 
 # Allow user to select or customize a North Star point for downstream agents
 ns_dir = guest_dir / "agent2"
@@ -239,10 +258,10 @@ elif generate_report:
 
 elif ask and user_question.strip():
     try:
-        from chatbot.answer import answer_question
+        from chatbot.answer import answer_question_stream
         outputs_root = PROJECT_ROOT / "outputs"
         guest_dir = outputs_root / guest
-        res = answer_question(
+        res = answer_question_stream(
             guest,
             guest_dir,
             user_question.strip(),
@@ -252,23 +271,40 @@ elif ask and user_question.strip():
             web_max_results=int(web_max),
         )
         st.subheader("Answer")
-        st.write(res.get("answer", ""))
+        # Tokens render as they arrive; citations follow once the stream ends
+        st.write_stream(res["stream"])
         cites = [c for c in res.get("citations", []) if c]
         if cites:
             st.subheader("Citations")
             for c in cites[:10]:
                 st.write(c)
+        stats = res.get("retrieval") or {}
+        if stats:
+            st.caption(
+                f"Retrieval: {stats.get('returned', 0)} hits in {stats.get('total_ms', 0)} ms "
+                f"(vector {stats.get('vector_hits', 0)} / {stats.get('vector_ms', 0)} ms, "
+                f"BM25 {stats.get('bm25_hits', 0)} / {stats.get('bm25_ms', 0)} ms)"
+            )
+        packing = stats.get("packing") or {}
+        if packing:
+            st.caption(
+                f"Context: {packing.get('packed', 0)} of {packing.get('candidates', 0)} passages, "
+                f"{packing.get('tokens', 0)}/{packing.get('budget', 0)} tokens "
+                f"({packing.get('duplicates', 0)} near-duplicates dropped)"
+            )
     except Exception as e:
         st.error(f"Chat failed: {e}")
 
 # Downloads (always shown if files exist)
 yt_jsonl = guest_dir / "raw" / "youtube.jsonl"
-if yt_jsonl.exists():
+# Compressed storage keeps youtube.jsonl.gz/.zst (valid multi-member streams) instead
+yt_download = next((p for p in (yt_jsonl, yt_jsonl.with_name("youtube.jsonl.gz"), yt_jsonl.with_name("youtube.jsonl.zst")) if p.exists()), None)
+if yt_download is not None:
     st.markdown("---")
     st.subheader("Downloads")
     st.download_button(
-        label="Download YouTube dataset (youtube.jsonl)",
-        data=yt_jsonl.read_bytes(),
-        file_name=f"{guest} - youtube.jsonl",
-        mime="application/json",
+        label=f"Download YouTube dataset ({yt_download.name})",
+        data=yt_download.read_bytes(),
+        file_name=f"{guest} - {yt_download.name}",
+        mime="application/json" if yt_download.suffix == ".jsonl" else "application/octet-stream",
     )
@@ -20,9 +20,45 @@ st.title("Guests Manager")
 outputs_root = PROJECT_ROOT / "outputs"
 outputs_root.mkdir(parents=True, exist_ok=True)
 
-guest_dirs = [d for d in outputs_root.iterdir() if d.is_dir()]
+# Directories starting with "_" hold shared data (e.g. the analytics dataset), not guests
+guest_dirs = [d for d in outputs_root.iterdir() if d.is_dir() and not d.name.startswith("_")]
 guest_names = sorted([d.name for d in guest_dirs])
 
+def _purge_shared_db(name: str) -> None:
+    # Per-guest db.sqlite files go away with the folder; the shared DB needs an explicit delete
+    try:
+        from storage.sqlite_store import SHARED_DB_NAME, SQLiteStore
+        shared = outputs_root / SHARED_DB_NAME
+        if shared.exists():
+            with SQLiteStore(shared) as store:
+                store.delete_guest(name)
+    except Exception:
+        pass
+
+def _release_guest_db(guest_dir: Path) -> None:
+    # The process-wide store cache keeps db.sqlite open; close it before the folder goes
+    try:
+        from storage.sqlite_store import evict_store
+        evict_store(guest_dir / "db.sqlite")
+    except Exception:
+        pass
+
+def _release_vector_index(guest_dir: Path) -> None:
+    # Cached vector index handles keep files open, which blocks deletion on Windows
+    try:
+        from rag.vectorstore import invalidate
+        invalidate(guest_dir / "chroma", release_client=True)
+    except Exception:
+        pass
+
+def _purge_global_index(name: str) -> None:
+    # Like the shared DB, the cross-guest vector index outlives the guest folder
+    try:
+        from rag.vectorstore import remove_from_global_index
+        remove_from_global_index(outputs_root, name)
+    except Exception:
+        pass
+
 def _normalize_name(name: str) -> str:
     # Normalize Unicode and collapse all whitespace to single ASCII spaces
     n = unicodedata.normalize("NFKC", name or "")
@@ -81,7 +117,11 @@ else:
                                     except Exception:
                                         pass
                                     func(path)
+                                _release_guest_db(target)
+                                _release_vector_index(target)
                                 shutil.rmtree(target, onerror=on_rm_error)
+                                _purge_shared_db(target.name)
+                                _purge_global_index(target.name)
                                 if st.session_state.get("selected_guest") == selected:
                                     st.session_state["selected_guest"] = ""
                                 st.success(f"Deleted: {target.name}")
@@ -102,7 +142,11 @@ else:
                                 except Exception:
                                     pass
                                 func(path)
+                            _release_guest_db(target)
+                            _release_vector_index(target)
                             shutil.rmtree(target, onerror=on_rm_error)
+                            _purge_shared_db(selected)
+                            _purge_global_index(selected)
                             if st.session_state.get("selected_guest") == selected:
                                 st.session_state["selected_guest"] = ""
                             st.success(f"Deleted: {selected}")
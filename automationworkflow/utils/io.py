@@ -1,16 +1,107 @@
 from pathlib import Path
-from typing import Iterable, Dict
+from typing import Iterable, Iterator, Dict, List, Optional, Sequence
 import json
 
+try:
+    # Optional fast JSON backend; stdlib json is used when it's not installed
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # type: ignore
+
 
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def write_jsonl(path: Path, records: Iterable[Dict]) -> None:
+def _loads(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _dumps(rec: Dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(rec)
+        except TypeError:
+            # e.g. non-str keys or ints beyond 64 bits; stdlib handles those
+            pass
+    return json.dumps(rec, ensure_ascii=False).encode("utf-8")
+
+
+def iter_jsonl(
+    path: Path,
+    keys: Optional[Sequence[str]] = None,
+    source_types: Optional[Iterable[str]] = None,
+) -> Iterator[Dict]:
+    """Lazily yield records from a JSONL file.
+
+    Missing files yield nothing and malformed lines are skipped. `source_types`
+    keeps only matching records; lines that cannot match are rejected on a raw
+    substring check before being decoded. `keys` projects each record down to
+    the given fields so callers don't keep large unused values (e.g. transcripts)
+    alive.
+
+    When only a compressed, indexed variant of `path` exists (see
+    `storage.indexed_jsonl`), records are served from it and the `source_types`
+    filter is answered from its index.
+    """
+    path = Path(path)
+    if not path.exists():
+        from storage.indexed_jsonl import IndexedJsonl
+        reader = IndexedJsonl.open(path)
+        if reader is not None:
+            yield from reader.iter_records(source_types=source_types, keys=keys)
+        return
+    wanted = set(source_types) if source_types is not None else None
+    needles = [json.dumps(t).encode("utf-8") for t in wanted] if wanted else None
+    try:
+        with path.open("rb") as f:
+            for line in f:
+                if needles is not None and not any(n in line for n in needles):
+                    continue
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = _loads(line)
+                except Exception:
+                    continue
+                if not isinstance(rec, dict):
+                    continue
+                if wanted is not None and rec.get("source_type") not in wanted:
+                    continue
+                if keys is not None:
+                    rec = {k: rec[k] for k in keys if k in rec}
+                yield rec
+    except OSError:
+        return
+
+
+def jsonl_exists(path: Path) -> bool:
+    """True if `path` exists as plain JSONL or as a compressed, indexed variant."""
+    from storage.indexed_jsonl import index_path_for
+    return Path(path).exists() or index_path_for(Path(path)).exists()
+
+
+def read_jsonl(
+    path: Path,
+    keys: Optional[Sequence[str]] = None,
+    source_types: Optional[Iterable[str]] = None,
+) -> List[Dict]:
+    return list(iter_jsonl(path, keys=keys, source_types=source_types))
+
+
+def write_jsonl(path: Path, records: Iterable[Dict], append: bool = False) -> int:
+    """Write records one per line (streamed); returns how many were written."""
     ensure_dir(path.parent)
-    with path.open("w", encoding="utf-8") as f:
+    count = 0
+    with path.open("ab" if append else "wb") as f:
         for rec in records:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.write(_dumps(rec) + b"\n")
+            count += 1
+    return count
 
 
+def append_jsonl(path: Path, records: Iterable[Dict]) -> int:
+    return write_jsonl(path, records, append=True)
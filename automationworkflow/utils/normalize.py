@@ -1,7 +1,15 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Deque, Union
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
+from pathlib import Path
 import hashlib
 
+from utils.io import write_jsonl
+
+
+CHUNKED_SOURCE_TYPES = {"web_article", "youtube_transcript", "youtube_comment", "youtube_comment_reply"}
+
 
 def compute_text_hash(text: str) -> str:
     return "sha256:" + hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
@@ -20,27 +28,96 @@ def _chunk_text(text: str, max_tokens: int = 800) -> List[str]:
     return chunks
 
 
+def _chunk_id_prefix(rec: Dict) -> str:
+    """Chunk ids are `<prefix><n>`. YouTube records are identified by video/comment id;
+    web pages have neither, so a short hash of the url (or the text) keeps their ids apart."""
+    video_id = rec.get("video_id", "")
+    comment_id = rec.get("comment_id", "")
+    if video_id or comment_id:
+        return f"{rec.get('source_type')}_{video_id}_{comment_id}_"
+    key = rec.get("url") or rec.get("text") or ""
+    digest = hashlib.blake2b(key.encode("utf-8", errors="ignore"), digest_size=6).hexdigest()
+    return f"{rec.get('source_type')}_{digest}_"
+
+
+def _is_ready(pieces) -> bool:
+    return not isinstance(pieces, Future) or pieces.done()
+
+
 class ChunkNormalizer:
-    def normalize(self, records: List[Dict], guest: str) -> List[Dict]:
-        chunks: List[Dict] = []
+    """Split text-bearing records into chunk dicts.
+
+    `workers` > 0 fans chunking of texts longer than `parallel_min_chars` out to a
+    process pool; shorter texts are always chunked inline since pickling them would
+    cost more than slicing. Output order always follows input order.
+    """
+
+    def __init__(self, max_tokens: int = 800, workers: int = 0, parallel_min_chars: int = 200_000):
+        self.max_tokens = max_tokens
+        self.workers = workers
+        self.parallel_min_chars = parallel_min_chars
+
+    def _build_chunks(self, rec: Dict, pieces: List[str], guest: str, created: str) -> Iterator[Dict]:
+        source_type = rec.get("source_type")
+        video_id = rec.get("video_id")
+        comment_id = rec.get("comment_id")
+        url = rec.get("url")
+        prefix = _chunk_id_prefix(rec)
+        for idx, ch in enumerate(pieces):
+            yield {
+                "chunk_id": prefix + str(idx),
+                "text": ch,
+                "source_type": source_type,
+                "video_id": video_id,
+                "comment_id": comment_id,
+                "url": url,
+                "guest": guest,
+                "created_at": created,
+            }
+
+    def iter_chunks(self, records: Iterable[Dict], guest: str) -> Iterator[Dict]:
+        """Lazily yield chunks for `records` (any iterable, consumed once)."""
         created = datetime.utcnow().isoformat()
-        for rec in records:
-            if rec.get("source_type") in {"web_article", "youtube_transcript", "youtube_comment", "youtube_comment_reply"}:
+        if self.workers <= 0:
+            for rec in records:
+                if rec.get("source_type") not in CHUNKED_SOURCE_TYPES:
+                    continue
+                text = rec.get("text") or ""
+                if text:
+                    yield from self._build_chunks(rec, _chunk_text(text, self.max_tokens), guest, created)
+            return
+
+        # Bounded in-order window: large texts are chunked in the pool while smaller
+        # records queue up behind them, so memory stays proportional to the window.
+        window = max(1, self.workers * 4)
+        pending: Deque = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for rec in records:
+                if rec.get("source_type") not in CHUNKED_SOURCE_TYPES:
+                    continue
                 text = rec.get("text") or ""
                 if not text:
                     continue
-                for idx, ch in enumerate(_chunk_text(text)):
-                    chunk_id = f"{rec.get('source_type')}_{rec.get('video_id', '')}_{rec.get('comment_id', '')}_{idx}"
-                    chunks.append({
-                        "chunk_id": chunk_id,
-                        "text": ch,
-                        "source_type": rec.get("source_type"),
-                        "video_id": rec.get("video_id"),
-                        "comment_id": rec.get("comment_id"),
-                        "url": rec.get("url"),
-                        "guest": guest,
-                        "created_at": created,
-                    })
-        return chunks
+                pieces: Union[List[str], Future]
+                if len(text) >= self.parallel_min_chars:
+                    pieces = pool.submit(_chunk_text, text, self.max_tokens)
+                else:
+                    pieces = _chunk_text(text, self.max_tokens)
+                pending.append((rec, pieces))
+                while len(pending) > window or (pending and _is_ready(pending[0][1])):
+                    yield from self._drain_one(pending, guest, created)
+            while pending:
+                yield from self._drain_one(pending, guest, created)
+
+    def _drain_one(self, pending: Deque, guest: str, created: str) -> Iterator[Dict]:
+        rec, pieces = pending.popleft()
+        if isinstance(pieces, Future):
+            pieces = pieces.result()
+        yield from self._build_chunks(rec, pieces, guest, created)
 
+    def normalize(self, records: Iterable[Dict], guest: str) -> List[Dict]:
+        return list(self.iter_chunks(records, guest))
 
+    def normalize_to_file(self, records: Iterable[Dict], guest: str, out_path: Path) -> int:
+        """Stream chunks straight to a JSONL file without materializing them; returns the chunk count."""
+        return write_jsonl(Path(out_path), self.iter_chunks(records, guest))